@@ -10,6 +10,13 @@ import tempfile
 import time
 import math
 import sys
+import queue
+import struct
+import mmap
+import re
+import subprocess
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 import platform
@@ -35,6 +42,16 @@ except ImportError:
     shutil_disponible = False
     print("Nota: shutil no está instalado.")
 
+# ffmpeg permite decodificar MP3/OGG/FLAC en streaming sin convertir el archivo completo a WAV
+ruta_ffmpeg = shutil.which("ffmpeg") if shutil_disponible else None
+ruta_ffprobe = shutil.which("ffprobe") if shutil_disponible else None
+
+# Correcciones aplicadas al texto reconocido; correcciones.json, junto al programa, puede ampliarlas
+CORRECCIONES_PREDETERMINADAS = {
+    "es": {"palabras": {"q": "que", "xq": "porque", "xa": "para", "tb": "también", "x": "por"}},
+    "en": {"palabras": {"u": "you", "r": "are", "y": "why", "btw": "by the way"}},
+}
+
 try:
     from cryptography.fernet import Fernet
     from cryptography.hazmat.primitives import hashes
@@ -45,6 +62,13 @@ except ImportError:
     encriptacion_disponible = False
     print("Nota: Cryptography no está instalada. La encriptación no estará disponible.")
 
+try:
+    import numpy as np
+    numpy_disponible = True
+except ImportError:
+    numpy_disponible = False
+    print("Nota: numpy no está instalado. El análisis de silencios, la cancelación de ruido y el audio multicanal no estarán disponibles.")
+
 try:
     from pydub import AudioSegment
     pydub_disponible = True
@@ -60,6 +84,1464 @@ except ImportError:
     docx_disponible = False
     print("Nota: python-docx no está instalada. La exportación a Word no estará disponible.")
 
+
+class RegistroModelosVosk:
+    """Caché de modelos Vosk compartida por todo el proceso.
+
+    Cada modelo se carga una sola vez por ruta y se comparte entre todos los
+    KaldiRecognizer (transcripción en vivo, final y de archivos). Los modelos
+    sin referencias activas se conservan para sesiones posteriores y sólo se
+    descargan, del menos usado al más usado, cuando se supera el presupuesto
+    de memoria.
+    """
+
+    def __init__(self, memoria_maxima_mb=2048):
+        self.memoria_maxima_mb = memoria_maxima_mb
+        self._modelos = OrderedDict()  # ruta -> {"modelo", "referencias", "tamano_mb"}
+        self._cargando = {}  # ruta -> threading.Event de la carga en curso
+        self._lock = threading.Lock()
+
+    def obtener(self, ruta_modelo):
+        """Devuelve el modelo de la ruta indicada e incrementa su contador de referencias"""
+        ruta_modelo = os.path.abspath(ruta_modelo)
+
+        while True:
+            with self._lock:
+                entrada = self._modelos.get(ruta_modelo)
+                if entrada is not None:
+                    entrada["referencias"] += 1
+                    self._modelos.move_to_end(ruta_modelo)
+                    return entrada["modelo"]
+
+                evento = self._cargando.get(ruta_modelo)
+                if evento is None:
+                    # Este hilo se encarga de la carga
+                    evento = threading.Event()
+                    self._cargando[ruta_modelo] = evento
+                    break
+
+            # Otro hilo está cargando el mismo modelo, esperar a que termine
+            evento.wait()
+
+        try:
+            if not os.path.exists(ruta_modelo):
+                raise FileNotFoundError(f"La ruta del modelo {ruta_modelo} no existe")
+
+            print(f"Cargando modelo Vosk desde: {ruta_modelo}")
+            inicio = time.time()
+            modelo = Model(ruta_modelo)
+            print(f"Modelo Vosk cargado en {time.time() - inicio:.1f} s")
+
+            with self._lock:
+                self._modelos[ruta_modelo] = {
+                    "modelo": modelo,
+                    "referencias": 1,
+                    "tamano_mb": self._estimar_tamano_mb(ruta_modelo)
+                }
+                self._liberar_memoria()
+
+            return modelo
+
+        finally:
+            with self._lock:
+                self._cargando.pop(ruta_modelo, None)
+            evento.set()
+
+    def liberar(self, ruta_modelo):
+        """Decrementa el contador de referencias del modelo indicado"""
+        ruta_modelo = os.path.abspath(ruta_modelo)
+
+        with self._lock:
+            entrada = self._modelos.get(ruta_modelo)
+            if entrada is None:
+                return
+
+            entrada["referencias"] = max(0, entrada["referencias"] - 1)
+            self._liberar_memoria()
+
+    def esta_cargado(self, ruta_modelo):
+        """Indica si el modelo ya está en memoria"""
+        with self._lock:
+            return os.path.abspath(ruta_modelo) in self._modelos
+
+    def memoria_usada_mb(self):
+        """Devuelve la memoria estimada que ocupan los modelos cargados"""
+        with self._lock:
+            return sum(entrada["tamano_mb"] for entrada in self._modelos.values())
+
+    def _liberar_memoria(self):
+        """Descarga modelos sin referencias (LRU) hasta respetar el presupuesto. Requiere el lock."""
+        total = sum(entrada["tamano_mb"] for entrada in self._modelos.values())
+
+        for ruta in list(self._modelos.keys()):
+            if total <= self.memoria_maxima_mb:
+                break
+
+            entrada = self._modelos[ruta]
+            if entrada["referencias"] == 0:
+                del self._modelos[ruta]
+                total -= entrada["tamano_mb"]
+                print(f"Modelo Vosk descargado de memoria: {os.path.basename(ruta)}")
+
+    @staticmethod
+    def _estimar_tamano_mb(ruta_modelo):
+        """Estima la memoria del modelo a partir del tamaño de sus archivos"""
+        total = 0
+        for directorio, _, archivos in os.walk(ruta_modelo):
+            for archivo in archivos:
+                try:
+                    total += os.path.getsize(os.path.join(directorio, archivo))
+                except OSError:
+                    pass
+        return total / (1024 * 1024)
+
+
+# Registro único para que todas las transcripciones compartan los modelos cargados
+registro_modelos_vosk = RegistroModelosVosk()
+
+
+class BufferCircularAudio:
+    """Buffer circular preasignado para los bloques de audio capturados.
+
+    La memoria ocupada es fija (segundos * tasa * 2 bytes) sin importar la
+    duración de la sesión. Cada consumidor lee con su propio cursor, que es el
+    índice absoluto del siguiente bloque, y puede bloquearse en leer() hasta
+    que el hilo de captura publique datos nuevos. Opcionalmente cada bloque se entrega
+    también a un EscritorWavContinuo que lo vuelca a disco para la
+    transcripción final.
+    """
+
+    def __init__(self, segundos=120, tasa=16000, tamano_bloque=1024, ancho_muestra=2, desborde=None):
+        self.bytes_bloque = tamano_bloque * ancho_muestra
+        self.capacidad = max(1, int(math.ceil(segundos * tasa / tamano_bloque)))
+        self._datos = bytearray(self.capacidad * self.bytes_bloque)
+        self._longitudes = [0] * self.capacidad
+        self.total_escritos = 0  # Bloques escritos desde el inicio de la sesión
+        self.cerrado = False
+        self._cursores = {}
+        self._lock = threading.Lock()
+        self._datos_nuevos = threading.Condition(self._lock)
+
+        self.desborde = desborde
+
+    def escribir(self, datos):
+        """Añade un bloque de audio al buffer (y al escritor de desborde si existe)"""
+        datos = datos[:self.bytes_bloque]
+
+        with self._lock:
+            posicion = (self.total_escritos % self.capacidad) * self.bytes_bloque
+            self._datos[posicion:posicion + len(datos)] = datos
+            self._longitudes[self.total_escritos % self.capacidad] = len(datos)
+            self.total_escritos += 1
+            self._datos_nuevos.notify_all()
+
+        if self.desborde:
+            self.desborde.agregar(datos)
+
+    def crear_cursor(self, nombre):
+        """Registra un consumidor que empezará a leer desde el bloque más antiguo disponible"""
+        with self._lock:
+            self._cursores[nombre] = max(0, self.total_escritos - self.capacidad)
+
+    def disponibles(self, nombre):
+        """Número de bloques pendientes de leer para el consumidor"""
+        with self._lock:
+            return self.total_escritos - self._cursores[nombre]
+
+    def posicion(self, nombre):
+        """Índice absoluto del siguiente bloque que leerá el consumidor"""
+        with self._lock:
+            return self._cursores[nombre]
+
+    def leer(self, nombre, timeout=0):
+        """Devuelve el siguiente bloque del consumidor.
+
+        Espera hasta timeout segundos (None = sin límite) a que lleguen datos y
+        devuelve None si no llegan o si el buffer se cerró.
+        """
+        with self._lock:
+            if timeout != 0:
+                self._datos_nuevos.wait_for(
+                    lambda: self._cursores[nombre] < self.total_escritos or self.cerrado,
+                    timeout=timeout
+                )
+
+            cursor = self._cursores[nombre]
+            if cursor >= self.total_escritos:
+                return None
+
+            # Si el consumidor se quedó atrás más que la capacidad, saltar al bloque más antiguo
+            mas_antiguo = self.total_escritos - self.capacidad
+            if cursor < mas_antiguo:
+                print(f"Buffer de audio: el consumidor '{nombre}' perdió {mas_antiguo - cursor} bloques")
+                cursor = mas_antiguo
+
+            indice = cursor % self.capacidad
+            posicion = indice * self.bytes_bloque
+            datos = bytes(self._datos[posicion:posicion + self._longitudes[indice]])
+            self._cursores[nombre] = cursor + 1
+            return datos
+
+    def cerrar(self):
+        """Marca el fin de la captura y despierta a los consumidores en espera"""
+        with self._lock:
+            self.cerrado = True
+            self._datos_nuevos.notify_all()
+
+
+class EscritorWavContinuo:
+    """Escribe en disco, desde un hilo propio, el audio capturado a medida que llega.
+
+    La cabecera WAV se actualiza periódicamente, de modo que el archivo es
+    válido durante toda la grabación y al detener sólo queda por escribir lo
+    que esté en la cola.
+    """
+
+    TAMANO_CABECERA = 44
+
+    def __init__(self, ruta, tasa=16000, canales=1, ancho_muestra=2, intervalo_cabecera=1.0):
+        self.ruta = ruta
+        self.tasa = tasa
+        self.canales = canales
+        self.ancho_muestra = ancho_muestra
+        self.intervalo_cabecera = intervalo_cabecera
+        self.bytes_datos = 0
+
+        self._cola = queue.Queue()
+        self._archivo = open(ruta, 'wb')
+        self._archivo.write(self._cabecera(0))
+
+        self._hilo = threading.Thread(target=self._escribir, daemon=True)
+        self._hilo.start()
+
+    def agregar(self, datos):
+        """Encola un bloque de audio para escribirlo en disco"""
+        self._cola.put(datos)
+
+    def cerrar(self):
+        """Escribe lo pendiente, actualiza la cabecera y cierra el archivo"""
+        if self._hilo is None:
+            return self.ruta
+
+        self._cola.put(None)
+        self._hilo.join()
+        self._hilo = None
+        return self.ruta
+
+    def duracion(self):
+        """Duración en segundos del audio escrito hasta el momento"""
+        return self.bytes_datos / float(self.tasa * self.canales * self.ancho_muestra)
+
+    def _escribir(self):
+        ultima_actualizacion = time.time()
+
+        try:
+            while True:
+                try:
+                    datos = self._cola.get(timeout=self.intervalo_cabecera)
+                except queue.Empty:
+                    datos = b''
+
+                if datos is None:
+                    break
+
+                if datos:
+                    self._archivo.write(datos)
+                    self.bytes_datos += len(datos)
+
+                if time.time() - ultima_actualizacion >= self.intervalo_cabecera:
+                    self._actualizar_cabecera()
+                    ultima_actualizacion = time.time()
+
+        except Exception as e:
+            print(f"Error al escribir el audio en disco: {e}")
+
+        finally:
+            try:
+                self._actualizar_cabecera()
+            finally:
+                self._archivo.close()
+
+    def _actualizar_cabecera(self):
+        self._archivo.seek(0)
+        self._archivo.write(self._cabecera(self.bytes_datos))
+        self._archivo.seek(0, os.SEEK_END)
+        self._archivo.flush()
+
+    def _cabecera(self, bytes_datos):
+        alineacion = self.canales * self.ancho_muestra
+        return struct.pack(
+            '<4sI4s4sIHHIIHH4sI',
+            b'RIFF', 36 + bytes_datos, b'WAVE',
+            b'fmt ', 16, 1, self.canales, self.tasa, self.tasa * alineacion, alineacion, self.ancho_muestra * 8,
+            b'data', bytes_datos
+        )
+
+
+class RemuestreadorPolifasico:
+    """Cambia la tasa de muestreo de un flujo de audio con un filtro sinc enventanado en forma polifásica.
+
+    Conserva entre llamadas las últimas muestras de entrada, de modo que el
+    audio puede procesarse por bloques sin discontinuidades en las uniones.
+    """
+
+    def __init__(self, tasa_origen, tasa_destino, ceros=16):
+        divisor = math.gcd(tasa_origen, tasa_destino)
+        self.arriba = tasa_destino // divisor
+        self.abajo = tasa_origen // divisor
+
+        # Filtro prototipo a la tasa intermedia, con corte algo por debajo de la menor frecuencia de Nyquist
+        factor = max(self.arriba, self.abajo)
+        longitud = 2 * ceros * factor + 1
+        corte = 0.475 / factor
+        n = np.arange(longitud) - (longitud - 1) / 2.0
+        filtro = 2 * corte * np.sinc(2 * corte * n) * np.kaiser(longitud, 8.0) * self.arriba
+
+        # Fase p, coeficiente j -> filtro[p + j * arriba], en orden inverso para aplicarlo a ventanas de entrada
+        self.coeficientes = -(-longitud // self.arriba)
+        filtro = np.pad(filtro, (0, self.coeficientes * self.arriba - longitud))
+        fases = filtro.reshape(self.coeficientes, self.arriba).T[:, ::-1]
+        self._fases = np.ascontiguousarray(fases, dtype=np.float32)
+        self._retardo = (longitud - 1) // 2
+
+        self._historia = np.zeros(self.coeficientes - 1, dtype=np.float32)
+        self._inicio_historia = -(self.coeficientes - 1)  # Índice absoluto de _historia[0]
+        self._muestras_entrada = 0
+        self._siguiente_salida = 0
+
+    def procesar(self, muestras):
+        """Remuestrea un bloque de muestras float32 y devuelve las muestras de salida ya completas"""
+        buffer = np.concatenate((self._historia, muestras.astype(np.float32, copy=False)))
+        self._muestras_entrada += len(muestras)
+
+        # Salidas cuyo último coeficiente cae dentro de la entrada recibida
+        fin = -(-(self._muestras_entrada * self.arriba - self._retardo) // self.abajo)
+        return self._generar(buffer, max(self._siguiente_salida, fin), self._muestras_entrada)
+
+    def vaciar(self):
+        """Completa la salida al final del flujo rellenando con silencio"""
+        relleno = self._retardo // self.arriba + self.coeficientes + 1
+        buffer = np.concatenate((self._historia, np.zeros(relleno, dtype=np.float32)))
+        fin = -(-self._muestras_entrada * self.arriba // self.abajo)
+        return self._generar(buffer, max(self._siguiente_salida, fin), self._muestras_entrada + relleno)
+
+    def _generar(self, buffer, fin, limite):
+        posiciones = np.arange(self._siguiente_salida, fin) * self.abajo + self._retardo
+        fases = posiciones % self.arriba
+        ultimas = posiciones // self.arriba - self._inicio_historia
+
+        # Fila k: las entradas que pondera la salida k, de la más antigua a la más reciente
+        filas = np.lib.stride_tricks.sliding_window_view(buffer, self.coeficientes)[ultimas - (self.coeficientes - 1)]
+        salida = np.einsum('kj,kj->k', filas, self._fases[fases])
+
+        # Guardar sólo la entrada que aún necesitan las próximas salidas
+        self._siguiente_salida = fin
+        conservar_desde = min((fin * self.abajo + self._retardo) // self.arriba - (self.coeficientes - 1), limite)
+        self._historia = buffer[conservar_desde - self._inicio_historia:]
+        self._inicio_historia = conservar_desde
+
+        return salida
+
+
+class ReductorRuido:
+    """Preprocesado de voz en memoria con numpy: filtro paso alto, control automático de ganancia y,
+    opcionalmente, sustracción espectral del ruido de fondo.
+
+    Conserva su estado entre llamadas, así que el audio debe pasar una sola vez
+    y en orden, en bloques de cualquier tamaño. Con sustracción espectral la
+    salida se retrasa dos medias tramas (32 ms a 16 kHz).
+    """
+
+    TRAMO_IIR = 256
+
+    def __init__(self, tasa=16000, corte_hz=80, nivel_objetivo=3000.0, ganancia_maxima=10.0,
+                 umbral_silencio=150.0, sustraccion_espectral=False):
+        self.tasa = tasa
+
+        # Paso alto de un polo, el mismo que aplicaba pydub.high_pass_filter
+        rc = 1.0 / (2 * math.pi * corte_hz)
+        self._alfa = rc / (rc + 1.0 / tasa)
+        self._potencias = self._alfa ** np.arange(1, self.TRAMO_IIR + 1)
+        self._x_anterior = 0.0
+        self._y_anterior = 0.0
+
+        # Control de ganancia por tramos de 20 ms, con constante de tiempo de 0.4 s
+        self.nivel_objetivo = nivel_objetivo
+        self.ganancia_maxima = ganancia_maxima
+        self.umbral_silencio = umbral_silencio
+        self._ganancia = 1.0
+        self._tramo_agc = max(1, tasa // 50)
+        self._suavizado_agc = 1 - math.exp(-self._tramo_agc / (0.4 * tasa))
+
+        self.sustraccion_espectral = sustraccion_espectral
+        if sustraccion_espectral:
+            self._salto = 256 if tasa >= 16000 else 128
+            self._ventana = np.sqrt(np.hanning(2 * self._salto + 1)[:-1])
+            self._entrada = np.zeros(self._salto)
+            self._salida_pendiente = np.zeros(self._salto)
+            self._solape = np.zeros(self._salto)
+            self._ruido = None
+
+    def procesar_pcm(self, datos):
+        """Procesa un bloque de PCM int16 y devuelve otro del mismo tamaño"""
+        muestras = self.procesar(np.frombuffer(datos, dtype=np.int16))
+        return np.clip(np.round(muestras), -32768, 32767).astype(np.int16).tobytes()
+
+    def procesar(self, muestras):
+        """Procesa un bloque de muestras (escala de int16) y devuelve el mismo número de muestras"""
+        if len(muestras) == 0:
+            return np.zeros(0, dtype=np.float32)
+
+        x = self._paso_alto(np.asarray(muestras, dtype=np.float64))
+        if self.sustraccion_espectral:
+            x = self._sustraer_ruido(x)
+        return self._control_ganancia(x).astype(np.float32)
+
+    def _paso_alto(self, x):
+        # y[k] = alfa * y[k-1] + alfa * (x[k] - x[k-1]), resuelta en forma cerrada por tramos
+        n = len(x)
+        u = np.empty(n)
+        u[0] = x[0] - self._x_anterior
+        u[1:] = np.diff(x)
+        u *= self._alfa
+        self._x_anterior = x[-1]
+
+        filas = -(-n // self.TRAMO_IIR)
+        u = np.pad(u, (0, filas * self.TRAMO_IIR - n)).reshape(filas, self.TRAMO_IIR)
+        p = self._potencias
+
+        # Respuesta de cada tramo con estado inicial nulo; luego se propaga el estado entre tramos
+        local = p * np.cumsum(u / p, axis=1)
+        estados = np.empty(filas)
+        y = self._y_anterior
+        for i in range(filas):
+            estados[i] = y
+            y = local[i, -1] + p[-1] * y
+
+        salida = (local + p * estados[:, None]).ravel()[:n]
+        self._y_anterior = salida[-1]
+        return salida
+
+    def _sustraer_ruido(self, x):
+        salto = self._salto
+        self._entrada = np.concatenate((self._entrada, x))
+        num_tramas = (len(self._entrada) - salto) // salto
+
+        if num_tramas > 0:
+            tramas = np.lib.stride_tricks.sliding_window_view(self._entrada, 2 * salto)[::salto][:num_tramas]
+            espectros = np.fft.rfft(tramas * self._ventana, axis=1)
+            potencias = np.maximum(np.abs(espectros) ** 2, 1e-10)
+
+            # Estimación del ruido por banda: baja cinco veces más rápido de lo que sube, así sigue
+            # el fondo y no la voz (queda en torno a la mitad de la potencia media del ruido)
+            ruidos = np.empty_like(potencias)
+            ruido = potencias[0].copy() if self._ruido is None else self._ruido
+            for i in range(num_tramas):
+                ruido = np.where(potencias[i] < ruido, 0.9 * ruido + 0.1 * potencias[i],
+                                 0.98 * ruido + 0.02 * potencias[i])
+                ruidos[i] = ruido
+            self._ruido = ruido
+
+            # Sobresustracción x2 con un suelo de -20 dB para limitar el ruido musical
+            ganancias = np.sqrt(np.maximum(1 - 2 * ruidos / potencias, 0.01))
+            salida_tramas = np.fft.irfft(espectros * ganancias, n=2 * salto, axis=1) * self._ventana
+
+            # Solapamiento y suma con la mitad final de la trama anterior
+            bloques = salida_tramas[:, :salto].copy()
+            bloques[0] += self._solape
+            bloques[1:] += salida_tramas[:-1, salto:]
+            self._solape = salida_tramas[-1, salto:]
+
+            self._salida_pendiente = np.concatenate((self._salida_pendiente, bloques.ravel()))
+            self._entrada = self._entrada[num_tramas * salto:]
+
+        salida = self._salida_pendiente[:len(x)]
+        self._salida_pendiente = self._salida_pendiente[len(x):]
+        return salida
+
+    def _control_ganancia(self, x):
+        n = len(x)
+        tramo = self._tramo_agc
+        filas = -(-n // tramo)
+        niveles = np.sqrt(np.mean(np.pad(x, (0, filas * tramo - n)).reshape(filas, tramo) ** 2, axis=1))
+
+        # El último tramo puede estar incompleto: su nivel y su peso se calculan sobre las muestras reales
+        ultimo = n - (filas - 1) * tramo
+        niveles[-1] *= math.sqrt(tramo / ultimo)
+        suavizados = np.full(filas, self._suavizado_agc)
+        suavizados[-1] = 1 - math.exp(-ultimo / (0.4 * self.tasa))
+
+        # En silencio se mantiene la ganancia para no amplificar el ruido de fondo
+        ganancias = np.empty(filas)
+        g = self._ganancia
+        for i in range(filas):
+            if niveles[i] > self.umbral_silencio:
+                objetivo = min(self.ganancia_maxima, max(0.1, self.nivel_objetivo / niveles[i]))
+                g += suavizados[i] * (objetivo - g)
+            ganancias[i] = g
+
+        # Interpolar entre los centros de los tramos para que la ganancia no cambie a saltos
+        centros = np.arange(filas) * tramo + tramo / 2.0
+        curva = np.interp(np.arange(n), np.concatenate(([-1.0], centros)),
+                          np.concatenate(([self._ganancia], ganancias)))
+        self._ganancia = g
+        return x * curva
+
+
+class DetectorVoz:
+    """Detector de actividad de voz por energía y cruces por cero que agrupa el audio en enunciados.
+
+    Recibe PCM mono int16 en bloques de cualquier tamaño y devuelve cada
+    enunciado, con un margen de audio antes y después, en cuanto termina la
+    pausa que lo cierra. El silencio entre enunciados no se entrega. El piso de
+    ruido se adapta con las tramas de silencio.
+    """
+
+    def __init__(self, tasa=16000, pausa=0.5, margen=0.3, duracion_minima=0.3, duracion_maxima=15.0, calibrador=None):
+        self.tasa = tasa
+        self.calibrador = calibrador  # CalibradorRuido que recibe la energía de las tramas de silencio
+        self.tamano_trama = tasa // 50  # Tramas de 20 ms
+        self.tramas_inicio = 3  # 60 ms seguidos de voz abren un enunciado
+        self.tramas_pausa = int(pausa * 50)
+        self.tramas_margen = int(margen * 50)
+        self.tramas_minimas = int(duracion_minima * 50)
+        self.tramas_maximas = int(duracion_maxima * 50)
+
+        self.piso_ruido_db = None
+        self._resto = b''
+        self._tramas_analizadas = 0
+        self._previas = deque(maxlen=self.tramas_margen + self.tramas_inicio)  # (trama, energía) antes del enunciado
+        self._enunciado = None  # Lista de (trama, energía) del enunciado en curso
+        self._inicio_enunciado = 0  # Índice de su primera trama
+        self._tramas_voz = 0
+        self._silencio = 0
+        self._voz_seguida = 0
+
+    def procesar(self, datos):
+        """Analiza un bloque de PCM y devuelve una lista de enunciados completos (segundo de inicio, PCM)"""
+        datos = self._resto + datos
+        bytes_trama = self.tamano_trama * 2
+        num_tramas = len(datos) // bytes_trama
+        self._resto = datos[num_tramas * bytes_trama:]
+        if num_tramas == 0:
+            return []
+
+        energias, voz = self._clasificar(np.frombuffer(datos, dtype=np.int16, count=num_tramas * self.tamano_trama))
+
+        enunciados = []
+        for i in range(num_tramas):
+            trama = datos[i * bytes_trama:(i + 1) * bytes_trama]
+            self._avanzar(trama, energias[i], voz[i], enunciados)
+        return enunciados
+
+    def vaciar(self):
+        """Cierra el enunciado en curso al terminar la captura"""
+        enunciados = []
+        if self._enunciado is not None:
+            self._cerrar(len(self._enunciado) - max(0, self._silencio - self.tramas_margen), enunciados)
+        return enunciados
+
+    def _clasificar(self, muestras):
+        tramas = muestras.reshape(-1, self.tamano_trama).astype(np.float32)
+        potencias = np.mean(tramas ** 2, axis=1)
+        energias = 10 * np.log10(potencias + 1.0)
+        signos = tramas >= 0
+        cruces = np.mean(signos[:, 1:] != signos[:, :-1], axis=1)
+
+        if self.piso_ruido_db is None:
+            self.piso_ruido_db = float(energias.min())
+
+        # La voz sonora destaca por energía; las fricativas, más débiles, por su tasa de cruces por cero
+        voz = np.empty(len(energias), dtype=bool)
+        piso = self.piso_ruido_db
+        for i, energia in enumerate(energias):
+            voz[i] = energia > 30 and (energia > piso + 9 or (energia > piso + 4 and cruces[i] > 0.3))
+            if not voz[i]:
+                # El piso baja enseguida y sube despacio con las tramas de silencio
+                piso = energia if energia < piso else 0.95 * piso + 0.05 * energia
+            else:
+                # Un ruido de fondo que sube de golpe acaba absorbido en unos segundos
+                piso += 0.01
+        self.piso_ruido_db = piso
+
+        if self.calibrador:
+            self.calibrador.actualizar(np.sqrt(potencias[~voz]))
+
+        return energias, voz
+
+    def _avanzar(self, trama, energia, voz, enunciados):
+        self._tramas_analizadas += 1
+
+        if self._enunciado is None:
+            self._previas.append((trama, energia))
+            self._voz_seguida = self._voz_seguida + 1 if voz else 0
+
+            if self._voz_seguida >= self.tramas_inicio:
+                # Abrir el enunciado incluyendo el margen previo
+                self._enunciado = list(self._previas)
+                self._inicio_enunciado = self._tramas_analizadas - len(self._enunciado)
+                self._tramas_voz = self._voz_seguida
+                self._silencio = 0
+                self._previas.clear()
+            return
+
+        self._enunciado.append((trama, energia))
+        if voz:
+            self._tramas_voz += 1
+            self._silencio = 0
+        else:
+            self._silencio += 1
+
+        if self._silencio >= self.tramas_pausa:
+            # La pausa cierra el enunciado; se conserva sólo el margen de silencio final
+            self._cerrar(len(self._enunciado) - (self._silencio - self.tramas_margen), enunciados)
+        elif len(self._enunciado) >= self.tramas_maximas:
+            # Enunciado demasiado largo: cortar en la trama más débil del último segundo
+            ultimo_segundo = range(len(self._enunciado) - 50, len(self._enunciado))
+            corte = min(ultimo_segundo, key=lambda j: self._enunciado[j][1]) + 1
+            self._cerrar(corte, enunciados, continuar=True)
+
+    def _cerrar(self, fin, enunciados, continuar=False):
+        tramas = self._enunciado[:fin]
+        if self._tramas_voz >= self.tramas_minimas or continuar:
+            segundo_inicio = self._inicio_enunciado * self.tamano_trama / float(self.tasa)
+            enunciados.append((segundo_inicio, b''.join(trama for trama, _ in tramas)))
+
+        sobrantes = self._enunciado[fin:]
+        if continuar:
+            # El resto sigue siendo voz y abre directamente el siguiente enunciado
+            self._enunciado = sobrantes
+            self._inicio_enunciado += fin
+            self._tramas_voz = len(sobrantes)
+        else:
+            self._enunciado = None
+            self._voz_seguida = 0
+            self._previas.extend(sobrantes)
+
+
+class CalibradorRuido:
+    """Estimación del nivel de ruido de fondo compartida con el umbral de energía del reconocedor.
+
+    El piso se estima una vez por fuente de audio y después se sigue con una
+    media móvil exponencial de las tramas que el detector de voz clasifica como
+    silencio, de modo que ningún segmento pierde audio en calibraciones.
+    Con el ajuste dinámico activado, energy_threshold = ruido * dynamic_energy_ratio.
+    """
+
+    def __init__(self, reconocedor, suavizado=0.02, umbral_minimo=50):
+        self.reconocedor = reconocedor
+        self.suavizado = suavizado
+        self.umbral_minimo = umbral_minimo
+        self.ruido_rms = None
+
+    def estimar(self, datos, tasa=16000):
+        """Estima el piso de ruido de una fuente a partir de su PCM mono int16 (percentil 10 de tramas de 20 ms)"""
+        tamano_trama = max(1, tasa // 50)
+        muestras = np.frombuffer(datos, dtype=np.int16)
+        num_tramas = len(muestras) // tamano_trama
+        if num_tramas == 0:
+            return
+
+        tramas = muestras[:num_tramas * tamano_trama].reshape(num_tramas, tamano_trama).astype(np.float32)
+        self.fijar(float(np.percentile(np.sqrt(np.einsum('ij,ij->i', tramas, tramas) / tamano_trama), 10)))
+
+    def fijar(self, ruido_rms):
+        """Establece el piso de ruido de una fuente nueva"""
+        self.ruido_rms = ruido_rms
+        self._aplicar()
+
+    def actualizar(self, energias_silencio):
+        """Incorpora las energías RMS de tramas de silencio a la media móvil exponencial"""
+        n = len(energias_silencio)
+        if n == 0:
+            return
+        if self.ruido_rms is None:
+            self.ruido_rms = float(energias_silencio[0])
+
+        # Forma cerrada de n pasos de r = (1 - a) * r + a * e
+        a = self.suavizado
+        pesos = a * (1 - a) ** np.arange(n - 1, -1, -1)
+        self.ruido_rms = float((1 - a) ** n * self.ruido_rms + np.dot(pesos, energias_silencio))
+        self._aplicar()
+
+    def _aplicar(self):
+        if self.reconocedor.dynamic_energy_threshold:
+            umbral = self.ruido_rms * self.reconocedor.dynamic_energy_ratio
+            self.reconocedor.energy_threshold = max(self.umbral_minimo, umbral)
+
+
+class LectorWav:
+    """Abre un WAV PCM una sola vez, mapeado en memoria, y entrega tramos de frames como memoryview.
+
+    Recorre los chunks RIFF en lugar de suponer una cabecera de 44 bytes, así que
+    acepta archivos con chunks LIST o fact y cabeceras WAVE_FORMAT_EXTENSIBLE.
+    Si se indica tasa_salida, convertir() y bloques() entregan PCM mono int16 a
+    esa tasa, que es el formato nativo de los reconocedores.
+    """
+
+    def __init__(self, ruta, tasa_salida=None):
+        self.ruta = ruta
+        self._archivo = open(ruta, 'rb')
+
+        try:
+            self._mapa = mmap.mmap(self._archivo.fileno(), 0, access=mmap.ACCESS_READ)
+            self._vista = memoryview(self._mapa)
+            self._leer_cabecera()
+        except Exception:
+            self.cerrar()
+            raise
+
+        # Sin numpy no se remuestrea: Vosk y Google aceptan también la tasa original
+        self.tasa_salida = tasa_salida if (tasa_salida and numpy_disponible) else self.tasa
+        self.ancho_salida = 2 if numpy_disponible else self.ancho_muestra
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.cerrar()
+
+    def _leer_cabecera(self):
+        tamano_archivo = len(self._mapa)
+        if tamano_archivo < 12 or self._mapa[0:4] != b'RIFF' or self._mapa[8:12] != b'WAVE':
+            raise ValueError(f"{os.path.basename(self.ruta)} no es un archivo WAV válido")
+
+        formato = None
+        self._inicio_datos = None
+        posicion = 12
+
+        while posicion + 8 <= tamano_archivo:
+            id_chunk, tamano = struct.unpack_from('<4sI', self._mapa, posicion)
+            posicion += 8
+
+            if id_chunk == b'fmt ':
+                formato, self.canales, self.tasa, _, _, bits = struct.unpack_from('<HHIIHH', self._mapa, posicion)
+                self.ancho_muestra = (bits + 7) // 8
+
+            elif id_chunk == b'data':
+                # Las grabaciones interrumpidas o en curso pueden declarar un tamaño 0 o mayor que el real
+                restante = tamano_archivo - posicion
+                if tamano in (0, 0xFFFFFFFF) or tamano > restante:
+                    tamano = restante
+
+                self._inicio_datos = posicion
+                self._fin_datos = posicion + tamano
+                break
+
+            # Los chunks se alinean a 2 bytes
+            posicion += tamano + (tamano & 1)
+
+        if formato is None or self._inicio_datos is None:
+            raise ValueError(f"{os.path.basename(self.ruta)} no contiene los chunks fmt y data")
+
+        if formato not in (1, 0xFFFE):
+            raise ValueError(f"Formato WAV no soportado (código {formato}), se necesita PCM")
+
+        self.tamano_frame = self.canales * self.ancho_muestra
+        self.num_frames = (self._fin_datos - self._inicio_datos) // self.tamano_frame
+
+    def duracion(self):
+        """Duración del audio en segundos"""
+        return self.num_frames / float(self.tasa)
+
+    def frames(self, inicio, fin):
+        """Devuelve una vista de los frames [inicio, fin) sin copiar los datos"""
+        inicio = max(0, min(inicio, self.num_frames))
+        fin = max(inicio, min(fin, self.num_frames))
+        return self._vista[self._inicio_datos + inicio * self.tamano_frame:self._inicio_datos + fin * self.tamano_frame]
+
+    def bloques(self, frames_bloque=4000, inicio=0, fin=None, reductor=None):
+        """Genera convertidos los frames [inicio, fin) en bloques de frames_bloque frames de origen.
+
+        Si se indica un ReductorRuido (a tasa_salida), cada bloque convertido pasa por él.
+        """
+        fin = self.num_frames if fin is None else fin
+        filtrar = reductor.procesar_pcm if reductor else (lambda datos: datos)
+
+        # Un único remuestreador para todo el recorrido: sin discontinuidades entre bloques
+        remuestreador = None
+        if self.tasa_salida != self.tasa:
+            remuestreador = RemuestreadorPolifasico(self.tasa, self.tasa_salida)
+
+        for posicion in range(inicio, fin, frames_bloque):
+            yield filtrar(self.convertir(self.frames(posicion, min(posicion + frames_bloque, fin)), remuestreador))
+
+        if remuestreador is not None:
+            yield filtrar(self._a_int16(remuestreador.vaciar()))
+
+    def energias(self, frames_ventana):
+        """Calcula en una pasada la energía RMS (escala de int16) de cada ventana de frames_ventana frames"""
+        energias = []
+        paso = frames_ventana * 600
+
+        for inicio in range(0, self.num_frames, paso):
+            muestras = self._a_float_mono(self.frames(inicio, inicio + paso))
+            num_ventanas = len(muestras) // frames_ventana
+            if num_ventanas == 0:
+                break
+
+            ventanas = muestras[:num_ventanas * frames_ventana].reshape(num_ventanas, frames_ventana)
+            energias.append(np.sqrt(np.einsum('ij,ij->i', ventanas, ventanas) / frames_ventana))
+
+        return np.concatenate(energias) if energias else np.zeros(0, dtype=np.float32)
+
+    def convertir(self, vista, remuestreador=None):
+        """Convierte un tramo a PCM mono (int16 a tasa_salida si hay numpy), como esperan Vosk y sr.AudioData.
+
+        Sin remuestreador, el tramo se remuestrea como una pieza independiente.
+        """
+        if self.canales == 1 and self.ancho_muestra == 2 and self.tasa_salida == self.tasa:
+            return bytes(vista)
+
+        if not numpy_disponible:
+            if self.canales == 1 and self.ancho_muestra != 1:
+                return bytes(vista)
+            raise ValueError("Se necesita numpy para procesar audio de 8 bits o con varios canales")
+
+        muestras = self._a_float_mono(vista)
+
+        if self.tasa_salida != self.tasa:
+            if remuestreador is None:
+                remuestreador = RemuestreadorPolifasico(self.tasa, self.tasa_salida)
+                muestras = np.concatenate((remuestreador.procesar(muestras), remuestreador.vaciar()))
+            else:
+                muestras = remuestreador.procesar(muestras)
+
+        return self._a_int16(muestras)
+
+    def _a_float_mono(self, vista):
+        # Muestras en la escala de int16, promediando los canales
+        if self.ancho_muestra == 1:
+            # Las muestras de 8 bits de un WAV no tienen signo
+            muestras = (np.frombuffer(vista, dtype=np.uint8).astype(np.float32) - 128) * 256
+        elif self.ancho_muestra == 2:
+            muestras = np.frombuffer(vista, dtype=np.int16).astype(np.float32)
+        elif self.ancho_muestra == 3:
+            octetos = np.frombuffer(vista, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+            enteros = octetos[:, 0] | (octetos[:, 1] << 8) | (octetos[:, 2] << 16)
+            enteros = np.where(enteros >= 1 << 23, enteros - (1 << 24), enteros)
+            muestras = enteros.astype(np.float32) / 256
+        elif self.ancho_muestra == 4:
+            muestras = np.frombuffer(vista, dtype=np.int32).astype(np.float32) / 65536
+        else:
+            raise ValueError(f"Ancho de muestra no soportado: {self.ancho_muestra * 8} bits")
+
+        if self.canales > 1:
+            # Sumar columna a columna es varias veces más rápido que mean(axis=1) con pocos canales
+            por_canal = muestras.reshape(-1, self.canales)
+            mezcla = por_canal[:, 0].copy()
+            for canal in range(1, self.canales):
+                mezcla += por_canal[:, canal]
+            mezcla *= 1.0 / self.canales
+            muestras = mezcla
+
+        return muestras
+
+    @staticmethod
+    def _a_int16(muestras):
+        return np.clip(np.round(muestras), -32768, 32767).astype(np.int16).tobytes()
+
+    def cerrar(self):
+        """Libera el mapeo y el archivo"""
+        if getattr(self, '_vista', None) is not None:
+            self._vista.release()
+            self._vista = None
+
+        if getattr(self, '_mapa', None) is not None:
+            try:
+                self._mapa.close()
+            except BufferError:
+                # Aún hay vistas en uso; el mapeo se libera cuando las recoja el recolector
+                pass
+            self._mapa = None
+
+        self._archivo.close()
+
+
+class DecodificadorAudio:
+    """Decodifica con ffmpeg un archivo comprimido a PCM mono int16 y lo entrega por bloques.
+
+    El PCM se lee de la tubería a medida que se consume, así que la memoria
+    usada no depende de la duración del archivo y la transcripción empieza con
+    los primeros bloques. Ofrece la misma interfaz de lectura que LectorWav.
+    """
+
+    def __init__(self, ruta, tasa=16000):
+        self.ruta = ruta
+        self.tasa = tasa
+        self.canales = 1
+        self.ancho_muestra = 2
+        self.tamano_frame = 2
+        self.tasa_salida = tasa
+        self.ancho_salida = 2
+
+        # Los errores de ffmpeg van a un archivo temporal para no bloquear la tubería
+        self._errores = tempfile.TemporaryFile()
+        self._proceso = subprocess.Popen(
+            [ruta_ffmpeg, '-nostdin', '-v', 'error', '-i', ruta,
+             '-f', 's16le', '-acodec', 'pcm_s16le', '-ac', '1', '-ar', str(tasa), '-'],
+            stdout=subprocess.PIPE, stderr=self._errores)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.cerrar()
+
+    @staticmethod
+    def sondear(ruta):
+        """Devuelve (duración, canales, tasa) del archivo según ffprobe, o None si no se puede averiguar"""
+        if not ruta_ffprobe:
+            return None
+
+        try:
+            salida = subprocess.run(
+                [ruta_ffprobe, '-v', 'error', '-select_streams', 'a:0',
+                 '-show_entries', 'format=duration:stream=channels,sample_rate', '-of', 'json', ruta],
+                capture_output=True, timeout=30).stdout
+            info = json.loads(salida)
+            stream = info['streams'][0]
+            return float(info['format']['duration']), int(stream['channels']), int(stream['sample_rate'])
+        except Exception as e:
+            print(f"No se pudo obtener la información de {os.path.basename(ruta)}: {e}")
+            return None
+
+    def bloques(self, frames_bloque=4000, reductor=None):
+        """Genera el PCM decodificado en bloques de frames_bloque frames, pasándolo por el reductor de ruido si se indica"""
+        while True:
+            datos = self._proceso.stdout.read(frames_bloque * self.tamano_frame)
+            if not datos:
+                break
+            yield reductor.procesar_pcm(datos) if reductor else datos
+
+        if self._proceso.wait() != 0:
+            self._errores.seek(0)
+            mensaje = self._errores.read().decode('utf-8', 'replace').strip()
+            raise ValueError(f"ffmpeg no pudo decodificar {os.path.basename(self.ruta)}: {mensaje}")
+
+    def cerrar(self):
+        """Detiene ffmpeg si sigue en marcha y libera la tubería"""
+        if self._proceso.poll() is None:
+            self._proceso.kill()
+        self._proceso.stdout.close()
+        self._proceso.wait()
+        self._errores.close()
+
+
+class CanalReconocimientoOrdenado:
+    """Lanza varias peticiones de reconocimiento en paralelo y entrega sus resultados en orden.
+
+    Cada envío recibe un número de secuencia; los resultados que terminan antes
+    que sus predecesores esperan en un buffer de reordenación. El número de
+    peticiones sin entregar está limitado, de modo que enviar() bloquea cuando
+    el pool está saturado y el audio se acumula en el buffer circular.
+    """
+
+    def __init__(self, entregar, max_en_vuelo=3):
+        self.entregar = entregar
+        self._ejecutor = ThreadPoolExecutor(max_workers=max_en_vuelo)
+        self._plazas = threading.Semaphore(max_en_vuelo)
+        self._lock = threading.Lock()
+        self._pendientes = {}
+        self._siguiente_envio = 0
+        self._siguiente_entrega = 0
+        self._entregados = threading.Condition(self._lock)
+
+    def enviar(self, funcion, *args, contexto=None):
+        """Encola una petición; bloquea mientras no haya plazas libres"""
+        self._plazas.acquire()
+
+        with self._lock:
+            secuencia = self._siguiente_envio
+            self._siguiente_envio += 1
+
+        futuro = self._ejecutor.submit(funcion, *args)
+        futuro.add_done_callback(lambda f, s=secuencia, c=contexto: self._completado(s, c, f))
+        return secuencia
+
+    def cerrar(self, timeout=None):
+        """Espera a que se entreguen todas las peticiones enviadas y libera el pool"""
+        with self._lock:
+            self._entregados.wait_for(lambda: self._siguiente_entrega >= self._siguiente_envio, timeout)
+        self._ejecutor.shutdown(wait=False)
+
+    def _completado(self, secuencia, contexto, futuro):
+        error = futuro.exception()
+        resultado = None if error else futuro.result()
+
+        with self._lock:
+            self._pendientes[secuencia] = (contexto, resultado, error)
+
+            # Entregar todos los resultados consecutivos disponibles
+            while self._siguiente_entrega in self._pendientes:
+                contexto, resultado, error = self._pendientes.pop(self._siguiente_entrega)
+                self._siguiente_entrega += 1
+                try:
+                    self.entregar(contexto, resultado, error)
+                except Exception as e:
+                    print(f"Error al entregar un resultado de reconocimiento: {e}")
+                self._plazas.release()
+
+            self._entregados.notify_all()
+
+
+class AutomataPalabrasClave:
+    """Autómata de Aho-Corasick que localiza todas las palabras clave de un texto en una sola pasada.
+
+    Las palabras se comparan sin distinguir mayúsculas y sólo cuentan si son
+    palabras completas. Entre coincidencias solapadas gana la que empieza antes
+    y, a igual inicio, la más larga. El coste de buscar depende de la longitud
+    del texto y no del número de palabras clave.
+    """
+
+    def __init__(self, palabras=()):
+        self._hijos = [{}]  # Transiciones de cada nodo del trie
+        self._fallo = [0]  # Nodo del sufijo propio más largo que también está en el trie
+        self._salidas = [()]  # Longitudes de las palabras clave que terminan en cada nodo
+        self.num_palabras = 0
+
+        for palabra in palabras:
+            self._insertar(self._minusculas(palabra))
+        self._enlazar()
+
+    def buscar(self, texto):
+        """Devuelve las coincidencias [(inicio, fin)] ordenadas y sin solapes"""
+        if self.num_palabras == 0 or not texto:
+            return []
+
+        minusculas = self._minusculas(texto)
+        hijos, fallo, salidas = self._hijos, self._fallo, self._salidas
+        coincidencias = []
+        nodo = 0
+        for i, c in enumerate(minusculas):
+            while nodo and c not in hijos[nodo]:
+                nodo = fallo[nodo]
+            nodo = hijos[nodo].get(c, 0)
+
+            for longitud in salidas[nodo]:
+                inicio = i + 1 - longitud
+                # Sólo palabras completas
+                if (inicio == 0 or not minusculas[inicio - 1].isalnum()) and \
+                        (i + 1 == len(minusculas) or not minusculas[i + 1].isalnum()):
+                    coincidencias.append((inicio, i + 1))
+
+        coincidencias.sort(key=lambda c: (c[0], -c[1]))
+        seleccion = []
+        fin_anterior = 0
+        for inicio, fin in coincidencias:
+            if inicio >= fin_anterior:
+                seleccion.append((inicio, fin))
+                fin_anterior = fin
+        return seleccion
+
+    @staticmethod
+    def _minusculas(texto):
+        # Algunos caracteres (como 'İ') cambian de longitud al pasar a minúsculas: se conservan los índices
+        minusculas = texto.lower()
+        if len(minusculas) != len(texto):
+            minusculas = ''.join(c.lower()[:1] or c for c in texto)
+        return minusculas
+
+    def _insertar(self, palabra):
+        if not palabra:
+            return
+
+        nodo = 0
+        for c in palabra:
+            siguiente = self._hijos[nodo].get(c)
+            if siguiente is None:
+                siguiente = len(self._hijos)
+                self._hijos[nodo][c] = siguiente
+                self._hijos.append({})
+                self._fallo.append(0)
+                self._salidas.append(())
+            nodo = siguiente
+
+        if len(palabra) not in self._salidas[nodo]:
+            self._salidas[nodo] = (len(palabra),)
+            self.num_palabras += 1
+
+    def _enlazar(self):
+        # Recorrido en anchura: el enlace de fallo de un nodo depende de los de menor profundidad
+        cola = deque(self._hijos[0].values())
+        while cola:
+            nodo = cola.popleft()
+            for c, hijo in self._hijos[nodo].items():
+                destino = self._fallo[nodo]
+                while destino and c not in self._hijos[destino]:
+                    destino = self._fallo[destino]
+                self._fallo[hijo] = self._hijos[destino].get(c, 0)
+
+                # Las palabras que terminan en el sufijo también terminan aquí
+                self._salidas[hijo] += self._salidas[self._fallo[hijo]]
+                cola.append(hijo)
+
+
+class MotorCorrecciones:
+    """Reglas de corrección por idioma, compiladas una sola vez en una expresión regular por idioma.
+
+    Cada idioma admite sustituciones de palabras completas ("palabras", sin
+    distinguir mayúsculas y conservando la inicial mayúscula) y los signos ante
+    los que sobra un espacio ("sin_espacio_antes") o tras los que sobra
+    ("sin_espacio_despues"). Un archivo JSON con la misma estructura, editable
+    por el usuario, amplía o sustituye las reglas predeterminadas. Todas las
+    correcciones de un texto se aplican en una sola pasada.
+    """
+
+    def __init__(self, reglas_predeterminadas, ruta_reglas=None):
+        self.reglas = {idioma: dict(reglas) for idioma, reglas in reglas_predeterminadas.items()}
+
+        if ruta_reglas and os.path.exists(ruta_reglas):
+            try:
+                with open(ruta_reglas, 'r', encoding='utf-8') as f:
+                    for idioma, reglas in json.load(f).items():
+                        actuales = self.reglas.setdefault(idioma, {})
+                        for clave, valor in reglas.items():
+                            if clave == "palabras":
+                                actuales[clave] = dict(actuales.get(clave, {}), **valor)
+                            else:
+                                actuales[clave] = valor
+            except Exception as e:
+                print(f"Error al cargar las reglas de corrección: {e}")
+
+        self._compiladas = {idioma: self._compilar(reglas) for idioma, reglas in self.reglas.items()}
+
+    def aplicar(self, texto, idioma):
+        """Aplica todas las correcciones del idioma ('es-ES' o 'es') en una sola pasada"""
+        compilada = self._compiladas.get(idioma.split('-')[0])
+        if compilada is None or not texto:
+            return texto
+
+        patron, palabras = compilada
+
+        def sustituir(coincidencia):
+            if coincidencia.lastgroup == "signo":
+                # Espacio sobrante tras un signo de apertura
+                return coincidencia.group("signo")
+            if coincidencia.lastgroup != "palabra":
+                # Espacio sobrante ante un signo de puntuación
+                return ""
+            original = coincidencia.group("palabra")
+            reemplazo = palabras[original.lower()]
+            if original[0].isupper():
+                reemplazo = reemplazo[:1].upper() + reemplazo[1:]
+            return reemplazo
+
+        return patron.sub(sustituir, texto)
+
+    @staticmethod
+    def _compilar(reglas):
+        palabras = {original.lower(): reemplazo for original, reemplazo in reglas.get("palabras", {}).items()}
+
+        alternativas = []
+        if palabras:
+            # La anticipación con las iniciales descarta enseguida casi todas las posiciones del texto
+            iniciales = "".join(sorted(set(clave[0] for clave in palabras if clave)))
+            alternativas.append(r"(?=[" + re.escape(iniciales) + r"])(?<!\w)(?P<palabra>"
+                                + MotorCorrecciones._patron_prefijos(palabras) + r")(?!\w)")
+        if reglas.get("sin_espacio_antes"):
+            alternativas.append(r" +(?=[" + re.escape(reglas["sin_espacio_antes"]) + r"])")
+        if reglas.get("sin_espacio_despues"):
+            alternativas.append(r"(?P<signo>[" + re.escape(reglas["sin_espacio_despues"]) + r"]) +")
+
+        if not alternativas:
+            return None
+        return re.compile("|".join(alternativas), re.IGNORECASE), palabras
+
+    @staticmethod
+    def _patron_prefijos(claves):
+        # Las claves se factorizan por prefijos comunes ("x(?:a|q)?"): el motor de expresiones
+        # regulares no prueba las alternativas una a una y el coste no crece con el número de reglas
+        raiz = {}
+        for clave in claves:
+            nodo = raiz
+            for c in clave:
+                nodo = nodo.setdefault(c, {})
+            nodo[""] = {}
+
+        def construir(nodo):
+            ramas = [re.escape(c) + construir(hijo) for c, hijo in sorted(nodo.items()) if c]
+            if not ramas:
+                return ""
+            patron = ramas[0] if len(ramas) == 1 else "(?:" + "|".join(ramas) + ")"
+            if "" in nodo:
+                patron = "(?:" + patron + ")?"
+            return patron
+
+        return construir(raiz)
+
+
+class FusionadorSolapamiento:
+    """Quita las palabras repetidas al unir las hipótesis de dos tramos de audio solapados.
+
+    Alinea palabra a palabra el final de la hipótesis anterior con el comienzo
+    de la nueva por programación dinámica (semiglobal: la alineación puede
+    empezar en cualquier punto de la anterior, pero llega hasta su última
+    palabra). La búsqueda se limita a las palabras que caben en la duración
+    conocida del solapamiento, así que el coste es O(solapamiento²) y no
+    depende de la longitud de los textos.
+    """
+
+    ACIERTO, FALLO, HUECO = 2, -1, -1
+
+    def __init__(self, palabras_por_segundo=3.5, margen=3, coincidencias_minimas=2):
+        self.palabras_por_segundo = palabras_por_segundo  # Ritmo de habla holgado para acotar la búsqueda
+        self.margen = margen  # Palabras extra por si el corte del solapamiento parte una palabra
+        self.coincidencias_minimas = coincidencias_minimas
+
+    def fusionar(self, anterior, nuevo, segundos_solapamiento):
+        """Devuelve nuevo sin las palabras iniciales que repiten el final de anterior"""
+        if not anterior or not nuevo or segundos_solapamiento <= 0:
+            return nuevo
+
+        limite = int(math.ceil(segundos_solapamiento * self.palabras_por_segundo)) + self.margen
+        # Sólo se separan las palabras de los extremos; el resto del texto no se recorre
+        palabras = nuevo.split(None, limite)
+        previas = [self._normalizar(palabra) for palabra in anterior.rsplit(None, limite)[-limite:]]
+        nuevas = [self._normalizar(palabra) for palabra in palabras[:limite]]
+
+        corte = self._alinear(previas, nuevas)
+        return ' '.join(palabras[corte:])
+
+    def _alinear(self, previas, nuevas):
+        # Cada celda guarda (puntuación, coincidencias) de la mejor alineación de un sufijo
+        # de previas[:i] con nuevas[:j]; basta con conservar la fila anterior
+        fila = [(-j, 0) for j in range(len(nuevas) + 1)]
+
+        for i in range(1, len(previas) + 1):
+            actual = [(0, 0)]
+            for j in range(1, len(nuevas) + 1):
+                acierto = previas[i - 1] == nuevas[j - 1]
+                diagonal = (fila[j - 1][0] + (self.ACIERTO if acierto else self.FALLO), fila[j - 1][1] + acierto)
+                arriba = (fila[j][0] + self.HUECO, fila[j][1])
+                izquierda = (actual[j - 1][0] + self.HUECO, actual[j - 1][1])
+                actual.append(max(diagonal, arriba, izquierda))
+            fila = actual
+
+        # La alineación termina en la última palabra anterior; el corte es hasta dónde llega en la nueva
+        corte = max(range(len(nuevas) + 1), key=lambda j: fila[j])
+        return corte if fila[corte][1] >= self.coincidencias_minimas else 0
+
+    @staticmethod
+    def _normalizar(palabra):
+        return palabra.lower().strip('.,;:!?¿¡"\'()')
+
+
+class TranscripcionEstructurada:
+    """Almacén de la transcripción: enunciados con sus tiempos, texto, palabras clave y confianza.
+
+    Los registros sólo se añaden: la interfaz muestra cada uno al llegar y las
+    exportaciones (texto, docx, SRT, encriptado) leen de aquí sin pasar por el
+    widget. Cada registro es {'inicio', 'fin', 'texto', 'confianza', 'tiempos', 'claves'}:
+    tiempos son tuplas (inicio, fin, confianza) alineadas con las palabras del texto
+    y claves los tramos (inicio, fin) del texto con palabras clave. Cuando el
+    reconocedor no da tiempos por palabra (Google) se reparten por la geometría del
+    tramo, en proporción a la longitud de cada palabra. Una revisión (la pasada
+    final) añade sus registros y deja sin efecto los que sustituye, sin borrarlos.
+    """
+
+    def __init__(self):
+        self.registros = []
+        self.revisiones = []  # (desde, hasta) de los registros sustituidos por una revisión posterior
+        self._lock = threading.Lock()  # Los hilos de reconocimiento añaden mientras la interfaz exporta
+
+    def __len__(self):
+        return len(self.registros)
+
+    def crear_registro(self, inicio, fin, texto, confianza=None, palabras=None, texto_completo=None, claves=()):
+        """Construye un registro con tiempos por palabra.
+
+        palabras son las de Vosk (sus tiempos se conservan y el texto corregido
+        sustituye al reconocido). texto_completo es la hipótesis entera del tramo
+        cuando texto es sólo su final, tras quitar lo que repetía el solapamiento.
+        """
+        tokens = texto.split()
+        if palabras and len(palabras) == len(tokens):
+            tiempos = tuple((palabra['start'], palabra['end'], palabra.get('conf', 1.0)) for palabra in palabras)
+        else:
+            if palabras:
+                # Las correcciones cambiaron el número de palabras: se reparte dentro de lo que Vosk ocupó
+                inicio, fin = palabras[0]['start'], palabras[-1]['end']
+            tiempos = self.repartir_tiempos(inicio, fin, texto_completo or texto, confianza)
+            if len(tiempos) < len(tokens):
+                tiempos = self.repartir_tiempos(inicio, fin, texto, confianza)
+            tiempos = tiempos[len(tiempos) - len(tokens):]
+
+        if tiempos:
+            inicio, fin = tiempos[0][0], tiempos[-1][1]
+        return {'inicio': inicio, 'fin': fin, 'texto': texto, 'confianza': confianza,
+                'tiempos': tiempos, 'claves': tuple(claves)}
+
+    def agregar(self, inicio, fin, texto, confianza=None, palabras=None, texto_completo=None, claves=()):
+        """Añade un enunciado al final de la transcripción y devuelve su registro"""
+        registro = self.crear_registro(inicio, fin, texto, confianza, palabras, texto_completo, claves)
+        with self._lock:
+            self.registros.append(registro)
+        return registro
+
+    def agregar_texto(self, texto):
+        """Añade texto sin tiempos (por ejemplo, una transcripción desencriptada)"""
+        registro = {'inicio': None, 'fin': None, 'texto': texto, 'confianza': None, 'tiempos': (), 'claves': ()}
+        with self._lock:
+            self.registros.append(registro)
+        return registro
+
+    def revisar(self, desde, registros):
+        """Añade registros que sustituyen a los añadidos a partir de desde (la pasada final a la de en vivo)"""
+        with self._lock:
+            self.revisiones.append((desde, len(self.registros)))
+            self.registros.extend(registros)
+
+    def limpiar(self):
+        with self._lock:
+            self.registros = []
+            self.revisiones = []
+
+    def vigentes(self):
+        """Devuelve, en orden, los registros que ninguna revisión ha sustituido"""
+        with self._lock:
+            registros, revisiones = list(self.registros), list(self.revisiones)
+
+        if not revisiones:
+            return registros
+
+        sustituidos = bytearray(len(registros))
+        for desde, hasta in revisiones:
+            sustituidos[desde:hasta] = b'\x01' * (hasta - desde)
+        return [registro for registro, sustituido in zip(registros, sustituidos) if not sustituido]
+
+    @staticmethod
+    def repartir_tiempos(inicio, fin, texto, confianza=None):
+        """Estima (inicio, fin, confianza) de cada palabra de texto repartiendo [inicio, fin] según su longitud"""
+        tokens = texto.split()
+        total = sum(len(token) + 1 for token in tokens)
+        if not total:
+            return ()
+
+        tiempos = []
+        duracion = max(0.0, fin - inicio)
+        confianza = confianza if confianza is not None else 1.0
+        acumulado = 0
+        for token in tokens:
+            comienzo = inicio + duracion * acumulado / total
+            acumulado += len(token) + 1
+            tiempos.append((comienzo, inicio + duracion * acumulado / total, confianza))
+        return tuple(tiempos)
+
+    @staticmethod
+    def marca_tiempo(segundos):
+        """Formatea segundos como la marca [hh:mm:ss] de la transcripción"""
+        segundos = int(segundos)
+        return f"[{segundos // 3600:02d}:{segundos % 3600 // 60:02d}:{segundos % 60:02d}]"
+
+    def a_texto(self):
+        """Texto de la transcripción con una marca de tiempo por enunciado"""
+        partes = []
+        for registro in self.vigentes():
+            if registro['inicio'] is None:
+                partes.append(f"{registro['texto']}\n\n")
+            else:
+                partes.append(f"{self.marca_tiempo(registro['inicio'])} {registro['texto']}\n\n")
+        return "".join(partes).strip()
+
+    def a_srt(self, max_caracteres=84, max_duracion=6.0):
+        """Genera subtítulos SRT cortando los enunciados por sus palabras en bloques legibles"""
+        lineas = []
+        for registro in self.vigentes():
+            palabras, tiempos = registro['texto'].split(), registro['tiempos']
+            if not tiempos:
+                continue
+
+            # Cada bloque es el tramo [primera, k) de palabras del enunciado
+            primera, caracteres = 0, 0
+            for k in range(len(palabras) + 1):
+                if k < len(palabras) and (k == primera or (caracteres + len(palabras[k]) <= max_caracteres and
+                                                           tiempos[k][1] - tiempos[primera][0] <= max_duracion)):
+                    caracteres += len(palabras[k]) + 1
+                    continue
+
+                lineas.append(f"{len(lineas) + 1}\n"
+                              f"{self._tiempo_srt(tiempos[primera][0])} --> {self._tiempo_srt(tiempos[k - 1][1])}\n"
+                              f"{' '.join(palabras[primera:k])}\n")
+                primera, caracteres = k, len(palabras[k]) + 1 if k < len(palabras) else 0
+        return "\n".join(lineas)
+
+    @staticmethod
+    def _tiempo_srt(segundos):
+        milisegundos = int(round(max(0.0, segundos) * 1000))
+        horas, milisegundos = divmod(milisegundos, 3600000)
+        minutos, milisegundos = divmod(milisegundos, 60000)
+        segs, milisegundos = divmod(milisegundos, 1000)
+        return f"{horas:02d}:{minutos:02d}:{segs:02d},{milisegundos:03d}"
+
+
+class ActualizadorInterfaz:
+    """Agrupa en lotes las actualizaciones de la interfaz que llegan desde los hilos de trabajo.
+
+    Los hilos encolan texto (fragmentos sueltos o (etiqueta, texto)) y mensajes de
+    estado sin tocar Tk. El hilo de la interfaz vacía la cola cada intervalo_ms:
+    todo el texto pendiente entra en el widget con una sola inserción y un solo
+    desplazamiento al final, y de los estados sólo se muestra el último del ciclo.
+    Así una ráfaga de resultados no inunda el bucle de eventos con un after(0)
+    por enunciado.
+    """
+
+    def __init__(self, root, texto_widget, estado_var, intervalo_ms=80):
+        self.root = root
+        self.texto_widget = texto_widget
+        self.estado_var = estado_var
+        self.intervalo_ms = intervalo_ms
+        self.cola = queue.Queue()
+        self._estado_pendiente = None  # Sólo importa el último: se sobrescribe en lugar de encolarse
+        self.root.after(self.intervalo_ms, self._vaciar)
+
+    def insertar(self, *fragmentos):
+        """Encola texto para el final del widget (se puede llamar desde cualquier hilo)"""
+        if fragmentos:
+            self.cola.put(fragmentos)
+
+    def estado(self, texto):
+        """Cambia el mensaje de estado en el próximo ciclo (se puede llamar desde cualquier hilo)"""
+        self._estado_pendiente = texto
+
+    def descartar(self):
+        """Olvida el texto pendiente (al limpiar la transcripción)"""
+        try:
+            while True:
+                self.cola.get_nowait()
+        except queue.Empty:
+            pass
+
+    def _vaciar(self):
+        try:
+            argumentos = []
+            try:
+                while True:
+                    for fragmento in self.cola.get_nowait():
+                        if isinstance(fragmento, tuple):
+                            etiqueta, contenido = fragmento
+                            argumentos.extend((contenido, etiqueta))
+                        else:
+                            argumentos.extend((fragmento, ()))
+            except queue.Empty:
+                pass
+
+            if argumentos:
+                # Text.insert admite varios pares (texto, etiquetas) en una sola llamada
+                self.texto_widget.insert(tk.END, *argumentos)
+                self.texto_widget.see(tk.END)
+
+            estado, self._estado_pendiente = self._estado_pendiente, None
+            if estado is not None and estado != self.estado_var.get():
+                self.estado_var.set(estado)
+
+        except Exception as e:
+            print(f"Error al actualizar la interfaz: {e}")
+
+        finally:
+            self.root.after(self.intervalo_ms, self._vaciar)
+
+
 class TranscriptorMultilingue:
 
     def __init__(self, root):
@@ -73,9 +1555,29 @@ class TranscriptorMultilingue:
         # Inicializar variables
         self.audio = pyaudio.PyAudio()
         self.stream = None  # Inicializar stream como None
-        self.frames = []  # Inicializar frames para almacenar los datos de audio
+        self.buffer_audio = None  # Buffer circular con el audio de la sesión actual
+        self.escritor_wav = None  # Escritor del WAV de la sesión actual
+        self.segundos_buffer_audio = 120  # Capacidad del buffer circular en segundos
+        self.guardar_segmentos_depuracion = False  # Volcar a disco los segmentos enviados a Google
+        self.peticiones_simultaneas = 3  # Peticiones a Google en vuelo durante la transcripción online
+        self.hilos_vosk = max(1, (os.cpu_count() or 1) - 1)  # Reconocedores Vosk en paralelo para archivos
+        self.sustraccion_espectral = False  # Añadir sustracción espectral a la cancelación de ruido
+        self.segmentar_por_voz = True  # Cortar el audio en vivo por enunciados en lugar de ventanas fijas
+        self.umbral_confianza_final = 0.8  # Los segmentos en vivo con menos confianza se revisan al detener
+        self.resultados_sesion = []  # Resultados en vivo: {'inicio', 'fin', 'texto', 'confianza', 'palabras'}
+        self.cobertura_sesion = 0.0  # Segundos de la sesión que la pasada en vivo ya decodificó
+        self.hilo_transcripcion = None  # Hilo de la transcripción en vivo de la sesión actual
         self.modelos_vosk = {}
         self.palabras_clave = set()
+        self.automata_palabras_clave = AutomataPalabrasClave()  # Se reconstruye al cambiar palabras_clave
+        self.fusionador_solapamiento = FusionadorSolapamiento()  # Une las hipótesis de tramos solapados
+        self.ultimo_resultado_online = None  # (segundo_fin, texto) del último segmento online mostrado
+        self.transcripcion = TranscripcionEstructurada()  # Almacén del que se muestran y exportan los enunciados
+        self.inicio_sesion_transcripcion = 0  # Primer registro de la sesión en vivo actual
+        self.motor_correcciones = MotorCorrecciones(
+            CORRECCIONES_PREDETERMINADAS,
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), "correcciones.json")
+        )
         self.estado_var = tk.StringVar()
         self.idioma_var = tk.StringVar(value="es-ES")
         self.modo_reconocimiento = tk.StringVar(value="online")
@@ -86,7 +1588,10 @@ class TranscriptorMultilingue:
         self.duracion_segmento = 3
         self.superposicion = 1
         self.reconocedor = sr.Recognizer()
+        self.reconocedor.operation_timeout = 30  # Una petición colgada no bloquea para siempre el canal de reconocimiento
+        self.calibrador_ruido = CalibradorRuido(self.reconocedor)
         self.cancelacion_ruido_var = tk.BooleanVar(value=True)
+        self.cancelacion_ruido_archivo = True  # Opción elegida en el diálogo de transcripción de archivos
         self.grabacion_activa = False  # Variable para controlar el estado de la grabación
         self.actualizando_tiempo = False  # Inicializar variable para tiempo
         self.tasa_muestreo = 16000  # Establecer tasa de muestreo predeterminada
@@ -97,6 +1602,10 @@ class TranscriptorMultilingue:
         self.tamano_var = tk.StringVar(value="0 MB")
         self.palabras_detectadas_var = tk.StringVar(value="0")
         self.grabando = False  # Variable para toggle_grabacion
+        self.modelo_listo = threading.Event()  # Se activa cuando el modelo Vosk seleccionado está en memoria
+        self.ruta_modelo_solicitada = None  # Modelo que debe estar precargado según la selección actual
+        self.ruta_modelo_precargado = None  # Modelo del que se mantiene una referencia en el registro
+        self.lock_precarga = threading.Lock()
 
         # Cargar configuración
         self.cargar_modelos_vosk()
@@ -105,6 +1614,12 @@ class TranscriptorMultilingue:
         # Crear interfaz
         self.crear_interfaz()
 
+        # Las actualizaciones de los hilos de trabajo llegan a la interfaz en lotes
+        self.interfaz = ActualizadorInterfaz(self.root, self.texto_transcripcion, self.estado_var)
+
+        # Mostrar el modo configurado y precargar el modelo Vosk si corresponde
+        self.actualizar_estado_modo()
+
     def setup_logger(self):
         """Configura el logger para registrar eventos"""
         import logging
@@ -158,7 +1673,7 @@ class TranscriptorMultilingue:
                     self.reconocedor.dynamic_energy_threshold = config["dynamic_energy_threshold"]
 
                 if "cancelacion_ruido" in config:
-                    self.cancelacion_ruido_var.set(config["cancelacion_ruido"] and pydub_disponible)
+                    self.cancelacion_ruido_var.set(config["cancelacion_ruido"] and numpy_disponible)
 
                 if "formato_salida" in config:
                     self.formato_salida.set(config["formato_salida"])
@@ -178,6 +1693,30 @@ class TranscriptorMultilingue:
                 if "idioma" in config:
                     self.idioma_var.set(config["idioma"])
 
+                if "segundos_buffer_audio" in config:
+                    self.segundos_buffer_audio = config["segundos_buffer_audio"]
+
+                if "guardar_segmentos_depuracion" in config:
+                    self.guardar_segmentos_depuracion = config["guardar_segmentos_depuracion"]
+
+                if "peticiones_simultaneas" in config:
+                    self.peticiones_simultaneas = max(1, int(config["peticiones_simultaneas"]))
+
+                if "hilos_vosk" in config:
+                    self.hilos_vosk = max(1, int(config["hilos_vosk"]))
+
+                if "sustraccion_espectral" in config:
+                    self.sustraccion_espectral = config["sustraccion_espectral"]
+
+                if "segmentar_por_voz" in config:
+                    self.segmentar_por_voz = config["segmentar_por_voz"]
+
+                if "umbral_confianza_final" in config:
+                    self.umbral_confianza_final = config["umbral_confianza_final"]
+
+                if "memoria_modelos_mb" in config:
+                    registro_modelos_vosk.memoria_maxima_mb = config["memoria_modelos_mb"]
+
                 self.logger.info("Configuración cargada desde archivo")
 
             except Exception as e:
@@ -192,6 +1731,7 @@ class TranscriptorMultilingue:
                 with open(archivo_palabras_clave, 'r', encoding='utf-8') as f:
                     palabras = [l.strip().lower() for l in f.readlines() if l.strip()]
                     self.palabras_clave = set(palabras)
+                    self.automata_palabras_clave = AutomataPalabrasClave(self.palabras_clave)
 
                 self.logger.info(f"Palabras clave cargadas: {len(self.palabras_clave)}")
 
@@ -313,8 +1853,29 @@ class TranscriptorMultilingue:
             return
 
         self.grabacion_activa = True
-        self.frames = []
-        self.estado_var.set("Grabando...")
+        self.resultados_sesion = []
+        self.cobertura_sesion = 0.0
+        self.ultimo_resultado_online = None
+        self.inicio_sesion_transcripcion = len(self.transcripcion)
+
+        # El audio de la sesión se escribe en disco a medida que se captura
+        nombre_archivo = f"audio_temporal_{datetime.now().strftime('%Y%m%d_%H%M%S')}.wav"
+        self.escritor_wav = EscritorWavContinuo(
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), nombre_archivo),
+            tasa=16000
+        )
+        self.buffer_audio = BufferCircularAudio(
+            segundos=self.segundos_buffer_audio,
+            tasa=16000,
+            tamano_bloque=1024,
+            desborde=self.escritor_wav
+        )
+
+        if self.modo_reconocimiento.get() == "offline" and not self.modelo_listo.is_set():
+            # El audio se acumula y se decodifica en cuanto termine la carga del modelo
+            self.interfaz.estado("Grabando (cargando modelo)...")
+        else:
+            self.interfaz.estado("Grabando...")
 
         try:
             # Obtener el índice del dispositivo de audio seleccionado
@@ -330,12 +1891,17 @@ class TranscriptorMultilingue:
                 frames_per_buffer=1024,
             )
 
+            # La cancelación de ruido se aplica a cada bloque capturado, una sola vez y con estado continuo
+            reductor = self.crear_reductor_ruido(self.cancelacion_ruido_var.get(), 16000)
+
             def grabar_audio():
                 print("Hilo de grabación iniciado")
                 while self.grabacion_activa:
                     try:
                         data = self.stream.read(1024, exception_on_overflow=False)
-                        self.frames.append(data)
+                        if reductor:
+                            data = reductor.procesar_pcm(data)
+                        self.buffer_audio.escribir(data)
                     except Exception as e:
                         print(f"Error durante la grabación: {e}")
                         # Añadir un pequeño tiempo de espera antes de reintentar
@@ -356,15 +1922,19 @@ class TranscriptorMultilingue:
             self.boton_detener.config(state=tk.NORMAL)
 
             if self.modo_reconocimiento.get() == "online":
-                threading.Thread(target=self.transcribir_online, daemon=True).start()
+                self.hilo_transcripcion = threading.Thread(target=self.transcribir_online, daemon=True)
+                self.hilo_transcripcion.start()
             elif self.modo_reconocimiento.get() == "offline":
-                threading.Thread(target=self.transcribir_offline, daemon=True).start()
+                self.hilo_transcripcion = threading.Thread(target=self.transcribir_offline, daemon=True)
+                self.hilo_transcripcion.start()
 
         except Exception as e:
             print(f"Error al iniciar la transcripción: {e}")
-            self.estado_var.set("Error al iniciar")
+            self.interfaz.estado("Error al iniciar")
             messagebox.showerror("Error", f"No se pudo iniciar la transcripción: {str(e)}")
             self.grabacion_activa = False
+            if self.escritor_wav:
+                self.escritor_wav.cerrar()
             if self.stream:
                 try:
                     self.stream.stop_stream()
@@ -425,7 +1995,7 @@ class TranscriptorMultilingue:
             return
 
         self.grabacion_activa = False
-        self.estado_var.set("Deteniendo...")
+        self.interfaz.estado("Deteniendo...")
 
         try:
             # Esperar a que terminen los hilos
@@ -434,6 +2004,14 @@ class TranscriptorMultilingue:
                 time.sleep(0.1)
                 tiempo_espera += 1
 
+            # Esperar a que el hilo de grabación escriba su último bloque
+            if getattr(self, 'hilo_grabacion', None):
+                self.hilo_grabacion.join(timeout=1.0)
+
+            # Despertar a los hilos de transcripción que esperan audio
+            if self.buffer_audio:
+                self.buffer_audio.cerrar()
+
             if self.stream:
                 self.stream.stop_stream()
                 self.stream.close()
@@ -443,8 +2021,13 @@ class TranscriptorMultilingue:
             self.audio.terminate()
             self.audio = pyaudio.PyAudio()
 
+            # Cerrar el archivo WAV que se ha ido escribiendo durante la grabación
+            if self.escritor_wav:
+                self.escritor_wav.cerrar()
+
             # Guardar el audio capturado si hay frames
-            if self.frames:
+            if self.buffer_audio and self.buffer_audio.total_escritos > 0:
+
                 # Procesar el audio completo para una transcripción final
                 threading.Thread(target=self.procesar_audio_completo, daemon=True).start()
 
@@ -458,12 +2041,12 @@ class TranscriptorMultilingue:
             self.root.after(0, lambda: self.boton_iniciar.config(state=tk.NORMAL))
             self.root.after(0, lambda: self.boton_detener.config(state=tk.DISABLED))
 
-            self.estado_var.set("Listo")
+            self.interfaz.estado("Listo")
             print("Grabación detenida correctamente")
 
         except Exception as e:
             print(f"Error al detener la transcripción: {e}")
-            self.estado_var.set("Error al detener")
+            self.interfaz.estado("Error al detener")
             messagebox.showerror("Error", f"No se pudo detener la transcripción: {str(e)}")
 
             # Asegurar que los botones estén en el estado correcto en caso de error
@@ -471,21 +2054,12 @@ class TranscriptorMultilingue:
             self.root.after(0, lambda: self.boton_detener.config(state=tk.DISABLED))
 
     def guardar_audio_temporal(self):
-        """Guarda el audio capturado en un archivo temporal (para depuración)."""
-        if self.frames:
-            nombre_archivo = f"audio_temporal_{datetime.now().strftime('%Y%m%d_%H%M%S')}.wav"
-            ruta_archivo = os.path.join(os.path.dirname(os.path.abspath(__file__)), nombre_archivo)
-            try:
-                with wave.open(ruta_archivo, 'wb') as wf:
-                    wf.setnchannels(1)  # Mono
-                    wf.setsampwidth(self.audio.get_sample_size(pyaudio.paInt16))
-                    wf.setframerate(16000)
-                    wf.writeframes(b''.join(self.frames))
+        """Devuelve el archivo WAV de la sesión, escrito en disco durante la grabación (para depuración)."""
+        if self.escritor_wav:
+            ruta_archivo = self.escritor_wav.cerrar()
+            if os.path.exists(ruta_archivo):
                 print(f"Audio guardado en: {ruta_archivo}")  # Depuración
                 return ruta_archivo
-            except Exception as e:
-                print(f"Error al guardar audio temporal: {e}")  # Depuración
-                return None
         return None
     
     
@@ -507,6 +2081,24 @@ class TranscriptorMultilingue:
         idioma = self.idioma_var.get()
         print(f"Iniciando transcripción online en idioma: {idioma}")
 
+        # Las respuestas de Google se publican en el orden de los segmentos aunque lleguen desordenadas
+        canal = CanalReconocimientoOrdenado(self.entregar_resultado_online, self.peticiones_simultaneas)
+
+        try:
+            self.bucle_transcripcion_online(idioma, canal)
+        finally:
+            # Esperar a las peticiones en curso para no perder el final de la grabación
+            canal.cerrar(timeout=30)
+
+    def bucle_transcripcion_online(self, idioma, canal):
+        """Agrupa el audio capturado en segmentos y los envía al canal de reconocimiento"""
+        buffer_audio = self.buffer_audio
+        buffer_audio.crear_cursor("online")
+
+        if self.segmentar_por_voz and numpy_disponible:
+            self.bucle_transcripcion_online_voz(idioma, canal)
+            return
+
         buffer_frames = []
         contador = 0
 
@@ -514,100 +2106,159 @@ class TranscriptorMultilingue:
             try:
                 # Esperar a tener suficientes frames para procesar
                 while len(buffer_frames) < 16000 * self.duracion_segmento / 1024 and self.grabacion_activa:
-                    if len(self.frames) > contador:
-                        buffer_frames.append(self.frames[contador])
-                        contador += 1
-                    else:
-                        time.sleep(0.1)
+                    # Bloquea hasta que el hilo de captura publique un bloque nuevo
+                    data = buffer_audio.leer("online", timeout=0.5)
+                    if data is not None:
+                        buffer_frames.append(data)
+                        contador = buffer_audio.posicion("online")
 
                 if not self.grabacion_activa:
                     break
 
-                # Crear archivo temporal para el segmento actual
-                with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as temp_file:
-                    ruta_temp = temp_file.name
-
-                # Guardar el segmento en el archivo temporal
-                with wave.open(ruta_temp, 'wb') as wf:
-                    wf.setnchannels(1)
-                    wf.setsampwidth(self.audio.get_sample_size(pyaudio.paInt16))
-                    wf.setframerate(16000)
-                    wf.writeframes(b''.join(buffer_frames))
-
-                # Transcribir el segmento
-                with sr.AudioFile(ruta_temp) as fuente:
-                    try:
-                        audio_data = self.reconocedor.record(fuente)
-                        texto = self.reconocedor.recognize_google(audio_data, language=idioma)
-
-                        if texto.strip():
-                            texto = self.aplicar_correcciones_post(texto, idioma)
+                # Construir el segmento directamente en memoria a partir del PCM capturado
+                datos_segmento = b''.join(buffer_frames)
+                segundo_inicio = contador * 1024 / 16000 - len(datos_segmento) / 32000.0
+                self.enviar_segmento_online(canal, datos_segmento, segundo_inicio, idioma)
 
-                            # Calcular el tiempo del segmento
-                            tiempo_seg = contador * 1024 / 16000
-                            horas = int(tiempo_seg // 3600)
-                            minutos = int((tiempo_seg % 3600) // 60)
-                            segundos = int(tiempo_seg % 60)
-                            tiempo_formateado = f"[{horas:02d}:{minutos:02d}:{segundos:02d}]"
+                # Mantener un buffer deslizante con superposición
+                frames_a_mantener = int((16000 * self.superposicion / 1024))
+                buffer_frames = buffer_frames[-frames_a_mantener:] if frames_a_mantener > 0 else []
 
-                            # Detectar palabras clave en el texto
-                            texto_con_etiquetas = self.detectar_palabras_clave(texto)
+            except Exception as e:
+                print(f"Error en el bucle de transcripción online: {e}")
+                time.sleep(0.5)
 
-                            # Actualizar la transcripción con el tiempo
-                            self.root.after(0, lambda t=tiempo_formateado, txt=texto_con_etiquetas: 
-                                        self.actualizar_transcripcion_con_tiempo(t, txt))
-                    except sr.UnknownValueError:
-                        # No se detectó texto claro
-                        pass
-                    except Exception as e:
-                        print(f"Error en transcripción online: {e}")
+    def bucle_transcripcion_online_voz(self, idioma, canal):
+        """Envía al canal de reconocimiento sólo los enunciados que delimita el detector de voz"""
+        buffer_audio = self.buffer_audio
+        detector = DetectorVoz(16000, calibrador=self.calibrador_ruido)
 
-                # Eliminar archivo temporal
-                try:
-                    os.unlink(ruta_temp)
-                except:
-                    pass
+        while self.grabacion_activa:
+            try:
+                data = buffer_audio.leer("online", timeout=0.5)
+                if data is None:
+                    continue
 
-                # Mantener un buffer deslizante con superposición
-                frames_a_mantener = int((16000 * self.superposicion / 1024))
-                buffer_frames = buffer_frames[-frames_a_mantener:] if frames_a_mantener > 0 else []
+                # El silencio no llega a Google y ninguna palabra se reconoce dos veces
+                for segundo_inicio, datos_segmento in detector.procesar(data):
+                    self.enviar_segmento_online(canal, datos_segmento, segundo_inicio, idioma)
 
             except Exception as e:
                 print(f"Error en el bucle de transcripción online: {e}")
                 time.sleep(0.5)
 
-    def actualizar_transcripcion_con_tiempo(self, tiempo, texto):
-        """Actualiza el área de transcripción añadiendo una marca de tiempo"""
-        if isinstance(texto, str):
-            self.texto_transcripcion.insert(tk.END, f"{tiempo} {texto}\n\n")
-        else:
-            # Si texto es una lista de elementos (texto normal y con etiquetas)
-            self.texto_transcripcion.insert(tk.END, tiempo + " ")
-            for item in texto:
-                if isinstance(item, tuple):
-                    etiqueta, contenido = item
-                    self.texto_transcripcion.insert(tk.END, contenido, etiqueta)
-                else:
-                    self.texto_transcripcion.insert(tk.END, item)
-            self.texto_transcripcion.insert(tk.END, "\n\n")
+        # Al detener, procesar lo que quede capturado y el enunciado que estuviera en curso
+        data = buffer_audio.leer("online")
+        enunciados = []
+        while data is not None:
+            enunciados.extend(detector.procesar(data))
+            data = buffer_audio.leer("online")
+        enunciados.extend(detector.vaciar())
 
-        self.texto_transcripcion.see(tk.END)
+        for segundo_inicio, datos_segmento in enunciados:
+            self.enviar_segmento_online(canal, datos_segmento, segundo_inicio, idioma)
 
-    def actualizar_transcripcion(self, texto):
-        """Actualiza el área de transcripción sin añadir marca de tiempo"""
-        if isinstance(texto, str):
-            self.texto_transcripcion.insert(tk.END, texto + "\n\n")
-        else:
-            # Si texto es una lista de elementos (texto normal y con etiquetas)
-            for item in texto:
-                if isinstance(item, tuple):
-                    etiqueta, contenido = item
-                    self.texto_transcripcion.insert(tk.END, contenido, etiqueta)
-                else:
-                    self.texto_transcripcion.insert(tk.END, item)
-            self.texto_transcripcion.insert(tk.END, "\n\n")
+        # Todo el audio capturado ha pasado por el detector: no queda cola sin decodificar
+        self.cobertura_sesion = max(self.cobertura_sesion, buffer_audio.posicion("online") * 1024 / 16000)
+
+    def enviar_segmento_online(self, canal, datos_segmento, segundo_inicio, idioma):
+        """Empaqueta un segmento de PCM capturado y lo envía al canal de reconocimiento"""
+        audio_data = sr.AudioData(datos_segmento, 16000, self.audio.get_sample_size(pyaudio.paInt16))
+
+        if self.guardar_segmentos_depuracion:
+            self.volcar_segmento_depuracion(audio_data, int(segundo_inicio * 1000))
+
+        # Transcribir el segmento en el pool; bloquea si ya hay demasiadas peticiones en vuelo
+        segundo_fin = segundo_inicio + len(datos_segmento) / 32000.0
+        canal.enviar(self.reconocer_segmento_online, audio_data, idioma, contexto=(segundo_inicio, segundo_fin))
+
+    def reconocer_segmento_online(self, audio_data, idioma):
+        """Envía un segmento a Google y devuelve (texto corregido, confianza o None) (se ejecuta en el pool)"""
+        try:
+            respuesta = self.reconocedor.recognize_google(audio_data, language=idioma, show_all=True)
+        except sr.UnknownValueError:
+            respuesta = None
+
+        if not respuesta or not respuesta.get('alternative'):
+            # No se detectó texto claro
+            return "", None
+
+        mejor = respuesta['alternative'][0]
+        texto = mejor.get('transcript', '')
+        if texto.strip():
+            texto = self.aplicar_correcciones_post(texto, idioma)
+        return texto, mejor.get('confidence')
+
+    def entregar_resultado_online(self, contexto, resultado, error):
+        """Publica en la interfaz, en orden, el resultado de un segmento online"""
+        tiempo_seg, segundo_fin = contexto
+
+        if error is not None:
+            print(f"Error en transcripción online: {error}")
+            # Confianza nula: la pasada final vuelve a reconocer este segmento
+            self.registrar_resultado_sesion(tiempo_seg, segundo_fin, "", 0.0)
+            return
+
+        texto, confianza = resultado
+        self.registrar_resultado_sesion(tiempo_seg, segundo_fin, texto, confianza)
+
+        if not texto or not texto.strip():
+            return
+
+        # Las ventanas fijas se solapan: no repetir en pantalla las palabras ya mostradas
+        anterior = self.ultimo_resultado_online
+        self.ultimo_resultado_online = (segundo_fin, texto)
+        texto_completo = texto
+        if anterior:
+            texto = self.fusionador_solapamiento.fusionar(anterior[1], texto, anterior[0] - tiempo_seg)
+            if not texto:
+                return
+
+        # Google no da tiempos por palabra: se estiman con la geometría del segmento
+        self.publicar_enunciado(tiempo_seg, segundo_fin, texto, confianza, texto_completo=texto_completo)
+
+    def publicar_enunciado(self, inicio, fin, texto, confianza=None, palabras=None, texto_completo=None):
+        """Añade un enunciado al almacén de la transcripción y lo muestra en la interfaz"""
+        registro = self.transcripcion.agregar(inicio, fin, texto, confianza, palabras, texto_completo,
+                                              self.buscar_palabras_clave(texto))
+        self.mostrar_enunciado(registro)
+        return registro
+
+    def mostrar_enunciado(self, registro):
+        """Encola un registro del almacén para el área de transcripción, con su marca de tiempo y palabras clave"""
+        texto_con_etiquetas = self.detectar_palabras_clave(registro['texto'], registro['claves'])
+        self.actualizar_transcripcion_con_tiempo(TranscripcionEstructurada.marca_tiempo(registro['inicio']),
+                                                 texto_con_etiquetas)
+
+    def registrar_resultado_sesion(self, inicio, fin, texto, confianza, palabras=None):
+        """Anota un resultado de la pasada en vivo para que la pasada final sólo revise lo necesario"""
+        self.resultados_sesion.append({'inicio': inicio, 'fin': fin, 'texto': texto, 'confianza': confianza,
+                                       'palabras': palabras})
+        self.cobertura_sesion = max(self.cobertura_sesion, fin)
+
+    def volcar_segmento_depuracion(self, audio_data, contador):
+        """Guarda en disco un segmento enviado al reconocedor (sólo para depuración)"""
+        try:
+            dir_segmentos = os.path.join(os.path.dirname(os.path.abspath(__file__)), "segmentos_depuracion")
+            if not os.path.exists(dir_segmentos):
+                os.makedirs(dir_segmentos)
+
+            ruta_segmento = os.path.join(dir_segmentos, f"segmento_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{contador}.wav")
+            with open(ruta_segmento, 'wb') as f:
+                f.write(audio_data.get_wav_data())
+        except Exception as e:
+            print(f"Error al guardar segmento de depuración: {e}")
+
+    def actualizar_transcripcion_con_tiempo(self, tiempo, texto):
+        """Añade al área de transcripción un texto con marca de tiempo (se puede llamar desde cualquier hilo)"""
+        # texto puede ser una lista de elementos (texto normal y con etiquetas)
+        fragmentos = [texto] if isinstance(texto, str) else list(texto)
+        self.interfaz.insertar(tiempo + " ", *fragmentos, "\n\n")
 
-        self.texto_transcripcion.see(tk.END)
+    def actualizar_transcripcion(self, texto):
+        """Añade al área de transcripción un texto sin marca de tiempo (se puede llamar desde cualquier hilo)"""
+        fragmentos = [texto] if isinstance(texto, str) else list(texto)
+        self.interfaz.insertar(*fragmentos, "\n\n")
 
     def transcribir_offline(self):
         """Realiza la transcripción offline usando Vosk"""
@@ -622,7 +2273,7 @@ class TranscriptorMultilingue:
 
         # Verificar si tenemos un modelo para este idioma
         if idioma_base not in self.modelos_vosk:
-            self.estado_var.set(f"No hay modelo para {idioma_base}")
+            self.interfaz.estado(f"No hay modelo para {idioma_base}")
             print(f"No se encontró modelo Vosk para el idioma: {idioma_base}")
             self.root.after(0, lambda: messagebox.showwarning("Modelo no disponible", 
                                     f"No se encontró modelo para el idioma {idioma_base}. "
@@ -631,54 +2282,49 @@ class TranscriptorMultilingue:
             self.transcribir_online()
             return
 
-        try:
-            # Cargar el modelo en este punto, ya que antes solo guardamos la ruta
-            ruta_modelo = self.modelos_vosk[idioma_base]
-            if not os.path.exists(ruta_modelo):
-                raise FileNotFoundError(f"La ruta del modelo {ruta_modelo} no existe")
+        ruta_modelo = self.modelos_vosk[idioma_base]
+        modelo_obtenido = False
 
-            print(f"Cargando modelo Vosk desde: {ruta_modelo}")
-            model = Model(ruta_modelo)
+        try:
+            # Obtener el modelo compartido (sólo se carga si no está ya en memoria)
+            model = registro_modelos_vosk.obtener(ruta_modelo)
+            modelo_obtenido = True
             rec = KaldiRecognizer(model, 16000)
+            rec.SetWords(True)
+
+            if self.grabacion_activa:
+                self.interfaz.estado("Grabando...")
 
-            buffer_size = 4000  # Tamaño del buffer para procesar
+            buffer_audio = self.buffer_audio
+            buffer_audio.crear_cursor("offline")
             contador = 0
             ultimo_texto = ""
 
             while self.grabacion_activa:
                 # Procesar datos de audio en bloques
-                if len(self.frames) > contador:
-                    data = self.frames[contador]
-                    contador += 1
+                # Bloquea hasta que el hilo de captura publique un bloque nuevo
+                data = buffer_audio.leer("offline", timeout=0.5)
+                if data is not None:
+                    contador = buffer_audio.posicion("offline")
 
                     if rec.AcceptWaveform(data):
-                        result = json.loads(rec.Result())
-                        if "text" in result and result["text"].strip():
-                            texto = result["text"]
+                        enunciado = self.leer_enunciado_vosk(rec.Result(), 0.0)
+                        if enunciado:
+                            tiempo_seg, texto, palabras = enunciado
 
                             # Evitar repeticiones
                             if texto != ultimo_texto:
                                 ultimo_texto = texto
                                 texto = self.aplicar_correcciones_post(texto, idioma)
 
-                                # Calcular el tiempo
-                                tiempo_seg = contador * 1024 / 16000
-                                horas = int(tiempo_seg // 3600)
-                                minutos = int((tiempo_seg % 3600) // 60)
-                                segundos = int(tiempo_seg % 60)
-                                tiempo_formateado = f"[{horas:02d}:{minutos:02d}:{segundos:02d}]"
-
-                                # Detectar palabras clave
-                                texto_con_etiquetas = self.detectar_palabras_clave(texto)
-
-                                # Actualizar la transcripción
-                                self.root.after(0, lambda t=tiempo_formateado, txt=texto_con_etiquetas: 
-                                            self.actualizar_transcripcion_con_tiempo(t, txt))
+                                # El enunciado queda cerrado hasta su última palabra
+                                segundo_fin = palabras[-1]['end'] if palabras else contador * 1024 / 16000
+                                confianza = self.confianza_vosk(palabras)
+                                self.registrar_resultado_sesion(tiempo_seg, segundo_fin, texto, confianza, palabras)
+                                self.publicar_enunciado(tiempo_seg, segundo_fin, texto, confianza, palabras)
                 else:
-                    # Esperar a que haya más frames
-                    time.sleep(0.1)
-
-                    # Procesar lo que tenemos si llevamos tiempo sin procesar
+                    # No llegó audio nuevo en el tiempo de espera:
+                    # procesar lo que tenemos si llevamos tiempo sin procesar
                     if contador % 50 == 0:
                         result = json.loads(rec.PartialResult())
                         if "partial" in result and result["partial"].strip():
@@ -701,16 +2347,25 @@ class TranscriptorMultilingue:
                                 texto_con_etiquetas = self.detectar_palabras_clave(texto)
 
                                 # Actualizar la transcripción
-                                self.root.after(0, lambda t=tiempo_formateado, txt=texto_con_etiquetas: 
-                                            self.actualizar_transcripcion_con_tiempo(t, txt))
+                                self.actualizar_transcripcion_con_tiempo(tiempo_formateado, texto_con_etiquetas)
 
         except Exception as e:
             print(f"Error en transcripción offline: {e}")
-            self.estado_var.set(f"Error: {str(e)}")
+            self.interfaz.estado(f"Error: {str(e)}")
+
+            # Liberar el modelo antes de pasar al modo online
+            if modelo_obtenido:
+                registro_modelos_vosk.liberar(ruta_modelo)
+                modelo_obtenido = False
+
             # Intentar usar el modo online como fallback
             if self.grabacion_activa:
                 self.modo_reconocimiento.set("online")
                 self.transcribir_online()
+
+        finally:
+            if modelo_obtenido:
+                registro_modelos_vosk.liberar(ruta_modelo)
                 
                 
                 
@@ -725,6 +2380,9 @@ class TranscriptorMultilingue:
         # Normalizar espacios
         texto = " ".join(texto.split())
 
+        # Correcciones específicas por idioma, compiladas al iniciar y aplicadas en una sola pasada
+        texto = self.motor_correcciones.aplicar(texto, idioma)
+
         # Asegurar que la primera letra sea mayúscula
         if texto and len(texto) > 0:
             texto = texto[0].upper() + texto[1:]
@@ -733,157 +2391,231 @@ class TranscriptorMultilingue:
         if texto and not texto[-1] in ['.', '!', '?', ':', ';']:
             texto += '.'
 
-        # Correcciones específicas por idioma
-        if idioma.startswith('es'):
-            # Ejemplo: Corregir "q" por "que"
-            texto = texto.replace(" q ", " que ")
-            texto = texto.replace("Q ", "Que ")
-
-            # Otras correcciones específicas para español
-            reemplazos_es = {
-                " xq ": " porque ",
-                " xa ": " para ",
-                " tb ": " también ",
-                " x ": " por ",
-            }
-
-            for original, reemplazo in reemplazos_es.items():
-                texto = texto.replace(original, reemplazo)
-
-        elif idioma.startswith('en'):
-            # Correcciones específicas para inglés
-            reemplazos_en = {
-                " u ": " you ",
-                " r ": " are ",
-                " y ": " why ",
-                " btw ": " by the way ",
-            }
-
-            for original, reemplazo in reemplazos_en.items():
-                texto = texto.replace(original, reemplazo)
-
-        return texto
-
-    def aplicar_correcciones_contexto(self, texto, transcripciones_previas):
-        """Aplica correcciones basadas en el contexto de transcripciones anteriores"""
-        if not texto or not transcripciones_previas:
-            return texto
-
-        # Si hay superposición con la última transcripción, intentar fusionar
-        ultima_transcripcion = transcripciones_previas[-1]
-
-        # Buscar los últimos N caracteres de la transcripción anterior en la actual
-        for n in range(min(30, len(ultima_transcripcion)), 5, -5):
-            suffix = ultima_transcripcion[-n:]
-            if texto.startswith(suffix):
-                # Hay superposición, fusionar eliminando la parte duplicada
-                return ultima_transcripcion + texto[n:]
-
-        # Si no hay superposición pero la última transcripción no termina con
-        # puntuación, considerar que es continuación
-        if ultima_transcripcion and not ultima_transcripcion[-1] in ['.', '!', '?']:
-            if not texto[0].isupper():  # Si la nueva transcripción no comienza con mayúscula
-                return ultima_transcripcion + " " + texto
-
         return texto
 
     def procesar_audio_completo(self):
-        """Procesa el audio capturado completo para transcripción final"""
-        if not self.frames:
+        """Completa la transcripción al detener revisando sólo lo que la pasada en vivo dejó dudoso o sin decodificar"""
+        if not self.escritor_wav:
             return
 
-        self.estado_var.set("Procesando transcripción final...")
-        print("Procesando el audio completo para transcripción final")
+        self.interfaz.estado("Procesando transcripción final...")
+        print("Procesando la transcripción final a partir de los resultados en vivo")
 
         try:
-            # Crear archivo temporal para el audio completo
-            with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as temp_file:
-                ruta_temp = temp_file.name
+            # El audio ya está en disco; sólo falta asegurar que el archivo esté cerrado
+            ruta_temp = self.escritor_wav.cerrar()
 
-            # Guardar el audio capturado en el archivo temporal
-            with wave.open(ruta_temp, 'wb') as wf:
-                wf.setnchannels(1)
-                wf.setsampwidth(self.audio.get_sample_size(pyaudio.paInt16))
-                wf.setframerate(16000)
-                wf.writeframes(b''.join(self.frames))
+            # Los resultados en vivo deben estar completos antes de decidir qué revisar
+            if self.hilo_transcripcion:
+                self.hilo_transcripcion.join(timeout=35)
 
             # Añadir delimitador en la transcripción
-            self.root.after(0, lambda: self.texto_transcripcion.insert(tk.END, "\n\n----- Transcripción Final -----\n\n"))
+            self.interfaz.insertar("\n\n----- Transcripción Final -----\n\n")
 
             idioma = self.idioma_var.get()
             modo = self.modo_reconocimiento.get()
+            resultados = [dict(resultado) for resultado in self.resultados_sesion]
+            revisados, segundos_revisados = 0, 0.0
 
-            # Procesar el audio según el modo seleccionado
-            if modo == "online":
-                try:
-                    with sr.AudioFile(ruta_temp) as fuente:
-                        self.reconocedor.adjust_for_ambient_noise(fuente, duration=min(1.0, 0.5))
-                        audio_data = self.reconocedor.record(fuente)
-                        texto = self.reconocedor.recognize_google(audio_data, language=idioma)
-
-                        if texto.strip():
-                            texto = self.aplicar_correcciones_post(texto, idioma)
-                            texto_con_etiquetas = self.detectar_palabras_clave(texto)
-                            self.root.after(0, lambda: self.actualizar_transcripcion(texto_con_etiquetas))
+            with LectorWav(ruta_temp, 16000) as lector:
+                duracion_total = lector.duracion()
 
-                except sr.UnknownValueError:
-                    self.root.after(0, lambda: self.texto_transcripcion.insert(tk.END, "No se pudo reconocer claramente el audio completo.\n"))
-                except Exception as e:
-                    print(f"Error en transcripción final online: {e}")
-                    self.root.after(0, lambda: self.texto_transcripcion.insert(tk.END, f"Error en la transcripción final: {str(e)}\n"))
+                # Procesar según el modo seleccionado
+                if modo == "online":
+                    revisados, segundos_revisados = self.revisar_resultados_online(lector, resultados, idioma)
 
-            elif modo == "offline" and vosk_disponible:
-                try:
+                elif modo == "offline" and vosk_disponible:
                     idioma_base = idioma.split('-')[0]
 
                     if idioma_base in self.modelos_vosk:
-                        ruta_modelo = self.modelos_vosk[idioma_base]
-                        model = Model(ruta_modelo)
-                        rec = KaldiRecognizer(model, 16000)
-
-                        with open(ruta_temp, "rb") as wf:
-                            wf.read(44)  # Saltar cabecera WAV
-                            buffer_size = 4000
-
-                            while True:
-                                data = wf.read(buffer_size)
-                                if len(data) == 0:
-                                    break
-
-                                if rec.AcceptWaveform(data):
-                                    result = json.loads(rec.Result())
-                                    if "text" in result and result["text"].strip():
-                                        texto = result["text"]
-                                        texto = self.aplicar_correcciones_post(texto, idioma)
-                                        texto_con_etiquetas = self.detectar_palabras_clave(texto)
-                                        self.root.after(0, lambda t=texto_con_etiquetas: self.actualizar_transcripcion(t))
-
-                            # Procesar el último fragmento
-                            result = json.loads(rec.FinalResult())
-                            if "text" in result and result["text"].strip():
-                                texto = result["text"]
-                                texto = self.aplicar_correcciones_post(texto, idioma)
-                                texto_con_etiquetas = self.detectar_palabras_clave(texto)
-                                self.root.after(0, lambda t=texto_con_etiquetas: self.actualizar_transcripcion(t))
+                        revisados, segundos_revisados = self.revisar_resultados_offline(
+                            lector, resultados, idioma, self.modelos_vosk[idioma_base])
                     else:
-                        self.root.after(0, lambda: self.texto_transcripcion.insert(tk.END, f"No se encontró modelo para el idioma {idioma_base}.\n"))
+                        self.interfaz.insertar(f"No se encontró modelo para el idioma {idioma_base}.\n")
 
-                except Exception as e:
-                    print(f"Error en transcripción final offline: {e}")
-                    self.root.after(0, lambda: self.texto_transcripcion.insert(tk.END, f"Error en la transcripción offline: {str(e)}\n"))
+            # La transcripción final combina los resultados en vivo con los revisados;
+            # en el almacén sustituye a los registros de la pasada en vivo sin borrarlos
+            self.fusionar_resultados_solapados(resultados)
+            registros = [self.transcripcion.crear_registro(r['inicio'], r['fin'], r['texto'], r['confianza'],
+                                                           r.get('palabras'), r.get('texto_completo'),
+                                                           self.buscar_palabras_clave(r['texto']))
+                         for r in resultados if r['texto'].strip()]
+            self.transcripcion.revisar(self.inicio_sesion_transcripcion, registros)
 
-            # Eliminar archivo temporal
-            try:
-                os.unlink(ruta_temp)
-            except:
-                pass
+            for registro in registros:
+                self.mostrar_enunciado(registro)
 
-            self.estado_var.set("Transcripción completada")
+            resumen = f"Revisados {revisados} segmentos ({segundos_revisados:.1f} s de {duracion_total:.1f} s de audio)\n"
+            self.interfaz.insertar(resumen)
+            print(resumen.strip())
+
+            self.interfaz.estado("Transcripción completada")
 
         except Exception as e:
             print(f"Error al procesar audio completo: {e}")
-            self.root.after(0, lambda: self.texto_transcripcion.insert(tk.END, f"Error al procesar audio: {str(e)}\n"))
-            self.estado_var.set("Error en transcripción")
+            self.interfaz.insertar(f"Error al procesar audio: {str(e)}\n")
+            self.interfaz.estado("Error en transcripción")
+
+    def revisar_resultados_online(self, lector, resultados, idioma):
+        """Vuelve a reconocer con Google los grupos dudosos y la cola sin decodificar.
+
+        Modifica resultados en su sitio y devuelve (segmentos revisados, segundos enviados).
+        """
+        grupos = self.grupos_a_revisar(resultados)
+        cola = self.tramos_cola(lector, self.cobertura_sesion)
+        tramos = [(resultados[primero]['inicio'], resultados[ultimo]['fin']) for primero, ultimo in grupos] + cola
+        if not tramos:
+            return 0, 0.0
+
+        revisiones = self.reconocer_tramos_online(lector, tramos, idioma)
+
+        # De atrás hacia delante, para que los reemplazos no desplacen los índices pendientes
+        for (primero, ultimo), (texto, confianza) in reversed(list(zip(grupos, revisiones))):
+            inicio, fin = resultados[primero]['inicio'], resultados[ultimo]['fin']
+
+            # El tramo revisado sustituye al grupo si no empeora su confianza
+            confianzas = [r['confianza'] for r in resultados[primero:ultimo + 1] if r['confianza'] is not None]
+            if texto.strip() and (confianza is None or not confianzas or confianza >= min(confianzas)):
+                resultados[primero:ultimo + 1] = [{'inicio': inicio, 'fin': fin, 'texto': texto, 'confianza': confianza}]
+
+        for (inicio, fin), (texto, confianza) in zip(cola, revisiones[len(grupos):]):
+            resultados.append({'inicio': inicio, 'fin': fin, 'texto': texto, 'confianza': confianza})
+
+        revisados = sum(ultimo - primero + 1 for primero, ultimo in grupos) + len(cola)
+        return revisados, sum(fin - inicio for inicio, fin in tramos)
+
+    def reconocer_tramos_online(self, lector, tramos, idioma):
+        """Reconoce en paralelo los tramos [(inicio, fin)] del WAV y devuelve [(texto, confianza)] en su orden"""
+        revisiones = {}
+
+        def entregar(indice, resultado, error):
+            if error is not None:
+                print(f"Error en transcripción final online: {error}")
+                resultado = ("", None)
+            revisiones[indice] = resultado
+            self.interfaz.estado(f"Transcripción final: {len(revisiones)}/{len(tramos)} tramos")
+
+        # Las peticiones comparten el límite de la transcripción en vivo y se entregan en orden
+        canal = CanalReconocimientoOrdenado(entregar, self.peticiones_simultaneas)
+        try:
+            for indice, (inicio, fin) in enumerate(tramos):
+                canal.enviar(self.reconocer_tramo_online, lector, inicio, fin, idioma, contexto=indice)
+        finally:
+            canal.cerrar()
+
+        return [revisiones.get(indice, ("", None)) for indice in range(len(tramos))]
+
+    def revisar_resultados_offline(self, lector, resultados, idioma, ruta_modelo):
+        """Decodifica con Vosk sólo la cola que la pasada en vivo no llegó a cerrar.
+
+        El mismo modelo daría el mismo resultado sobre los enunciados ya cerrados,
+        así que éstos se conservan tal cual. Devuelve (segmentos revisados, segundos decodificados).
+        """
+        inicio = int(self.cobertura_sesion * lector.tasa)
+        if lector.num_frames - inicio < lector.tasa * 0.3:
+            return 0, 0.0
+
+        model = registro_modelos_vosk.obtener(ruta_modelo)
+        try:
+            rec = KaldiRecognizer(model, lector.tasa_salida)
+            revisados = 0
+            for segundo_inicio, texto, palabras in self.enunciados_vosk(rec, lector.bloques(4000, inicio), inicio / float(lector.tasa)):
+                segundo_fin = palabras[-1]['end'] if palabras else lector.duracion()
+                resultados.append({'inicio': segundo_inicio, 'fin': segundo_fin,
+                                   'texto': self.aplicar_correcciones_post(texto, idioma),
+                                   'confianza': self.confianza_vosk(palabras), 'palabras': palabras})
+                revisados += 1
+        finally:
+            registro_modelos_vosk.liberar(ruta_modelo)
+
+        return revisados, lector.duracion() - inicio / float(lector.tasa)
+
+    def grupos_a_revisar(self, resultados, duracion_maxima=55.0):
+        """Agrupa los resultados dudosos contiguos en tramos de hasta duracion_maxima segundos.
+
+        Son dudosos los segmentos con confianza por debajo del umbral, los que
+        fallaron y los dos lados de un corte forzado sin pausa, que puede partir
+        una palabra. Devuelve [(índice_primero, índice_último)].
+        """
+        dudosos = [r['confianza'] is not None and r['confianza'] < self.umbral_confianza_final for r in resultados]
+        for i in range(len(resultados) - 1):
+            if 0 <= resultados[i + 1]['inicio'] - resultados[i]['fin'] < 0.05:
+                dudosos[i] = dudosos[i + 1] = True
+
+        grupos = []
+        for i, dudoso in enumerate(dudosos):
+            if not dudoso:
+                continue
+            contiguo = grupos and grupos[-1][1] == i - 1 and resultados[i]['inicio'] - resultados[i - 1]['fin'] < 1.0
+            if contiguo and resultados[i]['fin'] - resultados[grupos[-1][0]]['inicio'] <= duracion_maxima:
+                grupos[-1] = (grupos[-1][0], i)
+            else:
+                grupos.append((i, i))
+        return grupos
+
+    def tramos_cola(self, lector, desde, duracion_maxima=55.0, solapamiento=2.0):
+        """Devuelve en segundos los tramos [(inicio, fin)] con voz del audio posterior a desde"""
+        inicio = int(desde * lector.tasa)
+        if lector.num_frames - inicio < lector.tasa * 0.3:
+            return []
+
+        desplazamiento = inicio / float(lector.tasa)
+        if not numpy_disponible:
+            # Sin detector de voz, la cola se divide en tramos solapados que Google acepta en una sola petición
+            tramos = []
+            segundo = desplazamiento
+            while segundo < lector.duracion():
+                tramos.append((segundo, min(segundo + duracion_maxima, lector.duracion())))
+                if segundo + duracion_maxima >= lector.duracion():
+                    break
+                segundo += duracion_maxima - solapamiento
+            return tramos
+
+        detector = DetectorVoz(lector.tasa_salida, calibrador=self.calibrador_ruido)
+        enunciados = []
+        for datos in lector.bloques(4000, inicio):
+            enunciados.extend(detector.procesar(datos))
+        enunciados.extend(detector.vaciar())
+
+        return [(desplazamiento + segundo_inicio, desplazamiento + segundo_inicio + len(datos) / (2.0 * lector.tasa_salida))
+                for segundo_inicio, datos in enunciados]
+
+    def reconocer_tramo_online(self, lector, inicio, fin, idioma, reintentos=2):
+        """Reconoce con Google el tramo [inicio, fin) en segundos del WAV de la sesión (se ejecuta en el pool).
+
+        Los fallos de red y los tiempos de espera agotados se reintentan con
+        espera exponencial; si todos fallan, el tramo queda sin texto.
+        """
+        datos = lector.convertir(lector.frames(int(inicio * lector.tasa), int(fin * lector.tasa)))
+        audio_data = sr.AudioData(datos, lector.tasa_salida, 2)
+
+        for intento in range(reintentos + 1):
+            try:
+                return self.reconocer_segmento_online(audio_data, idioma)
+            except (sr.RequestError, OSError) as e:
+                print(f"Error al revisar el tramo {inicio:.1f}-{fin:.1f} s (intento {intento + 1}): {e}")
+                if intento < reintentos:
+                    time.sleep(2 ** intento)
+
+        return "", None
+
+    def fusionar_resultados_solapados(self, resultados):
+        """Quita del comienzo de cada resultado las palabras que repite del anterior cuando sus tramos se solapan"""
+        anterior = None
+        for actual in resultados:
+            if not actual['texto']:
+                continue
+            if anterior is not None:
+                texto_original = actual['texto']
+                actual['texto'] = self.fusionador_solapamiento.fusionar(anterior['texto'], texto_original,
+                                                                        anterior['fin'] - actual['inicio'])
+                if actual['texto'] != texto_original:
+                    # Los tiempos de las palabras que quedan se estiman sobre la hipótesis completa
+                    actual['texto_completo'] = texto_original
+                # La siguiente alineación se hace con la hipótesis completa, no con lo que quedó
+                anterior = dict(actual, texto=texto_original)
+            else:
+                anterior = actual
 
     def cargar_modelos_vosk(self):
         """Carga los modelos Vosk disponibles para reconocimiento offline"""
@@ -915,69 +2647,46 @@ class TranscriptorMultilingue:
         except Exception as e:
             print(f"Error al cargar modelos Vosk: {e}")
 
-    def detectar_palabras_clave(self, texto):
-        """Detecta palabras clave en el texto y las marca para resaltado"""
+    def buscar_palabras_clave(self, texto):
+        """Devuelve los tramos (inicio, fin) del texto con palabras clave, ordenados y sin solapes"""
         if not self.palabras_clave or not texto:
+            return []
+        return self.automata_palabras_clave.buscar(texto)
+
+    def detectar_palabras_clave(self, texto, coincidencias=None):
+        """Detecta palabras clave en el texto (o usa las coincidencias ya buscadas) y las marca para resaltado"""
+        if not texto:
             return texto
 
         try:
-            # Contar palabras clave encontradas
-            palabras_encontradas = 0
-
-            # Si no hay palabras clave definidas, devolver el texto sin modificar
-            if not self.palabras_clave:
+            # Todas las coincidencias en una sola pasada, ordenadas y sin solapes
+            if coincidencias is None:
+                coincidencias = self.buscar_palabras_clave(texto)
+            if not coincidencias:
                 return texto
 
-            # Convertir texto a minúsculas para comparación insensible a mayúsculas
-            texto_lower = texto.lower()
-
             # Lista para almacenar el texto con etiquetas
             resultado = []
-
-            # Posición actual en el texto
             pos_actual = 0
 
-            # Buscar cada palabra clave en el texto
-            for palabra in self.palabras_clave:
-                palabra_lower = palabra.lower()
-                inicio = 0
-
-                # Buscar todas las ocurrencias de la palabra clave
-                while True:
-                    indice = texto_lower.find(palabra_lower, inicio)
-                    if indice == -1:
-                        break
-
-                    # Verificar si es una palabra completa
-                    es_palabra_completa = True
-                    if indice > 0 and texto_lower[indice-1].isalnum():
-                        es_palabra_completa = False
-                    fin_palabra = indice + len(palabra_lower)
-                    if fin_palabra < len(texto_lower) and texto_lower[fin_palabra].isalnum():
-                        es_palabra_completa = False
+            for inicio, fin in coincidencias:
+                # Añadir el texto anterior a la palabra clave
+                if inicio > pos_actual:
+                    resultado.append(texto[pos_actual:inicio])
 
-                    if es_palabra_completa:
-                        # Añadir el texto anterior a la palabra clave
-                        if indice > pos_actual:
-                            resultado.append(texto[pos_actual:indice])
-
-                        # Añadir la palabra clave con su etiqueta
-                        resultado.append(("palabra_clave", texto[indice:indice+len(palabra_lower)]))
-
-                        pos_actual = indice + len(palabra_lower)
-                        palabras_encontradas += 1
-
-                    inicio = indice + 1
+                # Añadir la palabra clave con su etiqueta
+                resultado.append(("palabra_clave", texto[inicio:fin]))
+                pos_actual = fin
 
             # Añadir el resto del texto después de la última palabra clave
             if pos_actual < len(texto):
                 resultado.append(texto[pos_actual:])
 
             # Actualizar contador de palabras clave
-            if palabras_encontradas > 0:
-                self.root.after(0, lambda: self.palabras_detectadas_var.set(str(palabras_encontradas)))
+            palabras_encontradas = len(coincidencias)
+            self.root.after(0, lambda: self.palabras_detectadas_var.set(str(palabras_encontradas)))
 
-            return resultado if resultado else texto
+            return resultado
 
         except Exception as e:
             print(f"Error al detectar palabras clave: {e}")
@@ -1053,14 +2762,14 @@ class TranscriptorMultilingue:
                         for modelo in modelos_en_carpeta:
                             origen = os.path.join(carpeta_modelos, modelo)
                             destino = os.path.join(dir_modelos, modelo)
-                            self.estado_var.set(f"Copiando modelo {modelo}...")
+                            self.interfaz.estado(f"Copiando modelo {modelo}...")
                             try:
                                 shutil.copytree(origen, destino)
                                 print(f"Modelo copiado: {modelo}")
                             except Exception as e:
                                 print(f"Error al copiar modelo {modelo}: {e}")
 
-                        self.estado_var.set("Modelos copiados")
+                        self.interfaz.estado("Modelos copiados")
                         messagebox.showinfo("Éxito", "Modelos copiados correctamente")
                         self.cargar_modelos_vosk()
                 else:
@@ -1077,6 +2786,7 @@ class TranscriptorMultilingue:
         palabras = list(set(palabras))
 
         self.palabras_clave = set(palabras)
+        self.automata_palabras_clave = AutomataPalabrasClave(self.palabras_clave)
 
         archivo_palabras_clave = os.path.join(os.path.dirname(os.path.abspath(__file__)), "palabras_clave.txt")
 
@@ -1109,6 +2819,10 @@ class TranscriptorMultilingue:
                 else:
                     self.texto_palabras_clave.insert(tk.END, palabra)
 
+                # Resaltar la palabra desde ya, aunque la lista aún no se haya guardado
+                self.palabras_clave.add(palabra)
+                self.automata_palabras_clave = AutomataPalabrasClave(self.palabras_clave)
+
                 print(f"Añadida palabra clave: {palabra}")
 
     def eliminar_palabra_clave(self):
@@ -1139,7 +2853,15 @@ class TranscriptorMultilingue:
                 "modo_privado": self.modo_privado.get(),
                 "usar_encriptacion": self.usar_encriptacion.get(),
                 "modo_reconocimiento": self.modo_reconocimiento.get(),
-                "idioma": self.idioma_var.get()
+                "idioma": self.idioma_var.get(),
+                "segundos_buffer_audio": self.segundos_buffer_audio,
+                "guardar_segmentos_depuracion": self.guardar_segmentos_depuracion,
+                "peticiones_simultaneas": self.peticiones_simultaneas,
+                "hilos_vosk": self.hilos_vosk,
+                "sustraccion_espectral": self.sustraccion_espectral,
+                "segmentar_por_voz": self.segmentar_por_voz,
+                "umbral_confianza_final": self.umbral_confianza_final,
+                "memoria_modelos_mb": registro_modelos_vosk.memoria_maxima_mb
             }
 
             archivo_config = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.json")
@@ -1195,7 +2917,7 @@ class TranscriptorMultilingue:
             messagebox.showwarning("No disponible", "La encriptación no está disponible. Instale la biblioteca cryptography.")
             return
 
-        texto = self.texto_transcripcion.get("1.0", tk.END).strip()
+        texto = self.transcripcion.a_texto()
         if not texto:
             messagebox.showwarning("Advertencia", "No hay texto para encriptar")
             return
@@ -1218,6 +2940,7 @@ class TranscriptorMultilingue:
 
             contenido_encriptado = cipher_suite.encrypt(texto.encode('utf-8'))
 
+            self.interfaz.descartar()
             self.texto_transcripcion.delete("1.0", tk.END)
             self.texto_transcripcion.insert(tk.END, "[CONTENIDO ENCRIPTADO]\n\n")
             self.texto_transcripcion.insert(tk.END, "Este texto ha sido encriptado y solo puede ser leído con la clave correcta.\n")
@@ -1290,11 +3013,14 @@ class TranscriptorMultilingue:
             try:
                 texto_desencriptado = cipher_suite.decrypt(contenido_encriptado).decode('utf-8')
 
-                # Mostrar el contenido desencriptado
+                # Mostrar el contenido desencriptado (texto plano: no trae tiempos por palabra)
                 self.texto_transcripcion.delete("1.0", tk.END)
                 self.texto_transcripcion.insert(tk.END, texto_desencriptado)
+                self.interfaz.descartar()
+                self.transcripcion.limpiar()
+                self.transcripcion.agregar_texto(texto_desencriptado)
 
-                self.estado_var.set("Archivo desencriptado")
+                self.interfaz.estado("Archivo desencriptado")
                 self.logger.info(f"Archivo desencriptado: {os.path.basename(archivo)}")
 
                 messagebox.showinfo("Éxito", "Archivo desencriptado correctamente")
@@ -1319,7 +3045,8 @@ class TranscriptorMultilingue:
             
     def guardar_transcripcion(self):
         """Guarda la transcripción actual en un archivo de texto"""
-        texto = self.texto_transcripcion.get("1.0", tk.END).strip()
+        # Se exporta desde el almacén, sin leer ni interpretar el contenido del widget
+        texto = self.transcripcion.a_texto()
 
         if not texto:
             messagebox.showwarning("Advertencia", "No hay texto para guardar")
@@ -1370,41 +3097,14 @@ class TranscriptorMultilingue:
                             f.write(texto)
 
                 elif extension == '.srt':
-                    subtitulos = []
-
-                    lineas = texto.split('\n')
-                    for i, linea in enumerate(lineas):
-                        if linea.startswith('[') and ']' in linea:
-                            partes = linea.split(']', 1)
-                            if len(partes) == 2:
-                                tiempo_str = partes[0][1:]
-                                texto_subtitulo = partes[1].strip()
-
-                                h, m, s = tiempo_str.split(':')
-                                tiempo_inicio = f"{h}:{m}:{s},000"
-
-                                h_fin, m_fin, s_fin = int(h), int(m), int(s) + 5
-                                if s_fin >= 60:
-                                    s_fin -= 60
-                                    m_fin += 1
-                                if m_fin >= 60:
-                                    m_fin -= 60
-                                    h_fin += 1
-
-                                tiempo_fin = f"{h_fin:02d}:{m_fin:02d}:{s_fin:02d},000"
-
-                                subtitulos.append({
-                                    'num': len(subtitulos) + 1,
-                                    'inicio': tiempo_inicio,
-                                    'fin': tiempo_fin,
-                                    'texto': texto_subtitulo
-                                })
+                    # Los tiempos salen de las palabras de cada registro, no del texto mostrado
+                    subtitulos = self.transcripcion.a_srt()
+                    if not subtitulos:
+                        messagebox.showwarning("Advertencia", "No hay enunciados con marcas de tiempo para exportar")
+                        return
 
                     with open(archivo, 'w', encoding='utf-8') as f:
-                        for sub in subtitulos:
-                            f.write(f"{sub['num']}\n")
-                            f.write(f"{sub['inicio']} --> {sub['fin']}\n")
-                            f.write(f"{sub['texto']}\n\n")
+                        f.write(subtitulos)
 
                 elif extension == '.enc' and encriptacion_disponible:
                     self.guardar_archivo_encriptado(archivo, texto)
@@ -1494,7 +3194,7 @@ class TranscriptorMultilingue:
         if not self.grabando:
             # Iniciar grabación
             self.grabando = True
-            self.estado_var.set("Grabando audio...")
+            self.interfaz.estado("Grabando audio...")
             self.boton_grabar.config(text="Detener Grabación")
             # Iniciar la transcripción
             self.iniciar_transcripcion()
@@ -1502,7 +3202,7 @@ class TranscriptorMultilingue:
         else:
             # Detener grabación
             self.grabando = False
-            self.estado_var.set("Audio detenido")
+            self.interfaz.estado("Audio detenido")
             self.boton_grabar.config(text="Iniciar Grabación")
             # Detener la transcripción
             self.detener_transcripcion()
@@ -1592,7 +3292,7 @@ class TranscriptorMultilingue:
                 frame_opciones,
                 text="Aplicar cancelación de ruido",
                 variable=cancelar_ruido,
-                state=tk.NORMAL if pydub_disponible else tk.DISABLED
+                state=tk.NORMAL if numpy_disponible else tk.DISABLED
             ).pack(anchor=tk.W, padx=20)
 
             # Botones
@@ -1602,6 +3302,7 @@ class TranscriptorMultilingue:
             def iniciar_transcripcion_archivo():
                 modo = modo_archivo.get()
                 idioma = idioma_archivo.get()
+                self.cancelacion_ruido_archivo = cancelar_ruido.get()
 
                 ventana_opciones.destroy()
 
@@ -1627,6 +3328,8 @@ class TranscriptorMultilingue:
     def limpiar_transcripcion(self):
         """Limpia el área de transcripción"""
         self.texto_transcripcion.delete("1.0", tk.END)
+        self.interfaz.descartar()
+        self.transcripcion.limpiar()
         self.palabras_detectadas_var.set("0")
         print("Transcripción limpiada")
 
@@ -1645,6 +3348,9 @@ class TranscriptorMultilingue:
                 )
                 self.modo_reconocimiento.set("online")
                 self.actualizar_estado_modo()
+                return
+
+        self.precargar_modelo_vosk()
 
     def cambiar_modo_reconocimiento(self):
         """Cambia entre modos de reconocimiento online/offline"""
@@ -1680,6 +3386,73 @@ class TranscriptorMultilingue:
             self.icono_privacidad_var.set("🔒 Modo privado (procesamiento local)")
             self.label_privacidad.configure(foreground="#27ae60")
             self.barra_estado.configure(text="Listo para transcribir | Modo: Offline (Vosk)")
+
+        self.precargar_modelo_vosk()
+
+    def precargar_modelo_vosk(self):
+        """Carga en segundo plano el modelo Vosk del idioma seleccionado para que esté listo al iniciar"""
+        if not vosk_disponible or self.modo_reconocimiento.get() != "offline":
+            return
+
+        idioma_base = self.idioma_var.get().split('-')[0]
+        ruta_modelo = self.modelos_vosk.get(idioma_base)
+        if not ruta_modelo:
+            return
+
+        with self.lock_precarga:
+            if ruta_modelo == self.ruta_modelo_solicitada:
+                # Ya está cargado o cargándose
+                self.mostrar_estado_modelo(idioma_base, self.modelo_listo.is_set())
+                return
+
+            # Soltar la referencia del modelo precargado anteriormente
+            if self.ruta_modelo_precargado:
+                registro_modelos_vosk.liberar(self.ruta_modelo_precargado)
+                self.ruta_modelo_precargado = None
+
+            self.ruta_modelo_solicitada = ruta_modelo
+            self.modelo_listo.clear()
+
+        self.mostrar_estado_modelo(idioma_base, False)
+
+        def cargar_modelo():
+            try:
+                registro_modelos_vosk.obtener(ruta_modelo)
+            except Exception as e:
+                print(f"Error al precargar modelo Vosk: {e}")
+                self.logger.error(f"Error al precargar modelo Vosk: {str(e)}")
+                with self.lock_precarga:
+                    if self.ruta_modelo_solicitada == ruta_modelo:
+                        self.ruta_modelo_solicitada = None
+                self.root.after(0, lambda: self.barra_estado.configure(
+                    text=f"Error al cargar el modelo {idioma_base} | Modo: Offline (Vosk)"))
+                return
+
+            with self.lock_precarga:
+                if self.ruta_modelo_solicitada != ruta_modelo:
+                    # La selección cambió mientras se cargaba
+                    registro_modelos_vosk.liberar(ruta_modelo)
+                    return
+
+                self.ruta_modelo_precargado = ruta_modelo
+                self.modelo_listo.set()
+
+            self.logger.info(f"Modelo Vosk precargado: {os.path.basename(ruta_modelo)}")
+            self.root.after(0, lambda: self.mostrar_estado_modelo(idioma_base, True))
+
+        threading.Thread(target=cargar_modelo, daemon=True).start()
+
+    def mostrar_estado_modelo(self, idioma_base, listo):
+        """Muestra en la barra de estado si el modelo offline está listo o cargándose"""
+        if self.modo_reconocimiento.get() != "offline":
+            return
+
+        if listo:
+            texto = f"Listo para transcribir | Modo: Offline (Vosk) | Modelo {idioma_base}: listo"
+        else:
+            texto = f"Cargando modelo {idioma_base}... | Modo: Offline (Vosk)"
+
+        self.barra_estado.configure(text=texto)
             
             
             
@@ -1693,10 +3466,15 @@ class TranscriptorMultilingue:
             # Verificar la extensión del archivo
             extension = os.path.splitext(archivo_audio)[1].lower()
 
+            # Con ffmpeg los formatos comprimidos se decodifican en streaming, sin WAV intermedio
+            if extension != '.wav' and ruta_ffmpeg:
+                self.transcribir_archivo_comprimido(archivo_audio, modo)
+                return
+
             # Si no es un archivo WAV, intentar convertirlo
             if extension != '.wav':
                 if pydub_disponible:
-                    self.root.after(0, lambda: self.estado_var.set(f"Convirtiendo archivo {extension} a WAV..."))
+                    self.interfaz.estado(f"Convirtiendo archivo {extension} a WAV...")
 
                     # Crear un archivo temporal
                     temp_wav = tempfile.NamedTemporaryFile(suffix='.wav', delete=False).name
@@ -1706,10 +3484,10 @@ class TranscriptorMultilingue:
                         sound = AudioSegment.from_file(archivo_audio)
                         sound.export(temp_wav, format="wav")
                         archivo_audio = temp_wav  # Usar el archivo WAV temporal
-                        self.root.after(0, lambda: self.estado_var.set("Archivo convertido, procesando..."))
+                        self.interfaz.estado("Archivo convertido, procesando...")
                     except Exception as e:
                         print(f"Error al convertir archivo: {e}")
-                        self.root.after(0, lambda: self.estado_var.set(f"Error al convertir archivo: {str(e)}"))
+                        self.interfaz.estado(f"Error al convertir archivo: {str(e)}")
                         messagebox.showerror("Error", f"Error al convertir archivo: {str(e)}")
                         return
                 else:
@@ -1732,14 +3510,24 @@ class TranscriptorMultilingue:
                             f"- Tasa de muestreo: {tasa} Hz\n"
                             f"- Tamaño: {os.path.getsize(archivo_audio) / (1024*1024):.2f} MB\n\n")
 
-                self.root.after(0, lambda: self.texto_transcripcion.insert(tk.END, info_audio))
+                self.interfaz.insertar(info_audio)
 
                 print(f"Transcribiendo archivo: {os.path.basename(archivo_audio)}, "
                     f"Duración: {int(duracion // 60)}:{int(duracion % 60):02d}, "
                     f"Modo: {modo}")
 
-                if duracion > 60:
-                    self.root.after(0, lambda: self.estado_var.set("Procesando archivo grande por segmentos..."))
+                idioma_base = self.idioma_var.get().split('-')[0]
+                offline_vosk = modo == "offline" and vosk_disponible and idioma_base in self.modelos_vosk
+                paralelo = offline_vosk and self.hilos_vosk > 1
+
+                if duracion > 60 and paralelo:
+                    self.interfaz.estado("Procesando archivo grande en paralelo...")
+                    self.procesar_archivo_offline_paralelo(archivo_audio, self.idioma_var.get())
+                elif duracion > 60 and offline_vosk:
+                    self.interfaz.estado("Decodificando archivo grande...")
+                    self.procesar_archivo_offline_continuo(archivo_audio, duracion, self.idioma_var.get())
+                elif duracion > 60:
+                    self.interfaz.estado("Procesando archivo grande por segmentos...")
                     self.procesar_archivo_por_segmentos(archivo_audio, duracion, modo)
                 else:
                     self.transcribir_segmento_archivo(archivo_audio, modo)
@@ -1753,9 +3541,37 @@ class TranscriptorMultilingue:
 
         except Exception as e:
             print(f"Error al procesar archivo: {e}")
-            self.root.after(0, lambda: self.estado_var.set(f"Error al procesar archivo: {str(e)}"))
+            self.interfaz.estado(f"Error al procesar archivo: {str(e)}")
             messagebox.showerror("Error", f"Error al procesar archivo: {str(e)}")
 
+    def transcribir_archivo_comprimido(self, archivo_audio, modo):
+        """Transcribe un MP3/OGG/FLAC decodificándolo con ffmpeg a medida que se transcribe"""
+        info = DecodificadorAudio.sondear(archivo_audio)
+        duracion, canales, tasa = info if info else (0, None, None)
+
+        info_audio = (f"Información del archivo:\n"
+                    f"- Duración: {int(duracion // 60)}:{int(duracion % 60):02d}\n"
+                    f"- Canales: {canales or 'desconocido'}\n"
+                    f"- Tasa de muestreo: {tasa or 'desconocida'} Hz\n"
+                    f"- Tamaño: {os.path.getsize(archivo_audio) / (1024*1024):.2f} MB\n\n")
+
+        self.interfaz.insertar(info_audio)
+
+        print(f"Transcribiendo archivo: {os.path.basename(archivo_audio)}, "
+            f"Duración: {int(duracion // 60)}:{int(duracion % 60):02d}, "
+            f"Modo: {modo} (decodificación con ffmpeg)")
+
+        # Si ffprobe no da la duración, el progreso se calcula sobre una hora
+        duracion = duracion or 3600
+
+        idioma_base = self.idioma_var.get().split('-')[0]
+        if modo == "offline" and vosk_disponible and idioma_base in self.modelos_vosk:
+            self.interfaz.estado("Decodificando archivo...")
+            self.procesar_archivo_offline_continuo(archivo_audio, duracion, self.idioma_var.get())
+        else:
+            self.interfaz.estado("Procesando archivo por segmentos...")
+            self.procesar_archivo_por_segmentos(archivo_audio, duracion, modo)
+
     def transcribir_segmento_archivo(self, archivo_audio, modo):
         """Transcribe un archivo de audio completo de una sola vez"""
         try:
@@ -1763,155 +3579,372 @@ class TranscriptorMultilingue:
             
             if modo == "online":
                 with sr.AudioFile(archivo_audio) as fuente:
-                    self.reconocedor.adjust_for_ambient_noise(fuente, duration=min(1.0, 0.5))
+                    # Todo el audio llega al reconocedor; el piso de ruido se estima sin consumir audio
                     audio_data = self.reconocedor.record(fuente)
+                    if numpy_disponible:
+                        self.calibrador_ruido.estimar(audio_data.get_raw_data(convert_width=2), audio_data.sample_rate)
                     
                     try:
                         texto = self.reconocedor.recognize_google(audio_data, language=idioma)
                         
                         if texto.strip():
                             texto = self.aplicar_correcciones_post(texto, idioma)
-                            texto_con_etiquetas = self.detectar_palabras_clave(texto)
-                            self.root.after(0, lambda: self.actualizar_transcripcion(texto_con_etiquetas))
+                            duracion = len(audio_data.frame_data) / float(audio_data.sample_rate * audio_data.sample_width)
+                            self.publicar_enunciado(0.0, duracion, texto)
                             
                     except sr.UnknownValueError:
-                        self.root.after(0, lambda: self.texto_transcripcion.insert(tk.END, 
-                            "No se pudo reconocer el audio.\n"))
+                        self.interfaz.insertar("No se pudo reconocer el audio.\n")
                     except Exception as e:
                         print(f"Error en transcripción: {e}")
-                        self.root.after(0, lambda: self.texto_transcripcion.insert(tk.END, 
-                            f"Error en la transcripción: {str(e)}\n"))
+                        self.interfaz.insertar(f"Error en la transcripción: {str(e)}\n")
                         
             elif modo == "offline" and vosk_disponible:
                 idioma_base = idioma.split('-')[0]
                 
                 if idioma_base in self.modelos_vosk:
-                    model = Model(self.modelos_vosk[idioma_base])
-                    rec = KaldiRecognizer(model, self.tasa_muestreo)
-                    
-                    with open(archivo_audio, 'rb') as wf:
-                        wf.read(44)  # Saltar cabecera WAV
-                        
-                        while True:
-                            data = wf.read(4000)
-                            if len(data) == 0:
-                                break
-                                
-                            rec.AcceptWaveform(data)
-                            
-                        result = json.loads(rec.FinalResult())
-                        if "text" in result and result["text"].strip():
-                            texto = result["text"]
-                            texto = self.aplicar_correcciones_post(texto, idioma)
-                            texto_con_etiquetas = self.detectar_palabras_clave(texto)
-                            self.root.after(0, lambda: self.actualizar_transcripcion(texto_con_etiquetas))
-                            
-            self.root.after(0, lambda: self.estado_var.set("Transcripción completada"))
+                    ruta_modelo = self.modelos_vosk[idioma_base]
+                    model = registro_modelos_vosk.obtener(ruta_modelo)
+
+                    try:
+                        with LectorWav(archivo_audio, self.tasa_muestreo) as lector:
+                            rec = KaldiRecognizer(model, lector.tasa_salida)
+                            reductor = self.crear_reductor_ruido(self.cancelacion_ruido_archivo, lector.tasa_salida)
+
+                            # Cada enunciado se publica con los tiempos de sus palabras
+                            for segundo_inicio, texto, palabras in self.enunciados_vosk(rec, lector.bloques(4000, reductor=reductor)):
+                                self.publicar_texto_con_tiempo(segundo_inicio, texto, idioma, palabras)
+                    finally:
+                        registro_modelos_vosk.liberar(ruta_modelo)
+
+            self.interfaz.estado("Transcripción completada")
             
         except Exception as e:
             print(f"Error al transcribir segmento: {e}")
-            self.root.after(0, lambda: self.estado_var.set(f"Error: {str(e)}"))
+            self.interfaz.estado(f"Error: {str(e)}")
+
+    def calcular_cortes_silencio(self, lector, segundos_fragmento=60, margen=5):
+        """Divide un WAV en fragmentos de unos segundos_fragmento cortando en el punto más silencioso cercano"""
+        tasa = lector.tasa
+        total_frames = lector.num_frames
+        ventana = max(1, tasa // 10)  # Energía en ventanas de 100 ms
+
+        energias = lector.energias(ventana) if numpy_disponible else None
+
+        paso = int(segundos_fragmento * tasa)
+        margen_frames = int(margen * tasa)
+        cortes = [0]
+
+        # Evitar un último fragmento demasiado corto
+        while total_frames - cortes[-1] > paso + margen_frames:
+            objetivo = cortes[-1] + paso
+
+            if energias is not None and len(energias):
+                desde = (objetivo - margen_frames) // ventana
+                hasta = (objetivo + margen_frames) // ventana
+                tramo = energias[desde:hasta]
+                if len(tramo):
+                    objetivo = (desde + int(np.argmin(tramo))) * ventana + ventana // 2
+
+            cortes.append(objetivo)
+
+        cortes.append(total_frames)
+        return list(zip(cortes[:-1], cortes[1:]))
+
+    def enunciados_vosk(self, rec, bloques, desplazamiento=0.0):
+        """Pasa los bloques de PCM por el reconocedor y genera cada enunciado en cuanto se completa.
+
+        Cada enunciado es (segundo_inicio, texto, palabras); los tiempos de las
+        palabras se desplazan desplazamiento segundos para referirlos al archivo.
+        """
+        rec.SetWords(True)
+
+        for datos in bloques:
+            if rec.AcceptWaveform(datos):
+                enunciado = self.leer_enunciado_vosk(rec.Result(), desplazamiento)
+                if enunciado:
+                    yield enunciado
+
+        enunciado = self.leer_enunciado_vosk(rec.FinalResult(), desplazamiento)
+        if enunciado:
+            yield enunciado
+
+    def leer_enunciado_vosk(self, resultado_json, desplazamiento):
+        """Convierte un resultado de Vosk en (segundo_inicio, texto, palabras), o None si está vacío"""
+        resultado = json.loads(resultado_json)
+        texto = resultado.get('text', '')
+        if not texto.strip():
+            return None
+
+        palabras = [dict(palabra, start=palabra['start'] + desplazamiento, end=palabra['end'] + desplazamiento)
+                    for palabra in resultado.get('result', [])]
+        segundo_inicio = palabras[0]['start'] if palabras else desplazamiento
+        return segundo_inicio, texto, palabras
+
+    def confianza_vosk(self, palabras):
+        """Confianza media de las palabras de un enunciado de Vosk, o None si no trae palabras"""
+        if not palabras:
+            return None
+        return sum(palabra.get('conf', 1.0) for palabra in palabras) / len(palabras)
+
+    def publicar_texto_con_tiempo(self, segundos, texto, idioma, palabras=None):
+        """Corrige un texto reconocido y lo añade a la transcripción con su marca de tiempo"""
+        texto = self.aplicar_correcciones_post(texto, idioma)
+        self.publicar_enunciado(segundos, palabras[-1]['end'] if palabras else segundos, texto,
+                                self.confianza_vosk(palabras), palabras)
+
+    def transcribir_fragmento_vosk(self, lector, modelo, inicio, fin):
+        """Decodifica con un reconocedor propio los frames [inicio, fin) de un WAV (se ejecuta en el pool)"""
+        rec = KaldiRecognizer(modelo, lector.tasa_salida)
+        reductor = self.crear_reductor_ruido(self.cancelacion_ruido_archivo, lector.tasa_salida)
+        bloques = lector.bloques(4000, inicio, fin, reductor)
+        return list(self.enunciados_vosk(rec, bloques, inicio / float(lector.tasa)))
+
+    def crear_reductor_ruido(self, activado, tasa):
+        """Devuelve un ReductorRuido nuevo si se pide cancelación de ruido y numpy está disponible, o None"""
+        if not (activado and numpy_disponible):
+            return None
+        return ReductorRuido(tasa, sustraccion_espectral=self.sustraccion_espectral)
+
+    def abrir_fuente_audio(self, archivo_audio):
+        """Abre un WAV mapeado en memoria o, para otros formatos, un decodificador ffmpeg en streaming"""
+        if os.path.splitext(archivo_audio)[1].lower() == '.wav':
+            return LectorWav(archivo_audio, self.tasa_muestreo)
+        return DecodificadorAudio(archivo_audio, self.tasa_muestreo)
+
+    def indexar_regiones_voz(self, lector, margen=0.3, pausa_minima=1.0):
+        """Localiza en una sola pasada las regiones con voz de un WAV y devuelve [(frame_inicio, frame_fin)]"""
+        if not numpy_disponible:
+            return [(0, lector.num_frames)]
+
+        ventana = max(1, lector.tasa // 50)  # Energía en ventanas de 20 ms
+        energias_db = 10 * np.log10(lector.energias(ventana) ** 2 + 1.0)
+        if len(energias_db) == 0:
+            return [(0, lector.num_frames)]
+
+        # El piso de ruido es el nivel que superan el 95 % de las ventanas; sirve también de calibración
+        piso = np.percentile(energias_db, 5)
+        self.calibrador_ruido.fijar(math.sqrt(10 ** (piso / 10) - 1))
+        voz = (energias_db > piso + 9) & (energias_db > 30)
+
+        # Tramos de voz [inicio, fin) en ventanas; los de menos de 60 ms son chasquidos
+        cambios = np.flatnonzero(np.diff(np.concatenate(([0], voz.astype(np.int8), [0]))))
+        tramos = [(inicio, fin) for inicio, fin in zip(cambios[0::2], cambios[1::2]) if fin - inicio >= 3]
+
+        # Unir los tramos separados por pausas cortas y añadir un margen a cada lado
+        ventanas_pausa = int(pausa_minima * 50)
+        ventanas_margen = int(margen * 50)
+        regiones = []
+        for inicio, fin in tramos:
+            inicio = max(0, inicio - ventanas_margen)
+            fin = fin + ventanas_margen
+            if regiones and inicio - regiones[-1][1] < ventanas_pausa:
+                regiones[-1][1] = fin
+            else:
+                regiones.append([inicio, fin])
+
+        return [(int(inicio) * ventana, min(int(fin) * ventana, lector.num_frames)) for inicio, fin in regiones]
+
+    def agrupar_en_ventanas(self, bloques, tasa, ancho_muestra, tamano_segmento, solapamiento, offset=0.0):
+        """Agrupa un flujo de bloques de PCM mono en ventanas solapadas (offset en segundos, PCM)"""
+        bytes_segmento = int(tamano_segmento * tasa) * ancho_muestra
+        bytes_avance = int((tamano_segmento - solapamiento) * tasa) * ancho_muestra
+        ventana = bytearray()
+        pendiente = False  # La ventana contiene audio que aún no se ha entregado
+
+        for datos in bloques:
+            ventana += datos
+            pendiente = pendiente or len(datos) > 0
+
+            while len(ventana) >= bytes_segmento:
+                yield offset, bytes(ventana[:bytes_segmento])
+                del ventana[:bytes_avance]
+                offset += bytes_avance / float(tasa * ancho_muestra)
+                pendiente = len(ventana) > bytes_segmento - bytes_avance
+
+        if pendiente:
+            yield offset, bytes(ventana)
+
+    def ventanas_de_voz(self, lector, tamano_segmento, solapamiento, reductor=None, resumen=None):
+        """Genera (offset en segundos, PCM) sólo para el audio con voz de un archivo, con sus tiempos reales.
+
+        En un WAV las regiones de voz se localizan antes con indexar_regiones_voz y se
+        recorren con ventanas solapadas; en un stream de ffmpeg el detector de voz
+        corta los enunciados a medida que se decodifican. En resumen se anotan los
+        segundos totales y los segundos con voz.
+        """
+        resumen = {} if resumen is None else resumen
+        tasa = lector.tasa_salida
+        ancho_muestra = lector.ancho_salida
+
+        if isinstance(lector, LectorWav):
+            regiones = self.indexar_regiones_voz(lector)
+            resumen['segundos_totales'] = lector.duracion()
+            resumen['segundos_voz'] = sum(fin - inicio for inicio, fin in regiones) / float(lector.tasa)
+
+            for inicio, fin in regiones:
+                bloques = lector.bloques(4000, inicio, fin, reductor)
+                yield from self.agrupar_en_ventanas(bloques, tasa, ancho_muestra, tamano_segmento, solapamiento,
+                                                    inicio / float(lector.tasa))
+            return
+
+        if not numpy_disponible:
+            # Sin numpy no hay detector de voz: se recorre el stream completo
+            yield from self.agrupar_en_ventanas(lector.bloques(4000), tasa, ancho_muestra, tamano_segmento, solapamiento)
+            return
+
+        detector = DetectorVoz(tasa, duracion_maxima=tamano_segmento, calibrador=self.calibrador_ruido)
+        bytes_totales = 0
+        bytes_voz = 0
+
+        for datos in lector.bloques(4000, reductor):
+            bytes_totales += len(datos)
+            for offset, enunciado in detector.procesar(datos):
+                bytes_voz += len(enunciado)
+                yield offset, enunciado
+
+        for offset, enunciado in detector.vaciar():
+            bytes_voz += len(enunciado)
+            yield offset, enunciado
+
+        resumen['segundos_totales'] = bytes_totales / float(tasa * ancho_muestra)
+        resumen['segundos_voz'] = bytes_voz / float(tasa * ancho_muestra)
+
+    def procesar_archivo_offline_continuo(self, archivo_audio, duracion_total, idioma):
+        """Transcribe un archivo offline pasándolo una sola vez por un reconocedor Vosk, sin solapamientos"""
+        idioma_base = idioma.split('-')[0]
+        ruta_modelo = self.modelos_vosk[idioma_base]
+        modelo = registro_modelos_vosk.obtener(ruta_modelo)
+        lector = None
 
-    def procesar_archivo_por_segmentos(self, archivo_audio, duracion_total, modo):
-        """Procesa un archivo de audio grande por segmentos con solapamiento"""
         try:
-            idioma = self.idioma_var.get()
-            idioma_base = idioma.split('-')[0]
+            lector = self.abrir_fuente_audio(archivo_audio)
+            rec = KaldiRecognizer(modelo, lector.tasa_salida)
+            reductor = self.crear_reductor_ruido(self.cancelacion_ruido_archivo, lector.tasa_salida)
 
-            tamano_segmento = 15
-            solapamiento = 2
+            self.interfaz.insertar("Decodificando el archivo de forma continua...\n\n")
 
-            num_segmentos = math.ceil((duracion_total - solapamiento) / (tamano_segmento - solapamiento))
+            # El reconocedor conserva su estado en todo el archivo y publica cada enunciado al completarse
+            for segundo_inicio, texto, palabras in self.enunciados_vosk(rec, lector.bloques(4000, reductor=reductor)):
+                progreso = min(100, int(segundo_inicio * 100 / duracion_total))
+                self.interfaz.estado(f"Decodificando archivo ({progreso}%)...")
 
-            self.root.after(0, lambda: self.texto_transcripcion.insert(tk.END, 
-                            f"Archivo dividido en {num_segmentos} segmentos con solapamiento...\n\n"))
+                self.publicar_texto_con_tiempo(segundo_inicio, texto, idioma, palabras)
 
-            transcripciones_previas = []
+            self.interfaz.estado("Transcripción completada")
+            self.interfaz.insertar("\n--- Fin de la transcripción ---\n")
 
-            reconocedor_offline = None
-            if modo == "offline" and vosk_disponible and idioma_base in self.modelos_vosk:
-                modelo = Model(self.modelos_vosk[idioma_base])
-                reconocedor_offline = KaldiRecognizer(modelo, self.tasa_muestreo)
+            print(f"Transcripción de archivo completada: {os.path.basename(archivo_audio)}")
 
-            # Procesar usando archivos temporales para cada segmento
-            for i in range(num_segmentos):
-                progreso = int((i+1) * 100 / num_segmentos)
-                self.root.after(0, lambda i=i, p=progreso: 
-                            self.estado_var.set(f"Procesando segmento {i+1}/{num_segmentos} ({p}%)..."))
+        except Exception as e:
+            print(f"Error al decodificar archivo: {e}")
+            self.interfaz.estado(f"Error: {str(e)}")
 
-                offset = i * (tamano_segmento - solapamiento)
-                duracion = min(tamano_segmento, duracion_total - offset)
+        finally:
+            if lector is not None:
+                lector.cerrar()
+            registro_modelos_vosk.liberar(ruta_modelo)
 
-                if duracion <= 0:
-                    break
+    def procesar_archivo_offline_paralelo(self, archivo_audio, idioma):
+        """Transcribe un archivo offline repartiendo fragmentos entre varios reconocedores Vosk"""
+        idioma_base = idioma.split('-')[0]
+        ruta_modelo = self.modelos_vosk[idioma_base]
+        modelo = registro_modelos_vosk.obtener(ruta_modelo)
+        lector = None
 
-                try:
-                    # Crear archivo temporal para el segmento
-                    with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as temp_file:
-                        temp_path = temp_file.name
-
-                    # Extraer el segmento de audio
-                    with wave.open(archivo_audio, 'rb') as wf_in:
-                        params = wf_in.getparams()
-                        framerate = params.framerate
-                        
-                        # Calcular posiciones en frames
-                        start_frame = int(offset * framerate)
-                        num_frames = int(duracion * framerate)
-                        
-                        # Posicionarse en el inicio del segmento
-                        wf_in.setpos(start_frame)
-                        
-                        # Leer los frames del segmento
-                        frames_data = wf_in.readframes(num_frames)
-                        
-                        # Guardar el segmento en archivo temporal
-                        with wave.open(temp_path, 'wb') as wf_out:
-                            wf_out.setparams(params)
-                            wf_out.writeframes(frames_data)
+        try:
+            # Un único mapeo del archivo compartido por todos los hilos
+            lector = LectorWav(archivo_audio, self.tasa_muestreo)
+            fragmentos = self.calcular_cortes_silencio(lector)
+            num_fragmentos = len(fragmentos)
 
-                    # Transcribir el segmento
-                    if modo == "online":
-                        with sr.AudioFile(temp_path) as fuente:
-                            self.reconocedor.adjust_for_ambient_noise(fuente, duration=0.5)
-                            audio_segmento = self.reconocedor.record(fuente)
-                            texto = self.reconocedor.recognize_google(audio_segmento, language=idioma)
-                    else:
-                        if reconocedor_offline:
-                            with open(temp_path, 'rb') as wf:
-                                wf.read(44)  # Saltar cabecera WAV
-                                audio_data = wf.read()
-                                
-                                reconocedor_offline.AcceptWaveform(audio_data)
-                                resultado = json.loads(reconocedor_offline.FinalResult())
-                                texto = resultado.get('text', '')
-
-                    # Eliminar archivo temporal
-                    try:
-                        os.unlink(temp_path)
-                    except:
-                        pass
+            self.interfaz.insertar(f"Archivo dividido en {num_fragmentos} fragmentos, "
+                                   f"procesando con {self.hilos_vosk} hilos...\n\n")
 
-                    if texto and texto.strip():
-                        if transcripciones_previas:
-                            texto = self.aplicar_correcciones_contexto(texto, transcripciones_previas)
+            completados = [0]
+
+            def entregar(inicio, enunciados, error):
+                completados[0] += 1
+                progreso = int(completados[0] * 100 / num_fragmentos)
+                self.interfaz.estado(f"Procesando fragmento {completados[0]}/{num_fragmentos} ({progreso}%)...")
+
+                if error is not None:
+                    print(f"Error en fragmento {completados[0]}: {error}")
+                    return
+
+                for segundo_inicio, texto, palabras in enunciados:
+                    self.publicar_texto_con_tiempo(segundo_inicio, texto, idioma, palabras)
+
+            # Los reconocedores comparten el modelo; los resultados se publican en el orden del archivo
+            canal = CanalReconocimientoOrdenado(entregar, self.hilos_vosk)
+            try:
+                for inicio, fin in fragmentos:
+                    canal.enviar(self.transcribir_fragmento_vosk, lector, modelo, inicio, fin, contexto=inicio)
+            finally:
+                canal.cerrar()
 
-                        texto = self.aplicar_correcciones_post(texto, idioma)
+            self.interfaz.estado("Transcripción completada")
+            self.interfaz.insertar("\n--- Fin de la transcripción ---\n")
 
-                        transcripciones_previas.append(texto)
-                        if len(transcripciones_previas) > 5:
-                            transcripciones_previas = transcripciones_previas[-5:]
+            print(f"Transcripción de archivo completada: {os.path.basename(archivo_audio)}")
+
+        except Exception as e:
+            print(f"Error al procesar archivo en paralelo: {e}")
+            self.interfaz.estado(f"Error: {str(e)}")
+
+        finally:
+            if lector is not None:
+                lector.cerrar()
+            registro_modelos_vosk.liberar(ruta_modelo)
+
+    def procesar_archivo_por_segmentos(self, archivo_audio, duracion_total, modo):
+        """Procesa un archivo de audio grande por segmentos con solapamiento (modo online)"""
+        lector = None
+
+        if modo != "online":
+            # Los archivos offline se decodifican de forma continua; sin modelo no se envía nada a Google
+            idioma_base = self.idioma_var.get().split('-')[0]
+            self.interfaz.estado(f"No hay modelo Vosk disponible para {idioma_base}")
+            return
+
+        try:
+            idioma = self.idioma_var.get()
+
+            tamano_segmento = 15
+            solapamiento = 2
+
+            self.interfaz.insertar("Transcribiendo sólo las regiones con voz del archivo...\n\n")
+
+            anterior = None  # (segundo_fin, texto) de la última ventana reconocida
+            resumen = {}
+
+            # El archivo se abre una sola vez y el silencio se salta sin enviarlo a Google
+            lector = self.abrir_fuente_audio(archivo_audio)
+            reductor = self.crear_reductor_ruido(self.cancelacion_ruido_archivo, lector.tasa_salida)
+
+            for i, (offset, datos) in enumerate(self.ventanas_de_voz(lector, tamano_segmento, solapamiento, reductor, resumen)):
+                progreso = min(100, int(offset * 100 / duracion_total)) if duracion_total else 0
+                self.interfaz.estado(f"Procesando segmento {i+1} ({progreso}%)...")
 
-                        horas_inicio = int(offset // 3600)
-                        min_inicio = int((offset % 3600) // 60)
-                        seg_inicio = int(offset % 60)
+                texto = ''
 
-                        tiempo_formateado = f"[{horas_inicio:02d}:{min_inicio:02d}:{seg_inicio:02d}]"
+                try:
+                    audio_segmento = sr.AudioData(datos, lector.tasa_salida, lector.ancho_salida)
 
-                        texto_con_etiquetas = self.detectar_palabras_clave(texto)
+                    # Transcribir el segmento
+                    texto = self.reconocedor.recognize_google(audio_segmento, language=idioma)
 
-                        self.root.after(0, lambda tiempo=tiempo_formateado, texto=texto_con_etiquetas: 
-                                    self.actualizar_transcripcion_con_tiempo(tiempo, texto))
+                    if texto and texto.strip():
+                        # Quitar las palabras que repiten el final de la ventana anterior (solapamiento real, en segundos)
+                        segundo_fin = offset + len(datos) / float(lector.tasa_salida * lector.ancho_salida)
+                        texto_completo = texto_nuevo = texto
+                        if anterior:
+                            texto_nuevo = self.fusionador_solapamiento.fusionar(anterior[1], texto, anterior[0] - offset)
+                        anterior = (segundo_fin, texto)
+
+                        if not texto_nuevo:
+                            continue
+                        texto = self.aplicar_correcciones_post(texto_nuevo, idioma)
+                        self.publicar_enunciado(offset, segundo_fin, texto, texto_completo=texto_completo)
 
                 except sr.UnknownValueError:
                     pass
@@ -1919,15 +3952,25 @@ class TranscriptorMultilingue:
                 except Exception as e:
                     print(f"Error en segmento {i+1}: {e}")
 
-            self.root.after(0, lambda: self.estado_var.set("Transcripción completada"))
-            self.root.after(0, lambda: self.texto_transcripcion.insert(tk.END, 
-                        "\n--- Fin de la transcripción ---\n"))
+            if resumen.get('segundos_totales'):
+                omitido = 1 - resumen['segundos_voz'] / resumen['segundos_totales']
+                mensaje = (f"\nSilencio omitido: {omitido:.0%} del audio "
+                           f"({int(resumen['segundos_voz'])} s con voz de {int(resumen['segundos_totales'])} s)\n")
+                print(mensaje.strip())
+                self.interfaz.insertar(mensaje)
+
+            self.interfaz.estado("Transcripción completada")
+            self.interfaz.insertar("\n--- Fin de la transcripción ---\n")
 
             print(f"Transcripción de archivo completada: {os.path.basename(archivo_audio)}")
 
         except Exception as e:
             print(f"Error al procesar archivo por segmentos: {e}")
-            self.root.after(0, lambda: self.estado_var.set(f"Error: {str(e)}"))
+            self.interfaz.estado(f"Error: {str(e)}")
+
+        finally:
+            if lector is not None:
+                lector.cerrar()
             
             
             
@@ -2274,7 +4317,7 @@ class TranscriptorMultilingue:
             opciones_frame,
             text="Cancelación de ruido",
             variable=self.cancelacion_ruido_var,
-            state=tk.NORMAL if pydub_disponible else tk.DISABLED
+            state=tk.NORMAL if numpy_disponible else tk.DISABLED
         ).pack(side=tk.LEFT, padx=(0, 15))
 
         dispositivos_frame = ttk.LabelFrame(config_frame, text="Dispositivos de Audio", padding=10)
@@ -2650,7 +4693,7 @@ class TranscriptorMultilingue:
         self.reconocedor.dynamic_energy_threshold = True
         self.ajuste_dinamico_var.set(self.reconocedor.dynamic_energy_threshold)
 
-        self.cancelacion_ruido_var.set(True and pydub_disponible)
+        self.cancelacion_ruido_var.set(numpy_disponible)
 
         self.formato_salida.set("txt")
 
@@ -2679,6 +4722,7 @@ class TranscriptorMultilingue:
             "Vosk": "Instalado" if vosk_disponible else "No instalado",
             "Cryptography": "Instalado" if encriptacion_disponible else "No instalado",
             "pydub": "Instalado" if pydub_disponible else "No instalado",
+            "numpy": "Instalado" if numpy_disponible else "No instalado",
             "python-docx": "Instalado" if docx_disponible else "No instalado"
         }
 
@@ -2760,6 +4804,9 @@ class TranscriptorMultilingue:
         if not pydub_disponible:
             problemas.append("pydub no está instalado. La conversión de formatos no estará disponible.")
 
+        if not numpy_disponible:
+            problemas.append("numpy no está instalado. La cancelación de ruido no estará disponible.")
+
         if problemas:
             for problema in problemas:
                 ttk.Label(
@@ -29,6 +29,11 @@ import time
 import tempfile
 import queue
 import math
+import json
+import re
+import shutil
+import subprocess
+from collections import deque
 from datetime import datetime
 import numpy as np
 
@@ -40,6 +45,838 @@ except ImportError:
     pydub_disponible = False
     print("Nota: pydub no está instalado. La conversión de formatos no estará disponible.")
 
+# ffmpeg permite decodificar MP3/OGG/FLAC en streaming sin convertir el archivo completo a WAV
+ruta_ffmpeg = shutil.which("ffmpeg")
+ruta_ffprobe = shutil.which("ffprobe")
+
+# Correcciones aplicadas al texto reconocido; correcciones.json, junto al programa, puede ampliarlas
+CORRECCIONES_PREDETERMINADAS = {
+    "es": {"sin_espacio_antes": "?!,.:;", "sin_espacio_despues": "¿¡"},
+}
+
+
+class RemuestreadorPolifasico:
+    """Cambia la tasa de muestreo de un flujo de audio con un filtro sinc enventanado en forma polifásica.
+    
+    Conserva entre llamadas las últimas muestras de entrada, de modo que el
+    audio puede procesarse por bloques sin discontinuidades en las uniones.
+    """
+    
+    def __init__(self, tasa_origen, tasa_destino, ceros=16):
+        divisor = math.gcd(tasa_origen, tasa_destino)
+        self.arriba = tasa_destino // divisor
+        self.abajo = tasa_origen // divisor
+        
+        # Filtro prototipo a la tasa intermedia, con corte algo por debajo de la menor frecuencia de Nyquist
+        factor = max(self.arriba, self.abajo)
+        longitud = 2 * ceros * factor + 1
+        corte = 0.475 / factor
+        n = np.arange(longitud) - (longitud - 1) / 2.0
+        filtro = 2 * corte * np.sinc(2 * corte * n) * np.kaiser(longitud, 8.0) * self.arriba
+        
+        # Fase p, coeficiente j -> filtro[p + j * arriba], en orden inverso para aplicarlo a ventanas de entrada
+        self.coeficientes = -(-longitud // self.arriba)
+        filtro = np.pad(filtro, (0, self.coeficientes * self.arriba - longitud))
+        fases = filtro.reshape(self.coeficientes, self.arriba).T[:, ::-1]
+        self._fases = np.ascontiguousarray(fases, dtype=np.float32)
+        self._retardo = (longitud - 1) // 2
+        
+        self._historia = np.zeros(self.coeficientes - 1, dtype=np.float32)
+        self._inicio_historia = -(self.coeficientes - 1)  # Índice absoluto de _historia[0]
+        self._muestras_entrada = 0
+        self._siguiente_salida = 0
+    
+    def procesar(self, muestras):
+        """Remuestrea un bloque de muestras float32 y devuelve las muestras de salida ya completas"""
+        buffer = np.concatenate((self._historia, muestras.astype(np.float32, copy=False)))
+        self._muestras_entrada += len(muestras)
+        
+        # Salidas cuyo último coeficiente cae dentro de la entrada recibida
+        fin = -(-(self._muestras_entrada * self.arriba - self._retardo) // self.abajo)
+        return self._generar(buffer, max(self._siguiente_salida, fin), self._muestras_entrada)
+    
+    def vaciar(self):
+        """Completa la salida al final del flujo rellenando con silencio"""
+        relleno = self._retardo // self.arriba + self.coeficientes + 1
+        buffer = np.concatenate((self._historia, np.zeros(relleno, dtype=np.float32)))
+        fin = -(-self._muestras_entrada * self.arriba // self.abajo)
+        return self._generar(buffer, max(self._siguiente_salida, fin), self._muestras_entrada + relleno)
+    
+    def _generar(self, buffer, fin, limite):
+        posiciones = np.arange(self._siguiente_salida, fin) * self.abajo + self._retardo
+        fases = posiciones % self.arriba
+        ultimas = posiciones // self.arriba - self._inicio_historia
+        
+        # Fila k: las entradas que pondera la salida k, de la más antigua a la más reciente
+        filas = np.lib.stride_tricks.sliding_window_view(buffer, self.coeficientes)[ultimas - (self.coeficientes - 1)]
+        salida = np.einsum('kj,kj->k', filas, self._fases[fases])
+        
+        # Guardar sólo la entrada que aún necesitan las próximas salidas
+        self._siguiente_salida = fin
+        conservar_desde = min((fin * self.abajo + self._retardo) // self.arriba - (self.coeficientes - 1), limite)
+        self._historia = buffer[conservar_desde - self._inicio_historia:]
+        self._inicio_historia = conservar_desde
+        
+        return salida
+
+
+class ReductorRuido:
+    """Preprocesado de voz en memoria con numpy: filtro paso alto, control automático de ganancia y,
+    opcionalmente, sustracción espectral del ruido de fondo.
+    
+    Conserva su estado entre llamadas, así que el audio debe pasar una sola vez
+    y en orden, en bloques de cualquier tamaño. Con sustracción espectral la
+    salida se retrasa dos medias tramas (32 ms a 16 kHz).
+    """
+    
+    TRAMO_IIR = 256
+    
+    def __init__(self, tasa=16000, corte_hz=80, nivel_objetivo=3000.0, ganancia_maxima=10.0,
+                 umbral_silencio=150.0, sustraccion_espectral=False):
+        self.tasa = tasa
+        
+        # Paso alto de un polo, el mismo que aplicaba pydub.high_pass_filter
+        rc = 1.0 / (2 * math.pi * corte_hz)
+        self._alfa = rc / (rc + 1.0 / tasa)
+        self._potencias = self._alfa ** np.arange(1, self.TRAMO_IIR + 1)
+        self._x_anterior = 0.0
+        self._y_anterior = 0.0
+        
+        # Control de ganancia por tramos de 20 ms, con constante de tiempo de 0.4 s
+        self.nivel_objetivo = nivel_objetivo
+        self.ganancia_maxima = ganancia_maxima
+        self.umbral_silencio = umbral_silencio
+        self._ganancia = 1.0
+        self._tramo_agc = max(1, tasa // 50)
+        self._suavizado_agc = 1 - math.exp(-self._tramo_agc / (0.4 * tasa))
+        
+        self.sustraccion_espectral = sustraccion_espectral
+        if sustraccion_espectral:
+            self._salto = 256 if tasa >= 16000 else 128
+            self._ventana = np.sqrt(np.hanning(2 * self._salto + 1)[:-1])
+            self._entrada = np.zeros(self._salto)
+            self._salida_pendiente = np.zeros(self._salto)
+            self._solape = np.zeros(self._salto)
+            self._ruido = None
+    
+    def procesar_pcm(self, datos):
+        """Procesa un bloque de PCM int16 y devuelve otro del mismo tamaño"""
+        muestras = self.procesar(np.frombuffer(datos, dtype=np.int16))
+        return np.clip(np.round(muestras), -32768, 32767).astype(np.int16).tobytes()
+    
+    def procesar(self, muestras):
+        """Procesa un bloque de muestras (escala de int16) y devuelve el mismo número de muestras"""
+        if len(muestras) == 0:
+            return np.zeros(0, dtype=np.float32)
+        
+        x = self._paso_alto(np.asarray(muestras, dtype=np.float64))
+        if self.sustraccion_espectral:
+            x = self._sustraer_ruido(x)
+        return self._control_ganancia(x).astype(np.float32)
+    
+    def _paso_alto(self, x):
+        # y[k] = alfa * y[k-1] + alfa * (x[k] - x[k-1]), resuelta en forma cerrada por tramos
+        n = len(x)
+        u = np.empty(n)
+        u[0] = x[0] - self._x_anterior
+        u[1:] = np.diff(x)
+        u *= self._alfa
+        self._x_anterior = x[-1]
+        
+        filas = -(-n // self.TRAMO_IIR)
+        u = np.pad(u, (0, filas * self.TRAMO_IIR - n)).reshape(filas, self.TRAMO_IIR)
+        p = self._potencias
+        
+        # Respuesta de cada tramo con estado inicial nulo; luego se propaga el estado entre tramos
+        local = p * np.cumsum(u / p, axis=1)
+        estados = np.empty(filas)
+        y = self._y_anterior
+        for i in range(filas):
+            estados[i] = y
+            y = local[i, -1] + p[-1] * y
+        
+        salida = (local + p * estados[:, None]).ravel()[:n]
+        self._y_anterior = salida[-1]
+        return salida
+    
+    def _sustraer_ruido(self, x):
+        salto = self._salto
+        self._entrada = np.concatenate((self._entrada, x))
+        num_tramas = (len(self._entrada) - salto) // salto
+        
+        if num_tramas > 0:
+            tramas = np.lib.stride_tricks.sliding_window_view(self._entrada, 2 * salto)[::salto][:num_tramas]
+            espectros = np.fft.rfft(tramas * self._ventana, axis=1)
+            potencias = np.maximum(np.abs(espectros) ** 2, 1e-10)
+        
+            # Estimación del ruido por banda: baja cinco veces más rápido de lo que sube, así sigue
+            # el fondo y no la voz (queda en torno a la mitad de la potencia media del ruido)
+            ruidos = np.empty_like(potencias)
+            ruido = potencias[0].copy() if self._ruido is None else self._ruido
+            for i in range(num_tramas):
+                ruido = np.where(potencias[i] < ruido, 0.9 * ruido + 0.1 * potencias[i],
+                                 0.98 * ruido + 0.02 * potencias[i])
+                ruidos[i] = ruido
+            self._ruido = ruido
+        
+            # Sobresustracción x2 con un suelo de -20 dB para limitar el ruido musical
+            ganancias = np.sqrt(np.maximum(1 - 2 * ruidos / potencias, 0.01))
+            salida_tramas = np.fft.irfft(espectros * ganancias, n=2 * salto, axis=1) * self._ventana
+        
+            # Solapamiento y suma con la mitad final de la trama anterior
+            bloques = salida_tramas[:, :salto].copy()
+            bloques[0] += self._solape
+            bloques[1:] += salida_tramas[:-1, salto:]
+            self._solape = salida_tramas[-1, salto:]
+        
+            self._salida_pendiente = np.concatenate((self._salida_pendiente, bloques.ravel()))
+            self._entrada = self._entrada[num_tramas * salto:]
+        
+        salida = self._salida_pendiente[:len(x)]
+        self._salida_pendiente = self._salida_pendiente[len(x):]
+        return salida
+    
+    def _control_ganancia(self, x):
+        n = len(x)
+        tramo = self._tramo_agc
+        filas = -(-n // tramo)
+        niveles = np.sqrt(np.mean(np.pad(x, (0, filas * tramo - n)).reshape(filas, tramo) ** 2, axis=1))
+        
+        # El último tramo puede estar incompleto: su nivel y su peso se calculan sobre las muestras reales
+        ultimo = n - (filas - 1) * tramo
+        niveles[-1] *= math.sqrt(tramo / ultimo)
+        suavizados = np.full(filas, self._suavizado_agc)
+        suavizados[-1] = 1 - math.exp(-ultimo / (0.4 * self.tasa))
+        
+        # En silencio se mantiene la ganancia para no amplificar el ruido de fondo
+        ganancias = np.empty(filas)
+        g = self._ganancia
+        for i in range(filas):
+            if niveles[i] > self.umbral_silencio:
+                objetivo = min(self.ganancia_maxima, max(0.1, self.nivel_objetivo / niveles[i]))
+                g += suavizados[i] * (objetivo - g)
+            ganancias[i] = g
+        
+        # Interpolar entre los centros de los tramos para que la ganancia no cambie a saltos
+        centros = np.arange(filas) * tramo + tramo / 2.0
+        curva = np.interp(np.arange(n), np.concatenate(([-1.0], centros)),
+                          np.concatenate(([self._ganancia], ganancias)))
+        self._ganancia = g
+        return x * curva
+
+
+class DetectorVoz:
+    """Detector de actividad de voz por energía y cruces por cero que agrupa el audio en enunciados.
+    
+    Recibe PCM mono int16 en bloques de cualquier tamaño y devuelve cada
+    enunciado, con un margen de audio antes y después, en cuanto termina la
+    pausa que lo cierra. El silencio entre enunciados no se entrega. El piso de
+    ruido se adapta con las tramas de silencio.
+    """
+    
+    def __init__(self, tasa=16000, pausa=0.5, margen=0.3, duracion_minima=0.3, duracion_maxima=15.0, calibrador=None):
+        self.tasa = tasa
+        self.calibrador = calibrador  # CalibradorRuido que recibe la energía de las tramas de silencio
+        self.tamano_trama = tasa // 50  # Tramas de 20 ms
+        self.tramas_inicio = 3  # 60 ms seguidos de voz abren un enunciado
+        self.tramas_pausa = int(pausa * 50)
+        self.tramas_margen = int(margen * 50)
+        self.tramas_minimas = int(duracion_minima * 50)
+        self.tramas_maximas = int(duracion_maxima * 50)
+        
+        self.piso_ruido_db = None
+        self._resto = b''
+        self._tramas_analizadas = 0
+        self._previas = deque(maxlen=self.tramas_margen + self.tramas_inicio)  # (trama, energía) antes del enunciado
+        self._enunciado = None  # Lista de (trama, energía) del enunciado en curso
+        self._inicio_enunciado = 0  # Índice de su primera trama
+        self._tramas_voz = 0
+        self._silencio = 0
+        self._voz_seguida = 0
+    
+    def procesar(self, datos):
+        """Analiza un bloque de PCM y devuelve una lista de enunciados completos (segundo de inicio, PCM)"""
+        datos = self._resto + datos
+        bytes_trama = self.tamano_trama * 2
+        num_tramas = len(datos) // bytes_trama
+        self._resto = datos[num_tramas * bytes_trama:]
+        if num_tramas == 0:
+            return []
+        
+        energias, voz = self._clasificar(np.frombuffer(datos, dtype=np.int16, count=num_tramas * self.tamano_trama))
+        
+        enunciados = []
+        for i in range(num_tramas):
+            trama = datos[i * bytes_trama:(i + 1) * bytes_trama]
+            self._avanzar(trama, energias[i], voz[i], enunciados)
+        return enunciados
+    
+    def vaciar(self):
+        """Cierra el enunciado en curso al terminar la captura"""
+        enunciados = []
+        if self._enunciado is not None:
+            self._cerrar(len(self._enunciado) - max(0, self._silencio - self.tramas_margen), enunciados)
+        return enunciados
+    
+    def _clasificar(self, muestras):
+        tramas = muestras.reshape(-1, self.tamano_trama).astype(np.float32)
+        potencias = np.mean(tramas ** 2, axis=1)
+        energias = 10 * np.log10(potencias + 1.0)
+        signos = tramas >= 0
+        cruces = np.mean(signos[:, 1:] != signos[:, :-1], axis=1)
+        
+        if self.piso_ruido_db is None:
+            self.piso_ruido_db = float(energias.min())
+        
+        # La voz sonora destaca por energía; las fricativas, más débiles, por su tasa de cruces por cero
+        voz = np.empty(len(energias), dtype=bool)
+        piso = self.piso_ruido_db
+        for i, energia in enumerate(energias):
+            voz[i] = energia > 30 and (energia > piso + 9 or (energia > piso + 4 and cruces[i] > 0.3))
+            if not voz[i]:
+                # El piso baja enseguida y sube despacio con las tramas de silencio
+                piso = energia if energia < piso else 0.95 * piso + 0.05 * energia
+            else:
+                # Un ruido de fondo que sube de golpe acaba absorbido en unos segundos
+                piso += 0.01
+        self.piso_ruido_db = piso
+
+        if self.calibrador:
+            self.calibrador.actualizar(np.sqrt(potencias[~voz]))
+        
+        return energias, voz
+    
+    def _avanzar(self, trama, energia, voz, enunciados):
+        self._tramas_analizadas += 1
+        
+        if self._enunciado is None:
+            self._previas.append((trama, energia))
+            self._voz_seguida = self._voz_seguida + 1 if voz else 0
+        
+            if self._voz_seguida >= self.tramas_inicio:
+                # Abrir el enunciado incluyendo el margen previo
+                self._enunciado = list(self._previas)
+                self._inicio_enunciado = self._tramas_analizadas - len(self._enunciado)
+                self._tramas_voz = self._voz_seguida
+                self._silencio = 0
+                self._previas.clear()
+            return
+        
+        self._enunciado.append((trama, energia))
+        if voz:
+            self._tramas_voz += 1
+            self._silencio = 0
+        else:
+            self._silencio += 1
+        
+        if self._silencio >= self.tramas_pausa:
+            # La pausa cierra el enunciado; se conserva sólo el margen de silencio final
+            self._cerrar(len(self._enunciado) - (self._silencio - self.tramas_margen), enunciados)
+        elif len(self._enunciado) >= self.tramas_maximas:
+            # Enunciado demasiado largo: cortar en la trama más débil del último segundo
+            ultimo_segundo = range(len(self._enunciado) - 50, len(self._enunciado))
+            corte = min(ultimo_segundo, key=lambda j: self._enunciado[j][1]) + 1
+            self._cerrar(corte, enunciados, continuar=True)
+    
+    def _cerrar(self, fin, enunciados, continuar=False):
+        tramas = self._enunciado[:fin]
+        if self._tramas_voz >= self.tramas_minimas or continuar:
+            segundo_inicio = self._inicio_enunciado * self.tamano_trama / float(self.tasa)
+            enunciados.append((segundo_inicio, b''.join(trama for trama, _ in tramas)))
+        
+        sobrantes = self._enunciado[fin:]
+        if continuar:
+            # El resto sigue siendo voz y abre directamente el siguiente enunciado
+            self._enunciado = sobrantes
+            self._inicio_enunciado += fin
+            self._tramas_voz = len(sobrantes)
+        else:
+            self._enunciado = None
+            self._voz_seguida = 0
+            self._previas.extend(sobrantes)
+
+
+class CalibradorRuido:
+    """Estimación del nivel de ruido de fondo compartida con el umbral de energía del reconocedor.
+    
+    El piso se estima una vez por fuente de audio y después se sigue con una
+    media móvil exponencial de las tramas que el detector de voz clasifica como
+    silencio, de modo que ningún segmento pierde audio en calibraciones.
+    Con el ajuste dinámico activado, energy_threshold = ruido * dynamic_energy_ratio.
+    """
+    
+    def __init__(self, reconocedor, suavizado=0.02, umbral_minimo=50):
+        self.reconocedor = reconocedor
+        self.suavizado = suavizado
+        self.umbral_minimo = umbral_minimo
+        self.ruido_rms = None
+    
+    def estimar(self, datos, tasa=16000):
+        """Estima el piso de ruido de una fuente a partir de su PCM mono int16 (percentil 10 de tramas de 20 ms)"""
+        tamano_trama = max(1, tasa // 50)
+        muestras = np.frombuffer(datos, dtype=np.int16)
+        num_tramas = len(muestras) // tamano_trama
+        if num_tramas == 0:
+            return
+        
+        tramas = muestras[:num_tramas * tamano_trama].reshape(num_tramas, tamano_trama).astype(np.float32)
+        self.fijar(float(np.percentile(np.sqrt(np.einsum('ij,ij->i', tramas, tramas) / tamano_trama), 10)))
+    
+    def fijar(self, ruido_rms):
+        """Establece el piso de ruido de una fuente nueva"""
+        self.ruido_rms = ruido_rms
+        self._aplicar()
+    
+    def actualizar(self, energias_silencio):
+        """Incorpora las energías RMS de tramas de silencio a la media móvil exponencial"""
+        n = len(energias_silencio)
+        if n == 0:
+            return
+        if self.ruido_rms is None:
+            self.ruido_rms = float(energias_silencio[0])
+        
+        # Forma cerrada de n pasos de r = (1 - a) * r + a * e
+        a = self.suavizado
+        pesos = a * (1 - a) ** np.arange(n - 1, -1, -1)
+        self.ruido_rms = float((1 - a) ** n * self.ruido_rms + np.dot(pesos, energias_silencio))
+        self._aplicar()
+    
+    def _aplicar(self):
+        if self.reconocedor.dynamic_energy_threshold:
+            umbral = self.ruido_rms * self.reconocedor.dynamic_energy_ratio
+            self.reconocedor.energy_threshold = max(self.umbral_minimo, umbral)
+
+
+class DecodificadorAudio:
+    """Decodifica con ffmpeg un archivo comprimido a PCM mono int16 y lo entrega por bloques.
+
+    El PCM se lee de la tubería a medida que se consume, así que la memoria
+    usada no depende de la duración del archivo y la transcripción empieza con
+    los primeros bloques.
+    """
+    
+    def __init__(self, ruta, tasa=16000):
+        self.ruta = ruta
+        self.tasa = tasa
+        self.ancho_muestra = 2
+        
+        # Los errores de ffmpeg van a un archivo temporal para no bloquear la tubería
+        self._errores = tempfile.TemporaryFile()
+        self._proceso = subprocess.Popen(
+            [ruta_ffmpeg, '-nostdin', '-v', 'error', '-i', ruta,
+             '-f', 's16le', '-acodec', 'pcm_s16le', '-ac', '1', '-ar', str(tasa), '-'],
+            stdout=subprocess.PIPE, stderr=self._errores)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *args):
+        self.cerrar()
+    
+    @staticmethod
+    def sondear(ruta):
+        """Devuelve (duración, canales, tasa) del archivo según ffprobe, o None si no se puede averiguar"""
+        if not ruta_ffprobe:
+            return None
+        
+        try:
+            salida = subprocess.run(
+                [ruta_ffprobe, '-v', 'error', '-select_streams', 'a:0',
+                 '-show_entries', 'format=duration:stream=channels,sample_rate', '-of', 'json', ruta],
+                capture_output=True, timeout=30).stdout
+            info = json.loads(salida)
+            stream = info['streams'][0]
+            return float(info['format']['duration']), int(stream['channels']), int(stream['sample_rate'])
+        except Exception as e:
+            print(f"No se pudo obtener la información de {os.path.basename(ruta)}: {e}")
+            return None
+    
+    def bloques(self, frames_bloque=4000, reductor=None):
+        """Genera el PCM decodificado en bloques de frames_bloque frames, pasándolo por el reductor de ruido si se indica"""
+        while True:
+            datos = self._proceso.stdout.read(frames_bloque * self.ancho_muestra)
+            if not datos:
+                break
+            yield reductor.procesar_pcm(datos) if reductor else datos
+        
+        if self._proceso.wait() != 0:
+            self._errores.seek(0)
+            mensaje = self._errores.read().decode('utf-8', 'replace').strip()
+            raise ValueError(f"ffmpeg no pudo decodificar {os.path.basename(self.ruta)}: {mensaje}")
+    
+    def cerrar(self):
+        """Detiene ffmpeg si sigue en marcha y libera la tubería"""
+        if self._proceso.poll() is None:
+            self._proceso.kill()
+        self._proceso.stdout.close()
+        self._proceso.wait()
+        self._errores.close()
+
+
+class MotorCorrecciones:
+    """Reglas de corrección por idioma, compiladas una sola vez en una expresión regular por idioma.
+    
+    Cada idioma admite sustituciones de palabras completas ("palabras", sin
+    distinguir mayúsculas y conservando la inicial mayúscula) y los signos ante
+    los que sobra un espacio ("sin_espacio_antes") o tras los que sobra
+    ("sin_espacio_despues"). Un archivo JSON con la misma estructura, editable
+    por el usuario, amplía o sustituye las reglas predeterminadas. Todas las
+    correcciones de un texto se aplican en una sola pasada.
+    """
+    
+    def __init__(self, reglas_predeterminadas, ruta_reglas=None):
+        self.reglas = {idioma: dict(reglas) for idioma, reglas in reglas_predeterminadas.items()}
+        
+        if ruta_reglas and os.path.exists(ruta_reglas):
+            try:
+                with open(ruta_reglas, 'r', encoding='utf-8') as f:
+                    for idioma, reglas in json.load(f).items():
+                        actuales = self.reglas.setdefault(idioma, {})
+                        for clave, valor in reglas.items():
+                            if clave == "palabras":
+                                actuales[clave] = dict(actuales.get(clave, {}), **valor)
+                            else:
+                                actuales[clave] = valor
+            except Exception as e:
+                print(f"Error al cargar las reglas de corrección: {e}")
+        
+        self._compiladas = {idioma: self._compilar(reglas) for idioma, reglas in self.reglas.items()}
+    
+    def aplicar(self, texto, idioma):
+        """Aplica todas las correcciones del idioma ('es-ES' o 'es') en una sola pasada"""
+        compilada = self._compiladas.get(idioma.split('-')[0])
+        if compilada is None or not texto:
+            return texto
+        
+        patron, palabras = compilada
+        
+        def sustituir(coincidencia):
+            if coincidencia.lastgroup == "signo":
+                # Espacio sobrante tras un signo de apertura
+                return coincidencia.group("signo")
+            if coincidencia.lastgroup != "palabra":
+                # Espacio sobrante ante un signo de puntuación
+                return ""
+            original = coincidencia.group("palabra")
+            reemplazo = palabras[original.lower()]
+            if original[0].isupper():
+                reemplazo = reemplazo[:1].upper() + reemplazo[1:]
+            return reemplazo
+        
+        return patron.sub(sustituir, texto)
+    
+    @staticmethod
+    def _compilar(reglas):
+        palabras = {original.lower(): reemplazo for original, reemplazo in reglas.get("palabras", {}).items()}
+        
+        alternativas = []
+        if palabras:
+            # La anticipación con las iniciales descarta enseguida casi todas las posiciones del texto
+            iniciales = "".join(sorted(set(clave[0] for clave in palabras if clave)))
+            alternativas.append(r"(?=[" + re.escape(iniciales) + r"])(?<!\w)(?P<palabra>"
+                                + MotorCorrecciones._patron_prefijos(palabras) + r")(?!\w)")
+        if reglas.get("sin_espacio_antes"):
+            alternativas.append(r" +(?=[" + re.escape(reglas["sin_espacio_antes"]) + r"])")
+        if reglas.get("sin_espacio_despues"):
+            alternativas.append(r"(?P<signo>[" + re.escape(reglas["sin_espacio_despues"]) + r"]) +")
+        
+        if not alternativas:
+            return None
+        return re.compile("|".join(alternativas), re.IGNORECASE), palabras
+    
+    @staticmethod
+    def _patron_prefijos(claves):
+        # Las claves se factorizan por prefijos comunes ("x(?:a|q)?"): el motor de expresiones
+        # regulares no prueba las alternativas una a una y el coste no crece con el número de reglas
+        raiz = {}
+        for clave in claves:
+            nodo = raiz
+            for c in clave:
+                nodo = nodo.setdefault(c, {})
+            nodo[""] = {}
+        
+        def construir(nodo):
+            ramas = [re.escape(c) + construir(hijo) for c, hijo in sorted(nodo.items()) if c]
+            if not ramas:
+                return ""
+            patron = ramas[0] if len(ramas) == 1 else "(?:" + "|".join(ramas) + ")"
+            if "" in nodo:
+                patron = "(?:" + patron + ")?"
+            return patron
+        
+        return construir(raiz)
+
+
+class FusionadorSolapamiento:
+    """Quita las palabras repetidas al unir las hipótesis de dos tramos de audio solapados.
+    
+    Alinea palabra a palabra el final de la hipótesis anterior con el comienzo
+    de la nueva por programación dinámica (semiglobal: la alineación puede
+    empezar en cualquier punto de la anterior, pero llega hasta su última
+    palabra). La búsqueda se limita a las palabras que caben en la duración
+    conocida del solapamiento, así que el coste es O(solapamiento²) y no
+    depende de la longitud de los textos.
+    """
+    
+    ACIERTO, FALLO, HUECO = 2, -1, -1
+    
+    def __init__(self, palabras_por_segundo=3.5, margen=3, coincidencias_minimas=2):
+        self.palabras_por_segundo = palabras_por_segundo  # Ritmo de habla holgado para acotar la búsqueda
+        self.margen = margen  # Palabras extra por si el corte del solapamiento parte una palabra
+        self.coincidencias_minimas = coincidencias_minimas
+    
+    def fusionar(self, anterior, nuevo, segundos_solapamiento):
+        """Devuelve nuevo sin las palabras iniciales que repiten el final de anterior"""
+        if not anterior or not nuevo or segundos_solapamiento <= 0:
+            return nuevo
+        
+        limite = int(math.ceil(segundos_solapamiento * self.palabras_por_segundo)) + self.margen
+        # Sólo se separan las palabras de los extremos; el resto del texto no se recorre
+        palabras = nuevo.split(None, limite)
+        previas = [self._normalizar(palabra) for palabra in anterior.rsplit(None, limite)[-limite:]]
+        nuevas = [self._normalizar(palabra) for palabra in palabras[:limite]]
+        
+        corte = self._alinear(previas, nuevas)
+        return ' '.join(palabras[corte:])
+    
+    def _alinear(self, previas, nuevas):
+        # Cada celda guarda (puntuación, coincidencias) de la mejor alineación de un sufijo
+        # de previas[:i] con nuevas[:j]; basta con conservar la fila anterior
+        fila = [(-j, 0) for j in range(len(nuevas) + 1)]
+        
+        for i in range(1, len(previas) + 1):
+            actual = [(0, 0)]
+            for j in range(1, len(nuevas) + 1):
+                acierto = previas[i - 1] == nuevas[j - 1]
+                diagonal = (fila[j - 1][0] + (self.ACIERTO if acierto else self.FALLO), fila[j - 1][1] + acierto)
+                arriba = (fila[j][0] + self.HUECO, fila[j][1])
+                izquierda = (actual[j - 1][0] + self.HUECO, actual[j - 1][1])
+                actual.append(max(diagonal, arriba, izquierda))
+            fila = actual
+        
+        # La alineación termina en la última palabra anterior; el corte es hasta dónde llega en la nueva
+        corte = max(range(len(nuevas) + 1), key=lambda j: fila[j])
+        return corte if fila[corte][1] >= self.coincidencias_minimas else 0
+    
+    @staticmethod
+    def _normalizar(palabra):
+        return palabra.lower().strip('.,;:!?¿¡"\'()')
+
+
+class TranscripcionEstructurada:
+    """Almacén de la transcripción: enunciados con sus tiempos, texto, palabras clave y confianza.
+    
+    Los registros sólo se añaden: la interfaz muestra cada uno al llegar y las
+    exportaciones (texto, docx, SRT, encriptado) leen de aquí sin pasar por el
+    widget. Cada registro es {'inicio', 'fin', 'texto', 'confianza', 'tiempos', 'claves'}:
+    tiempos son tuplas (inicio, fin, confianza) alineadas con las palabras del texto
+    y claves los tramos (inicio, fin) del texto con palabras clave. Cuando el
+    reconocedor no da tiempos por palabra (Google) se reparten por la geometría del
+    tramo, en proporción a la longitud de cada palabra. Una revisión (la pasada
+    final) añade sus registros y deja sin efecto los que sustituye, sin borrarlos.
+    """
+    
+    def __init__(self):
+        self.registros = []
+        self.revisiones = []  # (desde, hasta) de los registros sustituidos por una revisión posterior
+        self._lock = threading.Lock()  # Los hilos de reconocimiento añaden mientras la interfaz exporta
+    
+    def __len__(self):
+        return len(self.registros)
+    
+    def crear_registro(self, inicio, fin, texto, confianza=None, palabras=None, texto_completo=None, claves=()):
+        """Construye un registro con tiempos por palabra.
+        
+        palabras son las de Vosk (sus tiempos se conservan y el texto corregido
+        sustituye al reconocido). texto_completo es la hipótesis entera del tramo
+        cuando texto es sólo su final, tras quitar lo que repetía el solapamiento.
+        """
+        tokens = texto.split()
+        if palabras and len(palabras) == len(tokens):
+            tiempos = tuple((palabra['start'], palabra['end'], palabra.get('conf', 1.0)) for palabra in palabras)
+        else:
+            if palabras:
+                # Las correcciones cambiaron el número de palabras: se reparte dentro de lo que Vosk ocupó
+                inicio, fin = palabras[0]['start'], palabras[-1]['end']
+            tiempos = self.repartir_tiempos(inicio, fin, texto_completo or texto, confianza)
+            if len(tiempos) < len(tokens):
+                tiempos = self.repartir_tiempos(inicio, fin, texto, confianza)
+            tiempos = tiempos[len(tiempos) - len(tokens):]
+        
+        if tiempos:
+            inicio, fin = tiempos[0][0], tiempos[-1][1]
+        return {'inicio': inicio, 'fin': fin, 'texto': texto, 'confianza': confianza,
+                'tiempos': tiempos, 'claves': tuple(claves)}
+    
+    def agregar(self, inicio, fin, texto, confianza=None, palabras=None, texto_completo=None, claves=()):
+        """Añade un enunciado al final de la transcripción y devuelve su registro"""
+        registro = self.crear_registro(inicio, fin, texto, confianza, palabras, texto_completo, claves)
+        with self._lock:
+            self.registros.append(registro)
+        return registro
+    
+    def agregar_texto(self, texto):
+        """Añade texto sin tiempos (por ejemplo, una transcripción desencriptada)"""
+        registro = {'inicio': None, 'fin': None, 'texto': texto, 'confianza': None, 'tiempos': (), 'claves': ()}
+        with self._lock:
+            self.registros.append(registro)
+        return registro
+    
+    def revisar(self, desde, registros):
+        """Añade registros que sustituyen a los añadidos a partir de desde (la pasada final a la de en vivo)"""
+        with self._lock:
+            self.revisiones.append((desde, len(self.registros)))
+            self.registros.extend(registros)
+    
+    def limpiar(self):
+        with self._lock:
+            self.registros = []
+            self.revisiones = []
+    
+    def vigentes(self):
+        """Devuelve, en orden, los registros que ninguna revisión ha sustituido"""
+        with self._lock:
+            registros, revisiones = list(self.registros), list(self.revisiones)
+        
+        if not revisiones:
+            return registros
+        
+        sustituidos = bytearray(len(registros))
+        for desde, hasta in revisiones:
+            sustituidos[desde:hasta] = b'\x01' * (hasta - desde)
+        return [registro for registro, sustituido in zip(registros, sustituidos) if not sustituido]
+    
+    @staticmethod
+    def repartir_tiempos(inicio, fin, texto, confianza=None):
+        """Estima (inicio, fin, confianza) de cada palabra de texto repartiendo [inicio, fin] según su longitud"""
+        tokens = texto.split()
+        total = sum(len(token) + 1 for token in tokens)
+        if not total:
+            return ()
+        
+        tiempos = []
+        duracion = max(0.0, fin - inicio)
+        confianza = confianza if confianza is not None else 1.0
+        acumulado = 0
+        for token in tokens:
+            comienzo = inicio + duracion * acumulado / total
+            acumulado += len(token) + 1
+            tiempos.append((comienzo, inicio + duracion * acumulado / total, confianza))
+        return tuple(tiempos)
+    
+    @staticmethod
+    def marca_tiempo(segundos):
+        """Formatea segundos como la marca [hh:mm:ss] de la transcripción"""
+        segundos = int(segundos)
+        return f"[{segundos // 3600:02d}:{segundos % 3600 // 60:02d}:{segundos % 60:02d}]"
+    
+    def a_texto(self):
+        """Texto de la transcripción con una marca de tiempo por enunciado"""
+        partes = []
+        for registro in self.vigentes():
+            if registro['inicio'] is None:
+                partes.append(f"{registro['texto']}\n\n")
+            else:
+                partes.append(f"{self.marca_tiempo(registro['inicio'])} {registro['texto']}\n\n")
+        return "".join(partes).strip()
+    
+    def a_srt(self, max_caracteres=84, max_duracion=6.0):
+        """Genera subtítulos SRT cortando los enunciados por sus palabras en bloques legibles"""
+        lineas = []
+        for registro in self.vigentes():
+            palabras, tiempos = registro['texto'].split(), registro['tiempos']
+            if not tiempos:
+                continue
+        
+            # Cada bloque es el tramo [primera, k) de palabras del enunciado
+            primera, caracteres = 0, 0
+            for k in range(len(palabras) + 1):
+                if k < len(palabras) and (k == primera or (caracteres + len(palabras[k]) <= max_caracteres and
+                                                           tiempos[k][1] - tiempos[primera][0] <= max_duracion)):
+                    caracteres += len(palabras[k]) + 1
+                    continue
+        
+                lineas.append(f"{len(lineas) + 1}\n"
+                              f"{self._tiempo_srt(tiempos[primera][0])} --> {self._tiempo_srt(tiempos[k - 1][1])}\n"
+                              f"{' '.join(palabras[primera:k])}\n")
+                primera, caracteres = k, len(palabras[k]) + 1 if k < len(palabras) else 0
+        return "\n".join(lineas)
+    
+    @staticmethod
+    def _tiempo_srt(segundos):
+        milisegundos = int(round(max(0.0, segundos) * 1000))
+        horas, milisegundos = divmod(milisegundos, 3600000)
+        minutos, milisegundos = divmod(milisegundos, 60000)
+        segs, milisegundos = divmod(milisegundos, 1000)
+        return f"{horas:02d}:{minutos:02d}:{segs:02d},{milisegundos:03d}"
+
+
+class ActualizadorInterfaz:
+    """Agrupa en lotes las actualizaciones de la interfaz que llegan desde los hilos de trabajo.
+    
+    Los hilos encolan texto (fragmentos sueltos o (etiqueta, texto)) y mensajes de
+    estado sin tocar Tk. El hilo de la interfaz vacía la cola cada intervalo_ms:
+    todo el texto pendiente entra en el widget con una sola inserción y un solo
+    desplazamiento al final, y de los estados sólo se muestra el último del ciclo.
+    Así una ráfaga de resultados no inunda el bucle de eventos con un after(0)
+    por enunciado.
+    """
+    
+    def __init__(self, root, texto_widget, estado_var, intervalo_ms=80):
+        self.root = root
+        self.texto_widget = texto_widget
+        self.estado_var = estado_var
+        self.intervalo_ms = intervalo_ms
+        self.cola = queue.Queue()
+        self._estado_pendiente = None  # Sólo importa el último: se sobrescribe en lugar de encolarse
+        self.root.after(self.intervalo_ms, self._vaciar)
+    
+    def insertar(self, *fragmentos):
+        """Encola texto para el final del widget (se puede llamar desde cualquier hilo)"""
+        if fragmentos:
+            self.cola.put(fragmentos)
+    
+    def estado(self, texto):
+        """Cambia el mensaje de estado en el próximo ciclo (se puede llamar desde cualquier hilo)"""
+        self._estado_pendiente = texto
+    
+    def descartar(self):
+        """Olvida el texto pendiente (al limpiar la transcripción)"""
+        try:
+            while True:
+                self.cola.get_nowait()
+        except queue.Empty:
+            pass
+    
+    def _vaciar(self):
+        try:
+            argumentos = []
+            try:
+                while True:
+                    for fragmento in self.cola.get_nowait():
+                        if isinstance(fragmento, tuple):
+                            etiqueta, contenido = fragmento
+                            argumentos.extend((contenido, etiqueta))
+                        else:
+                            argumentos.extend((fragmento, ()))
+            except queue.Empty:
+                pass
+        
+            if argumentos:
+                # Text.insert admite varios pares (texto, etiquetas) en una sola llamada
+                self.texto_widget.insert(tk.END, *argumentos)
+                self.texto_widget.see(tk.END)
+        
+            estado, self._estado_pendiente = self._estado_pendiente, None
+            if estado is not None and estado != self.estado_var.get():
+                self.estado_var.set(estado)
+        
+        except Exception as e:
+            print(f"Error al actualizar la interfaz: {e}")
+        
+        finally:
+            self.root.after(self.intervalo_ms, self._vaciar)
+
 
 class TranscripcionApp:
     def __init__(self, root):
@@ -58,6 +895,13 @@ class TranscripcionApp:
         self.chunk = 1024
         self.audio = pyaudio.PyAudio()
         self.reconocedor = sr.Recognizer()
+        self.calibrador_ruido = CalibradorRuido(self.reconocedor)
+        self.fusionador_solapamiento = FusionadorSolapamiento()  # Une las hipótesis de segmentos solapados
+        self.motor_correcciones = MotorCorrecciones(
+            CORRECCIONES_PREDETERMINADAS,
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), "correcciones.json")
+        )
+        self.transcripcion = TranscripcionEstructurada()  # Almacén del que se muestran y exportan los enunciados
         
         # Configuración optimizada para mejor captación
         self.reconocedor.energy_threshold = 300  # Umbral de energía más bajo para detectar voz
@@ -73,6 +917,9 @@ class TranscripcionApp:
         self.duracion_segmento = 3  # Duración en segundos de cada segmento (más corto para mejor captación)
         self.superposicion = 1  # Segundos de superposición entre segmentos para no perder palabras
         self.dir_temp = tempfile.gettempdir()
+        self.guardar_segmentos_depuracion = False  # Volcar a disco los segmentos enviados a Google
+        self.sustraccion_espectral = False  # Añadir sustracción espectral a la cancelación de ruido
+        self.segmentar_por_voz = True  # Cortar la grabación por enunciados en lugar de ventanas fijas
         self.contador_segmentos = 0
         self.tiempo_inicio = 0
         self.duracion_total = 0
@@ -80,6 +927,9 @@ class TranscripcionApp:
         # Crear la interfaz gráfica
         self.crear_interfaz()
         
+        # Las actualizaciones de los hilos de trabajo llegan a la interfaz en lotes
+        self.interfaz = ActualizadorInterfaz(self.root, self.texto_transcripcion, self.estado_var)
+        
     def crear_interfaz(self):
         # Frame principal
         main_frame = ttk.Frame(self.root, padding="10")
@@ -225,12 +1075,11 @@ class TranscripcionApp:
             command=lambda: setattr(self.reconocedor, 'dynamic_energy_threshold', self.ajuste_dinamico_var.get())
         ).pack(side=tk.LEFT, padx=(0, 15))
         
-        self.cancelacion_ruido_var = tk.BooleanVar(value=True and pydub_disponible)
+        self.cancelacion_ruido_var = tk.BooleanVar(value=True)
         ttk.Checkbutton(
             opciones_frame,
             text="Cancelación de ruido",
-            variable=self.cancelacion_ruido_var,
-            state=tk.NORMAL if pydub_disponible else tk.DISABLED
+            variable=self.cancelacion_ruido_var
         ).pack(side=tk.LEFT, padx=(0, 15))
         
         # IMPORTANTE: Crear un frame separado para los botones directamente en main_frame
@@ -283,6 +1132,8 @@ class TranscripcionApp:
     def limpiar_transcripcion(self):
         """Limpia el área de transcripción"""
         self.texto_transcripcion.delete("1.0", tk.END)
+        self.interfaz.descartar()
+        self.transcripcion.limpiar()
     
     def actualizar_tiempo(self):
         # Actualizar el tiempo transcurrido mientras está grabando
@@ -310,32 +1161,39 @@ class TranscripcionApp:
             self.tiempo_inicio = time.time()
             self.duracion_total = 0
             
+            # Cola nueva por sesión para que un aviso de fin pendiente no afecte a la siguiente
+            self.cola_audio = queue.Queue()
+            
             # Actualizar botón y estado
             self.boton_grabar.config(text="Detener Grabación")
-            self.estado_var.set("⚫ Grabando...")
+            self.interfaz.estado("⚫ Grabando...")
             
             # Limpiar el área de texto si es una nueva grabación
             self.texto_transcripcion.delete("1.0", tk.END)
             self.texto_transcripcion.insert(tk.END, "Escuchando... la transcripción aparecerá aquí en tiempo real.\n\n")
+            self.interfaz.descartar()
+            self.transcripcion.limpiar()
             
             # Iniciar temporizador
             self.actualizar_tiempo()
             
             # Iniciar grabación y transcripción en hilos separados
-            threading.Thread(target=self.grabar_audio_continuo, daemon=True).start()
+            self.hilo_grabacion = threading.Thread(target=self.grabar_audio_continuo, daemon=True)
+            self.hilo_grabacion.start()
             threading.Thread(target=self.procesar_audio_tiempo_real, daemon=True).start()
         else:
             # Detener grabación
             self.grabando = False
             self.transcribiendo = False
             self.boton_grabar.config(text="Iniciar Grabación")
-            self.estado_var.set("Procesando últimos segmentos...")
+            self.interfaz.estado("Procesando últimos segmentos...")
             
             # Esperar a que se procesen los últimos segmentos
-            self.root.after(5000, lambda: self.estado_var.set("Listo"))
+            self.root.after(5000, lambda: self.interfaz.estado("Listo"))
     
     def grabar_audio_continuo(self):
         """Graba audio continuamente y lo divide en segmentos para procesamiento en tiempo real"""
+        cola_audio = self.cola_audio
         stream = self.audio.open(
             format=self.formato,
             channels=self.canales,
@@ -351,11 +1209,25 @@ class TranscripcionApp:
         contador_frames = 0
         ultimo_frame_procesado = 0
         
+        # La cancelación de ruido se aplica a cada bloque capturado, una sola vez y con estado
+        # continuo, en lugar de repetirse sobre cada segmento solapado
+        reductor = self.crear_reductor_ruido(self.tasa_muestreo)
+        detector = DetectorVoz(self.tasa_muestreo, calibrador=self.calibrador_ruido) if self.segmentar_por_voz else None
+        
         try:
             # Grabar audio mientras self.grabando sea True
             while self.grabando:
                 try:
                     data = stream.read(self.chunk)
+                    if reductor:
+                        data = reductor.procesar_pcm(data)
+                    
+                    if detector:
+                        # Sólo se encolan enunciados completos: el silencio no llega al reconocedor
+                        for segundo_inicio, datos_segmento in detector.procesar(data):
+                            self.procesar_segmento([datos_segmento], segundo_inicio)
+                        continue
+                    
                     frames_buffer.append(data)
                     contador_frames += 1
                     
@@ -370,240 +1242,171 @@ class TranscripcionApp:
                         ultimo_frame_procesado = contador_frames
                         # Tomar los últimos frames_por_segmento del buffer
                         frames_segmento = frames_buffer[-frames_por_segmento:]
-                        self.procesar_segmento(frames_segmento)
+                        segundo_inicio = (contador_frames - len(frames_segmento)) * self.chunk / float(self.tasa_muestreo)
+                        self.procesar_segmento(frames_segmento, segundo_inicio)
                 
                 except Exception as e:
                     print(f"Error durante la grabación: {e}")
             
-            # Procesar el último segmento parcial si existe
-            if frames_buffer and contador_frames > ultimo_frame_procesado:
+            # Procesar el enunciado en curso o el último segmento parcial si existe
+            if detector:
+                for segundo_inicio, datos_segmento in detector.vaciar():
+                    self.procesar_segmento([datos_segmento], segundo_inicio)
+            elif frames_buffer and contador_frames > ultimo_frame_procesado:
                 frames_segmento = frames_buffer[-min(len(frames_buffer), frames_por_segmento):]
-                self.procesar_segmento(frames_segmento)
+                segundo_inicio = (contador_frames - len(frames_segmento)) * self.chunk / float(self.tasa_muestreo)
+                self.procesar_segmento(frames_segmento, segundo_inicio)
         
         finally:
             # Cerrar el stream
             stream.stop_stream()
             stream.close()
+            
+            # Indicar al hilo de transcripción que no llegarán más segmentos
+            cola_audio.put(None)
     
-    def procesar_segmento(self, frames_segmento):
-        """Guarda un segmento de audio y lo pone en la cola para transcripción"""
+    def procesar_segmento(self, frames_segmento, segundo_inicio):
+        """Construye un segmento de audio en memoria y lo pone en la cola, con su inicio en la grabación"""
         try:
-            # Generar nombre único para el archivo temporal
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            nombre_segmento = f"seg_{timestamp}_{self.contador_segmentos}.wav"
-            ruta_segmento = os.path.join(self.dir_temp, nombre_segmento)
+            ancho_muestra = self.audio.get_sample_size(self.formato)
+            datos_segmento = b''.join(frames_segmento)
             self.contador_segmentos += 1
             
-            # Guardar el segmento como archivo WAV
-            with wave.open(ruta_segmento, 'wb') as wf:
-                wf.setnchannels(self.canales)
-                wf.setsampwidth(self.audio.get_sample_size(self.formato))
-                wf.setframerate(self.tasa_muestreo)
-                wf.writeframes(b''.join(frames_segmento))
+            # El reconocedor recibe el PCM directamente, sin pasar por un archivo WAV
+            audio_data = sr.AudioData(datos_segmento, self.tasa_muestreo, ancho_muestra)
             
-            # Preprocesar el audio si la cancelación de ruido está activada
-            if self.cancelacion_ruido_var.get() and pydub_disponible:
-                ruta_procesada = self.preprocesar_audio(ruta_segmento)
-                if ruta_procesada:
-                    # Si el procesamiento fue exitoso, usamos el archivo procesado
-                    try:
-                        os.remove(ruta_segmento)  # Eliminar archivo original
-                    except:
-                        pass
-                    ruta_segmento = ruta_procesada
+            if self.guardar_segmentos_depuracion:
+                self.volcar_segmento_depuracion(audio_data)
             
             # Añadir el segmento a la cola para transcripción
-            self.cola_audio.put(ruta_segmento)
+            self.cola_audio.put((segundo_inicio, audio_data))
         
         except Exception as e:
             print(f"Error al procesar segmento: {e}")
     
-    def preprocesar_audio(self, ruta_archivo):
-        """Aplica preprocesamiento al audio para mejorar la calidad"""
-        if not pydub_disponible:
-            return ruta_archivo
-        
+    def volcar_segmento_depuracion(self, audio_data):
+        """Guarda en disco un segmento enviado al reconocedor (sólo para depuración)"""
         try:
-            # Cargar el audio con pydub
-            audio = AudioSegment.from_wav(ruta_archivo)
-            
-            # Normalizar volumen (aumentar volumen bajo, reducir volumen alto)
-            audio = audio.normalize()
-            
-            # Aplicar filtro de paso alto para eliminar ruido de baja frecuencia
-            audio = audio.high_pass_filter(80)
-            
-            # Generar nombre para archivo procesado
-            ruta_procesada = ruta_archivo.replace(".wav", "_proc.wav")
-            
-            # Exportar audio procesado
-            audio.export(ruta_procesada, format="wav")
-            
-            return ruta_procesada
-        
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            ruta_segmento = os.path.join(self.dir_temp, f"seg_{timestamp}_{self.contador_segmentos}.wav")
+            with open(ruta_segmento, 'wb') as f:
+                f.write(audio_data.get_wav_data())
         except Exception as e:
-            print(f"Error en preprocesamiento: {e}")
-            return ruta_archivo  # En caso de error, devolver ruta original
+            print(f"Error al guardar segmento de depuración: {e}")
+    
+    def crear_reductor_ruido(self, tasa):
+        """Devuelve un ReductorRuido nuevo si la cancelación de ruido está activada, o None"""
+        if not self.cancelacion_ruido_var.get():
+            return None
+        return ReductorRuido(tasa, sustraccion_espectral=self.sustraccion_espectral)
     
     def procesar_audio_tiempo_real(self):
         """Procesa los segmentos de audio de la cola para transcripción en tiempo real"""
         try:
             # Guardar transcripciones anteriores para contexto
             transcripciones_previas = []
+            cola_audio = self.cola_audio
+            hilo_grabacion = self.hilo_grabacion
             
-            while self.transcribiendo or not self.cola_audio.empty():
+            while True:
                 try:
-                    # Esperar hasta que haya un segmento disponible
-                    if not self.cola_audio.empty():
-                        archivo_segmento = self.cola_audio.get(block=False)
-                        
-                        # Transcribir segmento
-                        texto = self.transcribir_segmento(archivo_segmento, transcripciones_previas)
-                        
-                        # Guardar transcripción para contexto si tiene contenido
-                        if texto and texto.strip():
-                            transcripciones_previas.append(texto)
-                            # Mantener solo las últimas 5 transcripciones como contexto
-                            if len(transcripciones_previas) > 5:
-                                transcripciones_previas = transcripciones_previas[-5:]
-                        
-                        # Eliminar archivo temporal
-                        try:
-                            os.remove(archivo_segmento)
-                        except:
-                            pass
-                    else:
-                        # Esperar un poco si no hay segmentos
-                        time.sleep(0.2)
-                        
+                    # Bloquear hasta que el hilo de grabación publique un segmento
+                    elemento = cola_audio.get(timeout=1.0)
                 except queue.Empty:
-                    # No hay elementos en la cola, esperar
-                    time.sleep(0.2)
+                    # Salir sólo si el hilo de grabación terminó sin dejar el aviso de fin
+                    if not hilo_grabacion.is_alive():
+                        break
+                    continue
+                
+                # Fin de la grabación: ya se procesaron todos los segmentos
+                if elemento is None:
+                    break
+                
+                # Transcribir segmento
+                segundo_inicio, audio_segmento = elemento
+                texto = self.transcribir_segmento(audio_segmento, transcripciones_previas, segundo_inicio)
+                
+                # Guardar transcripción para contexto si tiene contenido
+                if texto and texto.strip():
+                    transcripciones_previas.append(texto)
+                    # Mantener solo las últimas 5 transcripciones como contexto
+                    if len(transcripciones_previas) > 5:
+                        transcripciones_previas = transcripciones_previas[-5:]
                     
         except Exception as e:
             print(f"Error en el procesamiento de audio en tiempo real: {e}")
-            self.estado_var.set(f"Error: {str(e)}")
+            self.interfaz.estado(f"Error: {str(e)}")
     
-    def transcribir_segmento(self, archivo_audio, contexto_previo=None):
-        """Transcribe un segmento de audio y actualiza la UI con el resultado"""
+    def transcribir_segmento(self, audio_data, contexto_previo=None, segundo_inicio=0.0):
+        """Transcribe un segmento de audio (sr.AudioData) que empieza en segundo_inicio y actualiza la UI"""
         try:
-            with sr.AudioFile(archivo_audio) as fuente:
-                # Ajustar el reconocedor para audio en ambiente ruidoso
-                self.reconocedor.adjust_for_ambient_noise(fuente, duration=0.2)
-                # Obtener audio
-                audio_data = self.reconocedor.record(fuente)
-                
-                # Actualizar estado
-                self.root.after(0, lambda: self.estado_var.set("⚫ Transcribiendo..."))
-                
-                # Obtener el idioma seleccionado
-                idioma = self.idioma_var.get()
+            # Actualizar estado
+            self.interfaz.estado("⚫ Transcribiendo...")
+            
+            # Obtener el idioma seleccionado
+            idioma = self.idioma_var.get()
+            
+            # Transcribir el audio con contexto
+            # Usar contexto previo para mejorar la precisión
+            texto = ""
+            texto_completo = None
+            
+            try:
+                # Hacer reconocimiento
+                texto = self.reconocedor.recognize_google(
+                    audio_data, 
+                    language=idioma,
+                    show_all=False  # Solo queremos el resultado más probable
+                )
                 
-                # Transcribir el audio con contexto
-                # Usar contexto previo para mejorar la precisión
+                # Las ventanas fijas se solapan: quitar las palabras que repiten el final del segmento anterior
+                if texto and contexto_previo and not self.segmentar_por_voz:
+                    texto_completo = texto
+                    texto = self.fusionador_solapamiento.fusionar(contexto_previo[-1], texto, self.superposicion)
+            
+            except sr.UnknownValueError:
                 texto = ""
+            
+            except Exception as e:
+                print(f"Error en reconocimiento: {e}")
+                texto = ""
+            
+            # Si se obtuvo texto, mostrarlo
+            if texto and texto.strip():
+                # Aplicar correcciones finales
+                texto = self.aplicar_correcciones_post(texto, idioma)
                 
-                try:
-                    # Intentar usar la API de Google con reconocimiento de contexto
-                    frases_contexto = []
-                    if contexto_previo and len(contexto_previo) > 0:
-                        # Usar últimas 3 frases como contexto
-                        frases_contexto = ' '.join(contexto_previo[-3:])
-                        
-                    # Hacer reconocimiento
-                    texto = self.reconocedor.recognize_google(
-                        audio_data, 
-                        language=idioma,
-                        show_all=False  # Solo queremos el resultado más probable
-                    )
-                    
-                    # Si tenemos texto y tenemos contexto previo, intentamos hacer correcciones
-                    if texto and frases_contexto:
-                        # Verificar si hay palabras del contexto que se repiten al inicio
-                        # para evitar duplicación de frases entre segmentos
-                        palabras_texto = texto.split()
-                        palabras_contexto = frases_contexto.split()
-                        
-                        # Si tenemos pocas palabras, no hacemos corrección
-                        if len(palabras_texto) > 3 and len(palabras_contexto) > 3:
-                            # Buscar duplicaciones al inicio (solapamiento entre segmentos)
-                            n_palabras = min(5, len(palabras_texto), len(palabras_contexto))
-                            
-                            # Calcular si hay solapamiento significativo
-                            inicio_texto = ' '.join(palabras_texto[:n_palabras]).lower()
-                            fin_contexto = ' '.join(palabras_contexto[-n_palabras:]).lower()
-                            
-                            similitud = self.calcular_similitud(inicio_texto, fin_contexto)
-                            
-                            # Si hay alta similitud, eliminar la parte duplicada
-                            if similitud > 0.7:
-                                texto = ' '.join(palabras_texto[n_palabras:])
-                
-                except sr.UnknownValueError:
-                    texto = ""
-                
-                except Exception as e:
-                    print(f"Error en reconocimiento: {e}")
-                    texto = ""
-                
-                # Si se obtuvo texto, mostrarlo
-                if texto and texto.strip():
-                    # Aplicar correcciones finales
-                    texto = self.aplicar_correcciones_post(texto, idioma)
-                    
-                    # Mostrar el texto transcrito en la interfaz
-                    self.root.after(0, lambda: self.actualizar_transcripcion(texto))
-                    
-                # Actualizar estado
-                self.root.after(0, lambda: self.estado_var.set("⚫ Grabando..."))
-                
-                return texto
+                # Google no da tiempos por palabra: se estiman con la geometría del segmento
+                segundo_fin = segundo_inicio + len(audio_data.frame_data) / float(audio_data.sample_rate * audio_data.sample_width)
+                self.publicar_enunciado(segundo_inicio, segundo_fin, texto, texto_completo, con_tiempo=False)
                 
+            # Actualizar estado
+            self.interfaz.estado("⚫ Grabando...")
+            
+            return texto
+            
         except sr.UnknownValueError:
             # Si no se reconoce nada, no mostrar error
             return ""
             
         except sr.RequestError as e:
             # Error con el servicio
-            self.root.after(0, lambda: self.estado_var.set(f"Error en el servicio: {e}"))
+            self.interfaz.estado(f"Error en el servicio: {e}")
             return ""
             
         except Exception as e:
             print(f"Error en transcripción: {e}")
-            self.root.after(0, lambda: self.estado_var.set(f"Error: {str(e)}"))
+            self.interfaz.estado(f"Error: {str(e)}")
             return ""
     
-    def calcular_similitud(self, texto1, texto2):
-        """Calcula la similitud entre dos textos (0-1)"""
-        if not texto1 or not texto2:
-            return 0
-            
-        # Método simple: contar palabras compartidas
-        palabras1 = set(texto1.lower().split())
-        palabras2 = set(texto2.lower().split())
-        
-        # Calcular coeficiente de Jaccard
-        if not palabras1 or not palabras2:
-            return 0
-            
-        interseccion = len(palabras1.intersection(palabras2))
-        union = len(palabras1.union(palabras2))
-        
-        return interseccion / union if union > 0 else 0
-    
     def aplicar_correcciones_post(self, texto, idioma):
         """Aplica correcciones post-procesamiento al texto reconocido"""
         if not texto:
             return texto
             
-        # Correcciones específicas del idioma
-        if idioma.startswith('es'):
-            # Corregir espacios antes de signos de puntuación en español
-            for signo in ['?', '!', ',', '.', ':', ';']:
-                texto = texto.replace(f' {signo}', signo)
-            
-            # Corregir espacios en signos de interrogación/exclamación en español
-            texto = texto.replace('¿ ', '¿').replace('¡ ', '¡')
+        # Correcciones específicas del idioma (espacios junto a los signos de puntuación
+        # en español), compiladas al iniciar y aplicadas en una sola pasada
+        texto = self.motor_correcciones.aplicar(texto, idioma)
             
         # Correcciones generales
         # Eliminar espacios extras
@@ -621,29 +1424,32 @@ class TranscripcionApp:
             title="Seleccionar Archivo de Audio",
             filetypes=[
                 ("Archivos WAV", "*.wav"),
-                ("Todos los Archivos", "*.*") if not pydub_disponible else 
+                ("Todos los Archivos", "*.*") if not (pydub_disponible or ruta_ffmpeg) else 
                 ("Todos los formatos compatibles", "*.wav;*.mp3;*.ogg;*.flac")
             ]
         )
         
         if archivo:
-            self.estado_var.set(f"Procesando archivo: {os.path.basename(archivo)}...")
+            self.interfaz.estado(f"Procesando archivo: {os.path.basename(archivo)}...")
             self.texto_transcripcion.delete("1.0", tk.END)
             self.texto_transcripcion.insert(tk.END, f"Procesando archivo: {os.path.basename(archivo)}...\n\n")
+            self.interfaz.descartar()
+            self.transcripcion.limpiar()
             
             # Convertir a WAV si es necesario y si pydub está disponible
+            # (con ffmpeg el archivo se decodifica en streaming durante la transcripción)
             extension = os.path.splitext(archivo)[1].lower()
             
-            if extension != '.wav':
+            if extension != '.wav' and not ruta_ffmpeg:
                 if pydub_disponible:
                     # Intentar convertir si pydub está disponible
                     try:
-                        self.estado_var.set("Convirtiendo archivo a formato WAV...")
+                        self.interfaz.estado("Convirtiendo archivo a formato WAV...")
                         archivo_wav = self.convertir_a_wav(archivo)
                         if archivo_wav:
                             archivo = archivo_wav
                         else:
-                            self.root.after(0, lambda: self.estado_var.set("No se pudo convertir el archivo"))
+                            self.interfaz.estado("No se pudo convertir el archivo")
                             messagebox.showwarning("Error de conversión", 
                                                 "No se pudo convertir el archivo a formato WAV.")
                             return
@@ -651,7 +1457,7 @@ class TranscripcionApp:
                         messagebox.showwarning("Error de conversión", 
                                             f"No se pudo convertir el archivo: {str(e)}\nSe intentará procesar el archivo original.")
                 else:
-                    self.root.after(0, lambda: self.estado_var.set("Solo se soportan archivos WAV"))
+                    self.interfaz.estado("Solo se soportan archivos WAV")
                     messagebox.showwarning("Formato no soportado", 
                                         "Solo se soportan archivos WAV. Instale pydub para soporte de otros formatos.")
                     return
@@ -685,11 +1491,6 @@ class TranscripcionApp:
             # Configurar para reconocimiento de voz óptimo
             audio = audio.set_channels(1).set_frame_rate(16000)
             
-            # Normalizar y aplicar filtros si está activada la opción
-            if self.cancelacion_ruido_var.get():
-                audio = audio.normalize()
-                audio = audio.high_pass_filter(80)
-            
             # Exportar a WAV
             audio.export(archivo_destino, format="wav")
             
@@ -705,6 +1506,11 @@ class TranscripcionApp:
             # Determinar si es un archivo WAV
             extension = os.path.splitext(archivo_audio)[1].lower()
             
+            # Con ffmpeg los formatos comprimidos se decodifican en streaming, sin WAV intermedio
+            if extension != '.wav' and ruta_ffmpeg:
+                self.transcribir_archivo_comprimido(archivo_audio)
+                return
+            
             if extension != '.wav':
                 if pydub_disponible:
                     # Intentar convertir si pydub está disponible
@@ -712,12 +1518,12 @@ class TranscripcionApp:
                     if archivo_wav:
                         archivo_audio = archivo_wav
                     else:
-                        self.root.after(0, lambda: self.estado_var.set("No se pudo convertir el archivo"))
+                        self.interfaz.estado("No se pudo convertir el archivo")
                         messagebox.showwarning("Error de formato", 
                                               "No se pudo convertir el archivo. Asegúrese de tener instaladas las dependencias necesarias.")
                         return
                 else:
-                    self.root.after(0, lambda: self.estado_var.set("Solo se soportan archivos WAV"))
+                    self.interfaz.estado("Solo se soportan archivos WAV")
                     messagebox.showwarning("Formato no soportado", 
                                           "Solo se soportan archivos WAV. Instale pydub para soporte de otros formatos.")
                     return
@@ -740,20 +1546,38 @@ class TranscripcionApp:
                              f"- Tasa de muestreo: {tasa} Hz\n"
                              f"- Tamaño: {os.path.getsize(archivo_audio) / (1024*1024):.2f} MB\n\n")
                 
-                self.root.after(0, lambda: self.texto_transcripcion.insert(tk.END, info_audio))
+                self.interfaz.insertar(info_audio)
                 
                 # Determinar la estrategia de procesamiento según la duración
                 if duracion > 60:  # Más de un minuto
-                    self.root.after(0, lambda: self.estado_var.set("Procesando archivo grande por segmentos..."))
+                    self.interfaz.estado("Procesando archivo grande por segmentos...")
                     self.procesar_archivo_por_segmentos(archivo_audio, duracion)
                 else:
                     # Archivo pequeño, procesarlo normalmente
                     self.transcribir_segmento_archivo(archivo_audio)
             
         except Exception as e:
-            self.root.after(0, lambda: self.estado_var.set(f"Error al procesar archivo: {str(e)}"))
+            self.interfaz.estado(f"Error al procesar archivo: {str(e)}")
             messagebox.showerror("Error", f"Error al procesar archivo: {str(e)}")
     
+    def transcribir_archivo_comprimido(self, archivo_audio):
+        """Transcribe un MP3/OGG/FLAC decodificándolo con ffmpeg a medida que se transcribe"""
+        info = DecodificadorAudio.sondear(archivo_audio)
+        duracion, canales, tasa = info if info else (0, None, None)
+        
+        # Mostrar información del archivo
+        info_audio = (f"Información del archivo:\n"
+                     f"- Duración: {int(duracion // 60)}:{int(duracion % 60):02d}\n"
+                     f"- Canales: {canales or 'desconocido'}\n"
+                     f"- Tasa de muestreo: {tasa or 'desconocida'} Hz\n"
+                     f"- Tamaño: {os.path.getsize(archivo_audio) / (1024*1024):.2f} MB\n\n")
+        
+        self.interfaz.insertar(info_audio)
+        
+        # Aunque el archivo sea corto se procesa por ventanas: nunca se decodifica entero en memoria
+        self.interfaz.estado("Procesando archivo por segmentos...")
+        self.procesar_archivo_por_segmentos(archivo_audio, duracion or 3600)
+    
     def procesar_archivo_por_segmentos(self, archivo_audio, duracion_total):
         """Procesa un archivo de audio grande por segmentos con solapamiento para mejor captación"""
         try:
@@ -764,101 +1588,218 @@ class TranscripcionApp:
             tamano_segmento = 15  # 15 segundos por segmento
             solapamiento = 2      # 2 segundos de solapamiento entre segmentos
             
-            # Calcular número de segmentos con solapamiento
-            num_segmentos = math.ceil((duracion_total - solapamiento) / (tamano_segmento - solapamiento))
-            
             # Actualizar interfaz
-            self.root.after(0, lambda: self.texto_transcripcion.insert(tk.END, 
-                            f"Archivo dividido en {num_segmentos} segmentos con solapamiento para mejor captación...\n\n"))
+            self.interfaz.insertar("Transcribiendo sólo las regiones con voz del archivo...\n\n")
             
-            # Lista para almacenar transcripciones previas para contexto
-            transcripciones_previas = []
+            anterior = None  # (segundo_fin, texto) de la última ventana reconocida
+            resumen = {}
             
-            # Utilizar el reconocedor para cada segmento
-            with sr.AudioFile(archivo_audio) as fuente:
-                # Ajustar para ruido ambiental al inicio del archivo
-                self.reconocedor.adjust_for_ambient_noise(fuente, duration=min(1.0, duracion_total/10))
+            # Recorrer sólo el audio con voz: cada ventana reutiliza el solapamiento de la anterior
+            ventanas = self.iterar_ventanas_archivo(archivo_audio, tamano_segmento, solapamiento, resumen)
+            
+            for i, (offset, audio_segmento) in enumerate(ventanas):
+                # Actualizar progreso
+                progreso = min(100, int(offset * 100 / duracion_total)) if duracion_total else 0
+                self.interfaz.estado(f"Procesando segmento {i+1} ({progreso}%)...")
                 
-                for i in range(num_segmentos):
-                    # Actualizar progreso
-                    progreso = int((i+1) * 100 / num_segmentos)
-                    self.root.after(0, lambda i=i, p=progreso: 
-                                   self.estado_var.set(f"Procesando segmento {i+1}/{num_segmentos} ({p}%)..."))
-                    
-                    # Calcular posición de inicio del segmento con solapamiento
-                    offset = i * (tamano_segmento - solapamiento)
-                    
-                    # Último segmento podría ser más corto
-                    duracion = min(tamano_segmento, duracion_total - offset)
-                    
-                    if duracion <= 0:
-                        break
-                    
-                    # Posicionar y grabar el segmento
-                    fuente.rewind()
-                    audio_segmento = self.reconocedor.record(fuente, duration=duracion, offset=offset)
+                try:
+                    # Transcribir segmento
+                    texto = self.reconocedor.recognize_google(audio_segmento, language=idioma)
                     
-                    try:
-                        # Transcribir segmento
-                        texto = self.reconocedor.recognize_google(audio_segmento, language=idioma)
+                    # Aplicar correcciones a la transcripción
+                    if texto and texto.strip():
+                        # Quitar las palabras que repiten el final de la ventana anterior (solapamiento real, en segundos)
+                        segundo_fin = offset + len(audio_segmento.frame_data) / float(
+                            audio_segmento.sample_rate * audio_segmento.sample_width)
+                        texto_completo = texto_nuevo = texto
+                        if anterior:
+                            texto_nuevo = self.fusionador_solapamiento.fusionar(anterior[1], texto, anterior[0] - offset)
+                        anterior = (segundo_fin, texto)
                         
-                        # Aplicar correcciones a la transcripción
-                        if texto and texto.strip():
-                            # Aplicar correcciones de continuidad con segmentos previos
-                            if transcripciones_previas:
-                                # Verificar solapamiento con transcripción anterior
-                                palabras_texto = texto.split()
-                                ultima_transcripcion = transcripciones_previas[-1]
-                                palabras_previas = ultima_transcripcion.split()
-                                
-                                # Verificar inicio para evitar duplicaciones
-                                if len(palabras_texto) > 3 and len(palabras_previas) > 3:
-                                    n_palabras = min(4, len(palabras_texto), len(palabras_previas))
-                                    
-                                    inicio_texto = ' '.join(palabras_texto[:n_palabras]).lower()
-                                    fin_previo = ' '.join(palabras_previas[-n_palabras:]).lower()
-                                    
-                                    similitud = self.calcular_similitud(inicio_texto, fin_previo)
-                                    
-                                    # Si hay alta similitud, eliminar parte duplicada
-                                    if similitud > 0.5:
-                                        texto = ' '.join(palabras_texto[n_palabras:])
-                            
-                            # Aplicar correcciones según el idioma
-                            texto = self.aplicar_correcciones_post(texto, idioma)
-                            
-                            # Guardar para contexto
-                            transcripciones_previas.append(texto)
-                            if len(transcripciones_previas) > 5:
-                                transcripciones_previas = transcripciones_previas[-5:]
-                            
-                            # Mostrar el segmento de tiempo
-                            horas_inicio = int(offset // 3600)
-                            min_inicio = int((offset % 3600) // 60)
-                            seg_inicio = int(offset % 60)
-                            
-                            tiempo_formateado = f"[{horas_inicio:02d}:{min_inicio:02d}:{seg_inicio:02d}]"
-                            
-                            # Actualizar transcripción
-                            self.root.after(0, lambda tiempo=tiempo_formateado, texto=texto: 
-                                          self.actualizar_transcripcion_con_tiempo(tiempo, texto))
-                    
-                    except sr.UnknownValueError:
-                        # No se reconoció nada en este segmento
-                        pass
-                    
-                    except Exception as e:
-                        print(f"Error en segmento {i+1}: {e}")
+                        if not texto_nuevo:
+                            continue
+                        
+                        # Aplicar correcciones según el idioma
+                        texto = self.aplicar_correcciones_post(texto_nuevo, idioma)
+                        
+                        # Guardar en el almacén y mostrar con la marca de tiempo
+                        self.publicar_enunciado(offset, segundo_fin, texto, texto_completo)
+                
+                except sr.UnknownValueError:
+                    # No se reconoció nada en este segmento
+                    pass
+                
+                except Exception as e:
+                    print(f"Error en segmento {i+1}: {e}")
+            
+            # Informar de cuánto audio se saltó por ser silencio
+            if resumen.get('segundos_totales'):
+                omitido = 1 - resumen['segundos_voz'] / resumen['segundos_totales']
+                mensaje = (f"\nSilencio omitido: {omitido:.0%} del audio "
+                           f"({int(resumen['segundos_voz'])} s con voz de {int(resumen['segundos_totales'])} s)\n")
+                print(mensaje.strip())
+                self.interfaz.insertar(mensaje)
             
             # Transcripción completada
-            self.root.after(0, lambda: self.estado_var.set("Transcripción completada"))
-            self.root.after(0, lambda: self.texto_transcripcion.insert(tk.END, 
-                           "\n--- Fin de la transcripción ---\n"))
+            self.interfaz.estado("Transcripción completada")
+            self.interfaz.insertar("\n--- Fin de la transcripción ---\n")
             
         except Exception as e:
-            self.root.after(0, lambda: self.estado_var.set(f"Error: {str(e)}"))
+            self.interfaz.estado(f"Error: {str(e)}")
             print(f"Error al procesar archivo por segmentos: {e}")
     
+    def iterar_ventanas_archivo(self, archivo_audio, tamano_segmento, solapamiento, resumen=None):
+        """Lee un archivo hacia delante y genera ventanas (offset, sr.AudioData) sólo de las regiones con voz.
+        
+        En un WAV las regiones se localizan antes con indexar_regiones_voz; en los
+        formatos comprimidos el detector de voz corta los enunciados a medida que
+        ffmpeg los decodifica. En resumen se anotan los segundos totales y con voz.
+        """
+        resumen = {} if resumen is None else resumen
+        
+        if os.path.splitext(archivo_audio)[1].lower() != '.wav':
+            # Formatos comprimidos: ffmpeg entrega ya PCM mono a la tasa del reconocedor
+            reductor = self.crear_reductor_ruido(self.tasa_muestreo)
+            detector = DetectorVoz(self.tasa_muestreo, duracion_maxima=tamano_segmento, calibrador=self.calibrador_ruido)
+            bytes_totales = 0
+            bytes_voz = 0
+            
+            with DecodificadorAudio(archivo_audio, self.tasa_muestreo) as decodificador:
+                for datos in decodificador.bloques(4000, reductor):
+                    bytes_totales += len(datos)
+                    for offset, enunciado in detector.procesar(datos):
+                        bytes_voz += len(enunciado)
+                        yield offset, sr.AudioData(enunciado, decodificador.tasa, decodificador.ancho_muestra)
+                
+                for offset, enunciado in detector.vaciar():
+                    bytes_voz += len(enunciado)
+                    yield offset, sr.AudioData(enunciado, decodificador.tasa, decodificador.ancho_muestra)
+            
+            resumen['segundos_totales'] = bytes_totales / float(self.tasa_muestreo * 2)
+            resumen['segundos_voz'] = bytes_voz / float(self.tasa_muestreo * 2)
+            return
+        
+        regiones = self.indexar_regiones_voz(archivo_audio)
+        
+        with wave.open(archivo_audio, 'rb') as wf:
+            tasa = wf.getframerate()
+            canales = wf.getnchannels()
+            ancho_muestra = wf.getsampwidth()
+            
+            resumen['segundos_totales'] = wf.getnframes() / float(tasa)
+            resumen['segundos_voz'] = sum(fin - inicio for inicio, fin in regiones) / float(tasa)
+            
+            frames_segmento = int(tamano_segmento * tasa)
+            frames_avance = int((tamano_segmento - solapamiento) * tasa)
+            
+            # Cada muestra pasa una sola vez por el reductor de ruido, al leerse del disco
+            reductor = self.crear_reductor_ruido(tasa)
+            filtrar = reductor.procesar if reductor else (lambda muestras: muestras)
+            
+            for inicio, fin in regiones:
+                wf.setpos(inicio)
+                
+                # Cada ventana conserva el final de la anterior y sólo lee del disco el audio nuevo
+                leidos = min(frames_segmento, fin - inicio)
+                ventana = filtrar(self.pcm_a_mono(wf.readframes(leidos), ancho_muestra, canales))
+                offset_frames = inicio
+                
+                while len(ventana):
+                    yield offset_frames / float(tasa), self.a_audio_reconocedor(ventana, tasa)
+                    
+                    pendientes = min(frames_avance, fin - inicio - leidos)
+                    if pendientes <= 0:
+                        break
+                    
+                    nuevos = filtrar(self.pcm_a_mono(wf.readframes(pendientes), ancho_muestra, canales))
+                    ventana = np.concatenate((ventana[frames_avance:], nuevos))
+                    leidos += pendientes
+                    offset_frames += frames_avance
+    
+    def indexar_regiones_voz(self, archivo_wav, margen=0.3, pausa_minima=1.0):
+        """Localiza en una sola pasada las regiones con voz de un WAV y devuelve [(frame_inicio, frame_fin)]"""
+        with wave.open(archivo_wav, 'rb') as wf:
+            tasa = wf.getframerate()
+            canales = wf.getnchannels()
+            ancho_muestra = wf.getsampwidth()
+            total_frames = wf.getnframes()
+            
+            # Energía en ventanas de 20 ms, leyendo el archivo en tramos de 12 s
+            ventana = max(1, tasa // 50)
+            energias = []
+            while True:
+                muestras = self.pcm_a_mono(wf.readframes(ventana * 600), ancho_muestra, canales)
+                num_ventanas = len(muestras) // ventana
+                if num_ventanas == 0:
+                    break
+                
+                ventanas = muestras[:num_ventanas * ventana].reshape(num_ventanas, ventana)
+                energias.append(np.sqrt(np.einsum('ij,ij->i', ventanas, ventanas) / ventana))
+        
+        if not energias:
+            return [(0, total_frames)]
+        energias_db = 10 * np.log10(np.concatenate(energias) ** 2 + 1.0)
+        
+        # El piso de ruido es el nivel que superan el 95 % de las ventanas; sirve también de calibración
+        piso = np.percentile(energias_db, 5)
+        self.calibrador_ruido.fijar(math.sqrt(10 ** (piso / 10) - 1))
+        voz = (energias_db > piso + 9) & (energias_db > 30)
+        
+        # Tramos de voz [inicio, fin) en ventanas; los de menos de 60 ms son chasquidos
+        cambios = np.flatnonzero(np.diff(np.concatenate(([0], voz.astype(np.int8), [0]))))
+        tramos = [(inicio, fin) for inicio, fin in zip(cambios[0::2], cambios[1::2]) if fin - inicio >= 3]
+        
+        # Unir los tramos separados por pausas cortas y añadir un margen a cada lado
+        ventanas_pausa = int(pausa_minima * 50)
+        ventanas_margen = int(margen * 50)
+        regiones = []
+        for inicio, fin in tramos:
+            inicio = max(0, inicio - ventanas_margen)
+            fin = fin + ventanas_margen
+            if regiones and inicio - regiones[-1][1] < ventanas_pausa:
+                regiones[-1][1] = fin
+            else:
+                regiones.append([inicio, fin])
+        
+        return [(int(inicio) * ventana, min(int(fin) * ventana, total_frames)) for inicio, fin in regiones]
+    
+    def pcm_a_mono(self, datos, ancho_muestra, canales):
+        """Convierte PCM de un WAV a muestras mono float32 en la escala de int16"""
+        if ancho_muestra == 1:
+            # Las muestras de 8 bits de un WAV no tienen signo
+            muestras = (np.frombuffer(datos, dtype=np.uint8).astype(np.float32) - 128) * 256
+        elif ancho_muestra == 2:
+            muestras = np.frombuffer(datos, dtype=np.int16).astype(np.float32)
+        elif ancho_muestra == 3:
+            octetos = np.frombuffer(datos, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+            enteros = octetos[:, 0] | (octetos[:, 1] << 8) | (octetos[:, 2] << 16)
+            enteros = np.where(enteros >= 1 << 23, enteros - (1 << 24), enteros)
+            muestras = enteros.astype(np.float32) / 256
+        elif ancho_muestra == 4:
+            muestras = np.frombuffer(datos, dtype=np.int32).astype(np.float32) / 65536
+        else:
+            raise ValueError(f"Ancho de muestra no soportado: {ancho_muestra * 8} bits")
+        
+        if canales > 1:
+            # Sumar columna a columna es varias veces más rápido que mean(axis=1) con pocos canales
+            por_canal = muestras.reshape(-1, canales)
+            mezcla = por_canal[:, 0].copy()
+            for canal in range(1, canales):
+                mezcla += por_canal[:, canal]
+            mezcla *= 1.0 / canales
+            muestras = mezcla
+        
+        return muestras
+    
+    def a_audio_reconocedor(self, muestras, tasa):
+        """Remuestrea a la tasa del reconocedor y empaqueta las muestras como sr.AudioData mono int16"""
+        if tasa != self.tasa_muestreo:
+            remuestreador = RemuestreadorPolifasico(tasa, self.tasa_muestreo)
+            muestras = np.concatenate((remuestreador.procesar(muestras), remuestreador.vaciar()))
+        
+        datos = np.clip(np.round(muestras), -32768, 32767).astype(np.int16).tobytes()
+        return sr.AudioData(datos, self.tasa_muestreo, 2)
+    
     def transcribir_segmento_archivo(self, archivo_audio):
         """Transcribe un archivo de audio completo usando técnicas optimizadas"""
         try:
@@ -866,11 +1807,9 @@ class TranscripcionApp:
             idioma = self.idioma_var.get()
             
             with sr.AudioFile(archivo_audio) as fuente:
-                # Ajustar para ruido ambiental
-                self.reconocedor.adjust_for_ambient_noise(fuente, duration=min(1.0, 0.1))
-                
-                # Grabar todo el audio
+                # Grabar todo el audio; el piso de ruido se estima sin consumir parte de él
                 audio_data = self.reconocedor.record(fuente)
+                self.calibrador_ruido.estimar(audio_data.get_raw_data(convert_width=2), audio_data.sample_rate)
                 
                 # Transcribir con la configuración actual
                 texto = self.reconocedor.recognize_google(audio_data, language=idioma)
@@ -878,39 +1817,51 @@ class TranscripcionApp:
                 if texto.strip():
                     # Aplicar correcciones post-procesamiento
                     texto = self.aplicar_correcciones_post(texto, idioma)
+                    duracion = len(audio_data.frame_data) / float(audio_data.sample_rate * audio_data.sample_width)
                     
                     # Mostrar texto transcrito
-                    self.root.after(0, lambda: self.actualizar_transcripcion(texto))
+                    self.publicar_enunciado(0.0, duracion, texto, con_tiempo=False)
                 
                 # Actualizar estado
-                self.root.after(0, lambda: self.estado_var.set("Transcripción completada"))
+                self.interfaz.estado("Transcripción completada")
         
         except sr.UnknownValueError:
-            self.root.after(0, lambda: self.estado_var.set("No se pudo reconocer el audio"))
-            self.root.after(0, lambda: self.texto_transcripcion.insert(tk.END, 
-                           "No se pudo reconocer ningún texto en el audio.\n"
-                           "Intente ajustar el umbral de energía o usar cancelación de ruido.\n"))
+            self.interfaz.estado("No se pudo reconocer el audio")
+            self.interfaz.insertar("No se pudo reconocer ningún texto en el audio.\n"
+                                   "Intente ajustar el umbral de energía o usar cancelación de ruido.\n")
         
         except Exception as e:
-            self.root.after(0, lambda: self.estado_var.set(f"Error: {str(e)}"))
+            self.interfaz.estado(f"Error: {str(e)}")
             print(f"Error al transcribir archivo: {e}")
     
+    def publicar_enunciado(self, inicio, fin, texto, texto_completo=None, con_tiempo=True):
+        """Añade un enunciado al almacén de la transcripción y lo muestra en la interfaz"""
+        registro = self.transcripcion.agregar(inicio, fin, texto, texto_completo=texto_completo)
+        self.mostrar_enunciado(registro, con_tiempo)
+        return registro
+    
+    def mostrar_enunciado(self, registro, con_tiempo=True):
+        """Encola un registro del almacén para el área de texto, con o sin marca de tiempo"""
+        if con_tiempo:
+            self.actualizar_transcripcion_con_tiempo(TranscripcionEstructurada.marca_tiempo(registro['inicio']),
+                                                     registro['texto'])
+        else:
+            self.actualizar_transcripcion(registro['texto'])
+    
     def actualizar_transcripcion(self, texto):
-        """Actualiza el área de texto con la transcripción"""
-        # Insertar el texto transcrito en el área de texto
-        self.texto_transcripcion.insert(tk.END, texto + "\n\n")
-        self.texto_transcripcion.see(tk.END)  # Desplazar al final
+        """Actualiza el área de texto con la transcripción (se puede llamar desde cualquier hilo)"""
+        # El texto se inserta en el próximo lote del actualizador de la interfaz
+        self.interfaz.insertar(texto + "\n\n")
     
     def actualizar_transcripcion_con_tiempo(self, tiempo, texto):
-        """Actualiza el área de texto con la transcripción y marca de tiempo"""
-        # Insertar el texto transcrito con marca de tiempo
-        self.texto_transcripcion.insert(tk.END, f"{tiempo} {texto}\n\n")
-        self.texto_transcripcion.see(tk.END)  # Desplazar al final
+        """Actualiza el área de texto con la transcripción y marca de tiempo (se puede llamar desde cualquier hilo)"""
+        self.interfaz.insertar(f"{tiempo} {texto}\n\n")
     
     def guardar_transcripcion(self):
         """Guarda la transcripción actual en un archivo de texto"""
         # Obtener el texto de la transcripción
-        texto = self.texto_transcripcion.get("1.0", tk.END).strip()
+        # Se exporta desde el almacén, sin leer ni interpretar el contenido del widget
+        texto = self.transcripcion.a_texto()
         
         if not texto:
             messagebox.showwarning("Advertencia", "No hay texto para guardar")
@@ -966,48 +1917,14 @@ class TranscripcionApp:
                             f.write(texto)
                 
                 elif extension == '.srt':
-                    # Crear archivo de subtítulos SRT
-                    # Primero, extraer todos los segmentos con marcas de tiempo
-                    lineas = texto.split('\n')
-                    subtitulos = []
-                    
-                    for i, linea in enumerate(lineas):
-                        if linea.startswith('[') and ']' in linea:
-                            # Extraer marca de tiempo y texto
-                            partes = linea.split(']', 1)
-                            if len(partes) == 2:
-                                tiempo_str = partes[0][1:]  # Quitar corchete inicial
-                                texto_subtitulo = partes[1].strip()
-                                
-                                # Convertir marca de tiempo a formato SRT (HH:MM:SS,mmm)
-                                h, m, s = tiempo_str.split(':')
-                                tiempo_inicio = f"{h}:{m}:{s},000"
-                                
-                                # Calcular tiempo de fin (5 segundos después)
-                                h_fin, m_fin, s_fin = int(h), int(m), int(s) + 5
-                                if s_fin >= 60:
-                                    s_fin -= 60
-                                    m_fin += 1
-                                if m_fin >= 60:
-                                    m_fin -= 60
-                                    h_fin += 1
-                                
-                                tiempo_fin = f"{h_fin:02d}:{m_fin:02d}:{s_fin:02d},000"
-                                
-                                # Añadir a lista de subtítulos
-                                subtitulos.append({
-                                    'num': len(subtitulos) + 1,
-                                    'inicio': tiempo_inicio,
-                                    'fin': tiempo_fin,
-                                    'texto': texto_subtitulo
-                                })
+                    # Los tiempos salen de las palabras de cada registro, no del texto mostrado
+                    subtitulos = self.transcripcion.a_srt()
+                    if not subtitulos:
+                        messagebox.showwarning("Advertencia", "No hay enunciados con marcas de tiempo para exportar")
+                        return
                     
-                    # Escribir archivo SRT
                     with open(archivo, 'w', encoding='utf-8') as f:
-                        for sub in subtitulos:
-                            f.write(f"{sub['num']}\n")
-                            f.write(f"{sub['inicio']} --> {sub['fin']}\n")
-                            f.write(f"{sub['texto']}\n\n")
+                        f.write(subtitulos)
                 
                 else:
                     # Guardar como texto plano